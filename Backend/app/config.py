@@ -11,8 +11,123 @@ class Settings:
     API_V1_STR: str = "/api/v1"
     
     # Refresh Interval in seconds (e.g. 5 minutes)
-    REFRESH_INTERVAL: int = 300
-    
+    REFRESH_INTERVAL: int = int(os.getenv("REFRESH_INTERVAL", "300"))
+
+    # Live quotes tier: seconds between refreshes of today's forming bar while OPEN (0 disables)
+    QUOTE_REFRESH_INTERVAL: int = int(os.getenv("QUOTE_REFRESH_INTERVAL", "15"))
+    QUOTE_GROUP_SIZE: int = int(os.getenv("QUOTE_GROUP_SIZE", "50"))
+
+    # Daily bars + indicators tier, cadence per market phase (see
+    # utils/market_status.get_market_view_mode): seconds between refreshes, "once"
+    # (a single refresh after the phase starts, delayed by REFRESH_SETTLE_DELAY) or
+    # None (no refreshes in that phase). While OPEN the quotes tier keeps prices
+    # current, so bars only fall back to REFRESH_INTERVAL when quotes are disabled.
+    REFRESH_PHASE_INTERVALS = {
+        "OPEN": None if QUOTE_REFRESH_INTERVAL else REFRESH_INTERVAL,
+        "CLOSED_POST_MARKET": "once",
+        "CLOSED_PRE_MARKET": None,
+        "CLOSED_HOLIDAY": None,
+    }
+    # Let Yahoo settle the closing bar before the post-close refresh
+    REFRESH_SETTLE_DELAY: int = int(os.getenv("REFRESH_SETTLE_DELAY", "600"))
+
+    # Published versions the delta feed (/stocks/fno/changes) can diff against
+    SNAPSHOT_HISTORY: int = int(os.getenv("SNAPSHOT_HISTORY", "32"))
+
+    # Push stream (/stocks/stream): frames buffered per client before it is dropped as too slow,
+    # keep-alive comment interval, and a cap on concurrent subscribers per worker
+    STREAM_CLIENT_BUFFER: int = int(os.getenv("STREAM_CLIENT_BUFFER", "16"))
+    STREAM_HEARTBEAT_S: float = float(os.getenv("STREAM_HEARTBEAT_S", "15"))
+    STREAM_MAX_SUBSCRIBERS: int = int(os.getenv("STREAM_MAX_SUBSCRIBERS", "5000"))
+
+    # Upper bound on symbols per /stocks/batch request
+    BATCH_MAX_SYMBOLS: int = int(os.getenv("BATCH_MAX_SYMBOLS", "200"))
+
+    # Filter results (ordered row indices) kept per snapshot version, LRU (app/utils/query_cache.py)
+    QUERY_CACHE_ENTRIES: int = int(os.getenv("QUERY_CACHE_ENTRIES", "256"))
+
+    # Serialized list responses kept per snapshot version (app/utils/response_cache.py)
+    RESPONSE_CACHE_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_ENTRIES", "64"))
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "5"))
+
+    # Upper bound for Cache-Control max-age on snapshot-backed endpoints (app/utils/http_cache.py)
+    HTTP_CACHE_MAX_AGE: int = int(os.getenv("HTTP_CACHE_MAX_AGE", "300"))
+
+    # Fundamentals tier (ticker.info for the detail view): nightly, IST "HH:MM" on trading days
+    FUNDAMENTALS_REFRESH_AT: str = os.getenv("FUNDAMENTALS_REFRESH_AT", "20:00")
+    FUNDAMENTALS_FILE: str = os.getenv(
+        "FUNDAMENTALS_FILE",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "fundamentals.json"),
+    )
+
+    # Detail views refetch a symbol's fundamentals once its cached entry is older than this
+    FUNDAMENTALS_TTL_S: float = float(os.getenv("FUNDAMENTALS_TTL_S", str(24 * 3600)))
+
+    # Max random delay (seconds) added to each tier's due time
+    QUOTE_JOB_JITTER: float = float(os.getenv("QUOTE_JOB_JITTER", "2"))
+    BARS_JOB_JITTER: float = float(os.getenv("BARS_JOB_JITTER", "30"))
+    FUNDAMENTALS_JOB_JITTER: float = float(os.getenv("FUNDAMENTALS_JOB_JITTER", "300"))
+
+    # Streaming refresh pipeline (fetch -> compute -> publish). Concurrency and
+    # batch sizes are only starting points; the governor adapts them per cycle.
+    REFRESH_FETCH_CONCURRENCY: int = int(os.getenv("REFRESH_FETCH_CONCURRENCY", "2"))
+    REFRESH_QUEUE_SIZE: int = int(os.getenv("REFRESH_QUEUE_SIZE", "8"))
+    REFRESH_COMPUTE_BATCH: int = int(os.getenv("REFRESH_COMPUTE_BATCH", "25"))
+
+    # Concurrency governor (app/services/governor.py): stay under the RSS ceiling
+    # (leave room below the 512 MB box limit) while aiming for the target cycle times
+    GOVERNOR_MEMORY_CEILING_MB: float = float(os.getenv("GOVERNOR_MEMORY_CEILING_MB", "400"))
+    GOVERNOR_MAX_FETCH_CONCURRENCY: int = int(os.getenv("GOVERNOR_MAX_FETCH_CONCURRENCY", "4"))
+    GOVERNOR_MAX_GROUP_SIZE: int = int(os.getenv("GOVERNOR_MAX_GROUP_SIZE", "50"))
+    # Longest a fetcher waits for RSS to drop below the ceiling mid-cycle
+    GOVERNOR_MAX_PAUSE_S: float = float(os.getenv("GOVERNOR_MAX_PAUSE_S", "5"))
+    BARS_TARGET_CYCLE_S: float = float(os.getenv("BARS_TARGET_CYCLE_S", "60"))
+    QUOTES_TARGET_CYCLE_S: float = float(os.getenv("QUOTES_TARGET_CYCLE_S", "8"))
+
+    # Where indicator/record compute runs: "inline" (event loop), "thread" or "process"
+    # (see app/services/compute.py). Process workers are recycled after
+    # COMPUTE_MAX_TASKS_PER_CHILD batches to cap their memory (0 = never).
+    COMPUTE_BACKEND: str = os.getenv("COMPUTE_BACKEND", "thread")
+    COMPUTE_WORKERS: int = int(os.getenv("COMPUTE_WORKERS", "1"))
+    COMPUTE_MAX_TASKS_PER_CHILD: int = int(os.getenv("COMPUTE_MAX_TASKS_PER_CHILD", "50"))
+
+    # Upstream bars: "yfinance" or "fake" (offline, deterministic)
+    MARKET_DATA_PROVIDER: str = os.getenv("MARKET_DATA_PROVIDER", "yfinance")
+    # "batched": one download call per group of symbols, "single": one Ticker per symbol
+    FETCH_MODE: str = os.getenv("FETCH_MODE", "batched")
+    FETCH_GROUP_SIZE: int = int(os.getenv("FETCH_GROUP_SIZE", "20"))
+
+    # Local daily-bar store (memory-mapped .npy per symbol)
+    HISTORY_STORE_DIR: str = os.getenv(
+        "HISTORY_STORE_DIR",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "history"),
+    )
+    # Bars fed to the list-view indicators (EMA-50 has fully converged well before this)
+    INDICATOR_LOOKBACK_BARS: int = int(os.getenv("INDICATOR_LOOKBACK_BARS", "400"))
+
+    # Snapshot of the incremental indicator state (see app/services/indicator_state.py)
+    INDICATOR_STATE_FILE: str = os.getenv(
+        "INDICATOR_STATE_FILE",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "indicator_state.json"),
+    )
+
+    # Binary copy of the last published snapshot, loaded at startup (see app/services/snapshot_file.py)
+    SNAPSHOT_FILE: str = os.getenv(
+        "SNAPSHOT_FILE",
+        os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "market_snapshot.bin"),
+    )
+    # Background writer (app/services/persistence.py): wait this long after a
+    # snapshot is handed over so a burst of publishes is written once; shutdown
+    # waits up to PERSIST_FLUSH_TIMEOUT_S for pending writes
+    PERSIST_COALESCE_S: float = float(os.getenv("PERSIST_COALESCE_S", "2"))
+    PERSIST_FLUSH_TIMEOUT_S: float = float(os.getenv("PERSIST_FLUSH_TIMEOUT_S", "10"))
+    # Status/debug logs it appends to are rotated to "<file>.1" past this size
+    PERSIST_LOG_MAX_BYTES: int = int(os.getenv("PERSIST_LOG_MAX_BYTES", str(5 * 1024 * 1024)))
+    # On-demand upstream calls (app/services/single_flight.py): a (symbol, kind)
+    # that came back with no data is answered from memory for this long
+    UPSTREAM_NEGATIVE_TTL_S: float = float(os.getenv("UPSTREAM_NEGATIVE_TTL_S", "300"))
+
     # Groww Credentials
     GROWW_API_KEY: str = os.getenv("GROWW_API_KEY", "")
     GROWW_CLIENT_CODE: str = os.getenv("GROWW_CLIENT_CODE", "")
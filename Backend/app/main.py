@@ -11,8 +11,10 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from app.config import settings
-from app.routes import stocks, watchlist, advanced
-from app.services.stocks import refresh_market_data
+from app.routes import stocks, watchlist, advanced, metrics
+from app.services.scheduler import start_scheduler, stop_scheduler
+from app.services.compute import get_compute_backend
+from app.services.persistence import persistence
 import asyncio
 from contextlib import asynccontextmanager
 from starlette.middleware.base import BaseHTTPMiddleware
@@ -41,19 +43,23 @@ async def lifespan(app: FastAPI):
     """
     Manage application lifespan (startup and shutdown events).
 
-    On startup, it initializes a background task to refresh market data.
+    On startup, it starts the tiered refresh jobs (quotes, daily bars,
+    fundamentals); on shutdown, it cancels them, flushes pending disk writes
+    and stops the compute pool.
     """
     # Startup: Initialize background data fetch
     try:
-        asyncio.create_task(refresh_market_data())
-        print("Background task started: Market Data Refresh", flush=True)
+        start_scheduler()
+        print("Background jobs started: quotes, bars, fundamentals", flush=True)
     except Exception as e:
-        print(f"Failed to start background task: {e}", flush=True)
+        print(f"Failed to start background jobs: {e}", flush=True)
     
     yield
-    # Shutdown logic can be added here if needed
 
-    # Shutdown logic can be added here if needed
+    await stop_scheduler()
+    # Pending snapshot/log writes reach the disk before the process exits
+    await asyncio.get_running_loop().run_in_executor(None, persistence.close)
+    get_compute_backend().shutdown()
 
 app = FastAPI(
     title="NSE Stock Analyzer",
@@ -82,6 +88,8 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Let the browser client read the snapshot/pagination headers
+    expose_headers=["ETag", "X-Snapshot-Version", "X-Next-Cursor", "X-Total-Count", "X-Missing-Symbols"],
 )
 
 app.add_middleware(SecurityHeadersMiddleware)
@@ -99,6 +107,7 @@ app.add_middleware(GZipMiddleware, minimum_size=1000)
 app.include_router(stocks.router, prefix="/api/v1", tags=["Stocks"])
 app.include_router(watchlist.router, prefix="/api/v1", tags=["Watchlist"])
 app.include_router(advanced.router, prefix="/api/v1")
+app.include_router(metrics.router, prefix="/api/v1")
 
 @app.get("/", tags=["Health"])
 async def root():
@@ -1,15 +1,34 @@
-from fastapi import APIRouter
-from typing import List, Dict
+from fastapi import APIRouter, Request, Response
+from typing import List, Dict, Optional, Tuple
 import random
 import yfinance as yf
-from datetime import datetime
+from datetime import timezone
 
 # Import Services
 # from app.services.groww import groww_service # REMOVED
-from app.services.stocks import get_cached_stocks
+from app.services.snapshot import get_snapshot
+from app.services.scheduler import get_next_data_refresh
+from app.services.single_flight import upstream
+from app.utils.http_cache import conditional_get
 
 router = APIRouter(tags=["Advanced Analytics"])
 
+# --- Helper: Spot quotes (shared by options and indices) ---
+def fetch_spot_quote(y_symbol: str) -> Tuple[Optional[float], Optional[float]]:
+    """(last price, previous close) from yfinance fast_info. Blocking."""
+    ticker = yf.Ticker(y_symbol)
+    ticker._session = None # Prevent session reuse
+    # fast_info is reliable and fast
+    quote = (ticker.fast_info.last_price, ticker.fast_info.previous_close)
+    # Explicit cleanup
+    del ticker
+    return quote
+
+async def get_spot_quote(y_symbol: str) -> Tuple[Optional[float], Optional[float]]:
+    """fetch_spot_quote off the event loop, one upstream call per symbol for concurrent requests."""
+    # A missing price is usually a rate limit or network blip: never negative-cached
+    return await upstream.run(y_symbol, "quote", lambda: fetch_spot_quote(y_symbol), empty=None)
+
 # --- Helper: Lightweight Sentiment NLP ---
 BULLISH_KEYWORDS = {
     "surge", "jump", "soar", "climb", "rise", "gain", "rally", "high", "record",
@@ -59,10 +78,7 @@ async def get_options_data(symbol: str):
                    "^NSEBANK" if symbol.upper() == "BANKNIFTY" else \
                    f"{symbol}.NS"
                    
-        ticker = yf.Ticker(y_symbol)
-        ticker._session = None # Prevent session reuse
-        spot_price = ticker.fast_info.last_price
-        del ticker
+        spot_price, _ = await get_spot_quote(y_symbol)
         if not spot_price:
              # Fallback if yfinance fails
              spot_price = 24000 if symbol == "NIFTY" else 1000
@@ -139,11 +155,15 @@ async def get_sentiment_analysis():
     }
 
 @router.get("/advanced/heatmap")
-def get_sector_heatmap():
+def get_sector_heatmap(request: Request, response: Response):
     """
     Real-Time Sector Heatmap from Cached Stock Data.
     """
-    stocks = list(get_cached_stocks()) # Force list to prevent lazy leaks
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    stocks = snapshot.stocks # One immutable snapshot; nothing to copy
     
     sector_map = {}
     
@@ -182,7 +202,8 @@ def get_sector_heatmap():
     sectors.sort(key=lambda x: x['volume'], reverse=True)
     
     return {
-        "timestamp": datetime.utcnow().isoformat(), # Smaller object
+        # Snapshot build time (UTC) so the body matches its ETag
+        "timestamp": snapshot.built_at.astimezone(timezone.utc).replace(tzinfo=None).isoformat(),
         "sectors": sectors
     }
 
@@ -201,15 +222,7 @@ async def get_market_indices():
 
     for idx in indices:
         try:
-            ticker = yf.Ticker(idx["symbol"])
-            ticker._session = None # Prevent session reuse
-            
-            # fast_info is reliable and fast
-            last_price = ticker.fast_info.last_price
-            prev_close = ticker.fast_info.previous_close
-            
-            # Explicit cleanup
-            del ticker
+            last_price, prev_close = await get_spot_quote(idx["symbol"])
 
             if not last_price:
                  results.append({
@@ -0,0 +1,46 @@
+from fastapi import APIRouter
+from app.services.stocks import REFRESH_STATS
+from app.services.scheduler import get_job_stats
+from app.services.governor import get_governor_stats
+from app.services.stream import hub
+from app.utils.response_cache import response_cache
+from app.utils.query_cache import query_cache
+from app.services.persistence import persistence
+from app.services.single_flight import upstream
+
+router = APIRouter(prefix="/metrics", tags=["metrics"])
+
+@router.get("/refresh")
+async def get_refresh_metrics():
+    """Recent refresh cycles (duration, peak RSS, chosen concurrency), newest last, plus each tier's governor."""
+    return {"cycles": list(REFRESH_STATS), "governors": get_governor_stats()}
+
+@router.get("/jobs")
+async def get_job_metrics():
+    """Scheduler tiers (quotes, bars, fundamentals): next run, skipped overlaps and recent runs."""
+    return {"jobs": get_job_stats()}
+
+@router.get("/stream")
+async def get_stream_metrics():
+    """Push stream: connected subscribers, distinct topics, frames sent and slow clients dropped."""
+    return hub.stats()
+
+@router.get("/response-cache")
+async def get_response_cache_metrics():
+    """Pre-serialized list bodies held for the current snapshot version, with hit/miss counts."""
+    return response_cache.stats()
+
+@router.get("/query-cache")
+async def get_query_cache_metrics():
+    """Filter-result LRU: entries for the current snapshot version, hits, misses and shared in-flight lookups."""
+    return query_cache.stats()
+
+@router.get("/persistence")
+async def get_persistence_metrics():
+    """Background writer: pending work, and per kind of write (snapshot) the count, duration, bytes and failures."""
+    return persistence.stats()
+
+@router.get("/upstream")
+async def get_upstream_metrics():
+    """On-demand upstream calls per kind: requests, calls made, calls suppressed (shared or negative-cached), coalescing ratio."""
+    return upstream.stats()
@@ -1,20 +1,66 @@
-from fastapi import APIRouter, Query, HTTPException, BackgroundTasks
+import asyncio
+from fastapi import APIRouter, Query, HTTPException, BackgroundTasks, Request, Response, Depends
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from app.schemas import StockResponse, StockExtendedDetails
-from app.services.stocks import get_cached_stocks, get_stock_detail, fetch_stock_data, get_strength_label, enrich_stock_data
+from app.services.stocks import fetch_stock_data, get_strength_label, enrich_stock_data
+from app.services.snapshot import get_snapshot, snapshots
+from app.services.scheduler import get_next_data_refresh
 from app.config import settings
-from app.utils.filters import apply_filters
+from app.utils.filters import parse_filter_params
+from app.utils.query_cache import cached_indices
+from app.services.stream import hub, StreamFull
+from app.services.cache import cache
+from app.services.watchlist import WATCHLIST_KEY
+from app.utils.http_cache import conditional_get
+from app.utils.response_cache import cached_stock_list, cached_response
+from app.utils.movers import MOVER_KINDS
+from app.utils.projection import Projection, projection_params
+from app.utils.pagination import Page, CursorExpired, paginate
+from app.utils.wire_format import JSON, negotiate_format, encode_stock_columns
 
 router = APIRouter(prefix="/stocks", tags=["stocks"])
 
 from app.utils.market_status import get_market_status
 
+def paginate_response(response: Response, version: int, total: int,
+                      limit: Optional[int], cursor: Optional[str]) -> Page:
+    """Page bounds for ?limit=&cursor=; sets X-Total-Count and X-Next-Cursor when paging."""
+    try:
+        page = paginate(total, version, limit, cursor)
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=f"{e}; start again from the first page")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if limit is not None or cursor:
+        response.headers["X-Total-Count"] = str(total)
+        if page.next_cursor:
+            response.headers["X-Next-Cursor"] = page.next_cursor
+    return page
+
+def stock_list_response(request: Request, response: Response, snapshot, indices, page: Page,
+                        projection: Optional[Projection], media_type: str) -> Response:
+    """One page of filtered rows as JSON, or straight from the columns for Arrow/MessagePack."""
+    rows = indices[page.start:page.stop]
+    if media_type == JSON:
+        # Serialized once per (version, query); repeat polls reuse the bytes
+        return cached_stock_list(request, response, snapshot.version,
+                                 lambda: snapshot.columns.take(rows), projection)
+    return cached_response(request, response, snapshot.version,
+                           lambda: encode_stock_columns(media_type, snapshot.columns, rows, snapshot.version, projection),
+                           media_type)
+
 @router.get("/market-status")
 async def get_market_status_endpoint():
-    return get_market_status()
+    status = get_market_status()
+    next_refresh = get_next_data_refresh()
+    status["next_refresh"] = next_refresh.isoformat() if next_refresh else None
+    return status
 
 @router.get("/fno", response_model=List[StockResponse])
 async def get_fno_stocks(
+    request: Request,
+    response: Response,
     search: Optional[str] = None,
     sector: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -49,15 +95,26 @@ async def get_fno_stocks(
     min_avg3: Optional[float] = None,
     max_avg3: Optional[float] = None,
     sort_by: Optional[str] = None,
-    sort_dir: str = "asc"
+    sort_dir: str = "asc",
+    limit: Optional[int] = Query(None, ge=1, description="Page size (default: every matching row)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    projection: Optional[Projection] = Depends(projection_params),
 ):
-    # Instant fetch from cache
-    stocks = get_cached_stocks()
-    print(f"DEBUG: get_fno_stocks called. Cached stocks count: {len(stocks)}", flush=True)
-    
-    # Apply filters in-memory (fast)
-    filtered_stocks = apply_filters(
-        stocks,
+    # Instant fetch from cache: one immutable snapshot for the whole request
+    snapshot = get_snapshot()
+    # JSON by default; Arrow / MessagePack for clients that ask (Accept)
+    media_type = negotiate_format(request.headers.get("accept", ""))
+    response.headers["Vary"] = "Accept"
+    # Unchanged data + same query: answer 304 before filtering anything
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh(),
+                             variant=media_type if media_type != JSON else "")
+    if cached is not None:
+        return cached
+
+    # Apply filters in-memory (fast); row ids are cached per (version, filters)
+    indices = cached_indices(
+        snapshot.version,
+        snapshot.columns,
         search=search,
         sector=sector,
         min_price=min_price,
@@ -89,21 +146,64 @@ async def get_fno_stocks(
         p2_str=p2_str,
         p3_str=p3_str,
         avg3_str=avg3_str,
-        
+    
         min_avg3=min_avg3,
         max_avg3=max_avg3,
-        sort_by=sort_by,
-        sort_dir=sort_dir
+        # Ensure default sort is by Rank (Stability) if no sort specified
+        sort_by=sort_by or "rank",
+        sort_dir=sort_dir if sort_by else "asc"
+    )
+    page = paginate_response(response, snapshot.version, len(indices), limit, cursor)
+    return stock_list_response(request, response, snapshot, indices, page, projection, media_type)
+
+@router.get("/fno/changes")
+async def get_fno_changes(request: Request, response: Response, since: int = Query(..., description="Version the client has")):
+    """
+    Rows changed since version `since`: {symbol: {dotted field: new value}},
+    plus added/removed symbols. full_reload=true means `since` is too old to
+    diff against; fetch /stocks/fno again.
+    """
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    return snapshots.changes_since(since)
+
+@router.get("/stream")
+async def stream_updates(
+    request: Request,
+    symbols: Optional[str] = Query(None, description="Comma-separated symbols to follow (default: all)"),
+    watchlist: bool = Query(False, description="Follow the saved watchlist"),
+):
+    """
+    Server-Sent Events: a "snapshot" frame, then a "delta" frame per publish
+    that touches the subscription. Any /stocks/fno filter parameter
+    (sector, min_change_pct, rsi_zone, ...) narrows the subscription further.
+    """
+    followed = None
+    if watchlist:
+        followed = set(cache.get(WATCHLIST_KEY) or [])
+    if symbols:
+        requested = {s.strip() for s in symbols.split(",") if s.strip()}
+        followed = requested if followed is None else followed | requested
+    try:
+        filters = parse_filter_params(request.query_params)
+        subscriber = hub.subscribe(followed, filters)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid filter: {e}")
+    except StreamFull:
+        raise HTTPException(status_code=503, detail="Too many stream subscribers, retry later")
+    return StreamingResponse(
+        hub.frames(subscriber),
+        media_type="text/event-stream",
+        # Keep reverse proxies (nginx) from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    
-    # Ensure default sort is by Rank (Stability) if no sort specified
-    if not sort_by:
-        filtered_stocks.sort(key=lambda x: x.rank)
-        
-    return filtered_stocks
 
 @router.get("/strength-analyzer", response_model=List[StockResponse])
 async def get_strength_analysis(
+    request: Request,
+    response: Response,
     search: Optional[str] = None,
     sector: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -132,13 +232,23 @@ async def get_strength_analysis(
     min_avg3: Optional[float] = None,
     max_avg3: Optional[float] = None,
     sort_by: Optional[str] = None,
-    sort_dir: str = "asc"
+    sort_dir: str = "asc",
+    limit: Optional[int] = Query(None, ge=1, description="Page size (default: every matching row)"),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor from the previous page"),
+    projection: Optional[Projection] = Depends(projection_params),
 ):
     # Reuse existing filter logic
-    stocks = get_cached_stocks()
-    
-    filtered_stocks = apply_filters(
-        stocks,
+    snapshot = get_snapshot()
+    media_type = negotiate_format(request.headers.get("accept", ""))
+    response.headers["Vary"] = "Accept"
+    # Unchanged data + same query: answer 304 before filtering anything
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh(),
+                             variant=media_type if media_type != JSON else "")
+    if cached is not None:
+        return cached
+    indices = cached_indices(
+        snapshot.version,
+        snapshot.columns,
         search=search,
         sector=sector,
         min_price=min_price,
@@ -169,23 +279,77 @@ async def get_strength_analysis(
         sort_by=sort_by,
         sort_dir=sort_dir
     )
+    page = paginate_response(response, snapshot.version, len(indices), limit, cursor)
 
     # StockResponse already contains strength fields now, so we can just return it
-    return filtered_stocks
+    return stock_list_response(request, response, snapshot, indices, page, projection, media_type)
 
 @router.get("/gainers-3day", response_model=List[StockResponse])
-async def get_gainers_3day(limit: int = 20):
-    stocks = get_cached_stocks()
-    # Sort by avg_3day descending
-    sorted_stocks = sorted(stocks, key=lambda x: x.history.avg_3day, reverse=True)
-    return sorted_stocks[:limit]
+async def get_gainers_3day(request: Request, response: Response, limit: int = 20,
+                          projection: Optional[Projection] = Depends(projection_params)):
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    # Sort by avg_3day descending (precomputed at publish)
+    return cached_stock_list(request, response, snapshot.version,
+                             lambda: snapshot.movers.top("gainers-3day", limit), projection)
 
 @router.get("/losers-3day", response_model=List[StockResponse])
-async def get_losers_3day(limit: int = 20):
-    stocks = get_cached_stocks()
-    # Sort by avg_3day ascending
-    sorted_stocks = sorted(stocks, key=lambda x: x.history.avg_3day)
-    return sorted_stocks[:limit]
+async def get_losers_3day(request: Request, response: Response, limit: int = 20,
+                          projection: Optional[Projection] = Depends(projection_params)):
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    # Sort by avg_3day ascending (precomputed at publish)
+    return cached_stock_list(request, response, snapshot.version,
+                             lambda: snapshot.movers.top("losers-3day", limit), projection)
+
+@router.get("/movers", response_model=List[StockResponse])
+async def get_movers(
+    request: Request,
+    response: Response,
+    kind: str = Query("gainers-3day", description=f"One of: {', '.join(MOVER_KINDS)}"),
+    limit: int = Query(20, ge=1, le=500),
+    sector: Optional[str] = None,
+    projection: Optional[Projection] = Depends(projection_params),
+):
+    """Top `limit` stocks for a ranking, overall or within one sector, sliced from the snapshot's precomputed order."""
+    if kind not in MOVER_KINDS:
+        raise HTTPException(status_code=422, detail=f"Unknown kind {kind!r}, expected one of {list(MOVER_KINDS)}")
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    return cached_stock_list(request, response, snapshot.version,
+                             lambda: snapshot.movers.top(kind, limit, sector), projection)
+
+@router.get("/batch", response_model=List[StockResponse])
+async def get_stocks_batch(
+    request: Request,
+    response: Response,
+    symbols: str = Query(..., description="Comma-separated symbols, e.g. RELIANCE.NS,TCS.NS"),
+    projection: Optional[Projection] = Depends(projection_params),
+):
+    """
+    Many symbols in one call (watchlist, comparison views), in the order
+    asked for. Served from the snapshot only: symbols it doesn't have are
+    left out and listed in the X-Missing-Symbols header.
+    """
+    wanted = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if len(wanted) > settings.BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=422, detail=f"At most {settings.BATCH_MAX_SYMBOLS} symbols per request")
+    snapshot = get_snapshot()
+    cached = conditional_get(request, response, snapshot.version, get_next_data_refresh())
+    if cached is not None:
+        return cached
+    result = cached_stock_list(request, response, snapshot.version,
+                               lambda: snapshot.get_many(wanted, keep_order=True), projection)
+    missing = [s for s in wanted if s not in snapshot.positions]
+    if missing:
+        result.headers["X-Missing-Symbols"] = ",".join(missing)
+    return result
 
 @router.get("/{symbol}/details", response_model=StockExtendedDetails)
 async def get_stock_details(symbol: str):
@@ -209,13 +373,14 @@ async def get_stock_details(symbol: str):
 
 @router.get("/{symbol}", response_model=StockResponse)
 async def get_stock(symbol: str):
-    stock = get_stock_detail(symbol)
+    stock = get_snapshot().get(symbol)
     if not stock:
         # Try fetching if not in cache (e.g. first load)
         stock = await fetch_stock_data(symbol)
         if not stock:
             raise HTTPException(status_code=404, detail="Stock not found")
             
-    # Enrich with detailed data on demand
-    stock = enrich_stock_data(stock)
+    # Enrich with detailed data on demand (returns a copy; the snapshot stays as published).
+    # Cold symbols hit upstream, so it runs in the threadpool, never on the event loop.
+    stock = await asyncio.get_running_loop().run_in_executor(None, enrich_stock_data, stock)
     return stock
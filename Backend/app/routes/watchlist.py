@@ -3,12 +3,10 @@ from typing import List
 from app.schemas import StockResponse, WatchlistAdd, WatchlistResponse
 from app.services.stocks import get_stocks_by_symbols
 from app.services.cache import cache
+from app.services.watchlist import WATCHLIST_KEY
 
 router = APIRouter(prefix="/watchlist", tags=["watchlist"])
 
-# Simple in-memory watchlist for demo (per user session ideally, but global here)
-WATCHLIST_KEY = "user_watchlist"
-
 @router.get("/", response_model=List[StockResponse])
 async def get_watchlist():
     symbols = cache.get(WATCHLIST_KEY) or []
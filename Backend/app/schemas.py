@@ -1,10 +1,14 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 
 # --- Stock Schemas ---
+# Frozen: these are shared through immutable snapshots (app/services/snapshot.py),
+# so derive variations with model_copy(update=...) instead of assigning fields.
 
 class ChartDataPoint(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     date: str
     open: float
     high: float
@@ -19,6 +23,8 @@ class ChartDataPoint(BaseModel):
     ema_50: Optional[float] = None
 
 class StockHistory(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     p_day1: float
     p_day2: float
     p_day3: float
@@ -26,6 +32,8 @@ class StockHistory(BaseModel):
     volatility_3_day: float
 
 class Indicators(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     macd_line: Optional[float] = None
     signal_line: Optional[float] = None
     macd_histogram: Optional[float] = None
@@ -42,6 +50,8 @@ class Indicators(BaseModel):
     strength_label: str  # buyers, sellers, balanced
 
 class StockFlags(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     is_constant_price: bool
     is_gainer_today: bool
     is_loser_today: bool
@@ -49,6 +59,8 @@ class StockFlags(BaseModel):
     is_breakout_candidate: bool
 
 class StockResponse(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     symbol: str
     name: str
     sector: str
@@ -59,6 +71,8 @@ class StockResponse(BaseModel):
     day_high: float
     day_low: float
     volume: int
+    # Today's volume / 3-month average volume (None when the average is unknown)
+    volume_ratio: Optional[float] = None
     market_cap: Optional[float] = None
     last_updated: datetime
     rank: int
@@ -0,0 +1,89 @@
+"""
+Where the refresh's CPU-bound work runs.
+
+- "inline":  on the event loop thread (no overhead, but API requests wait)
+- "thread":  a small thread pool; numpy releases the GIL for the vectorized
+             parts, the pure-Python record building still contends for it
+- "process": a spawn-based process pool; arguments and results are pickled,
+             so callers send plain arrays and get compact records back.
+             Workers are replaced every COMPUTE_MAX_TASKS_PER_CHILD batches,
+             which caps how much memory a long-lived worker can accumulate
+             (Python 3.11+; older runtimes keep their workers).
+
+Functions handed to run() must be module-level (picklable) and must not
+touch module-level state, since in process mode they run in another
+interpreter.
+"""
+import asyncio
+import multiprocessing
+import sys
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.config import settings
+
+MODES = ("inline", "thread", "process")
+
+
+class ComputeBackend:
+    def __init__(self, mode: str = "thread", workers: int = 1, max_tasks_per_child: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"Unknown compute backend {mode!r}, expected one of {MODES}")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[Executor] = None
+
+    @property
+    def out_of_process(self) -> bool:
+        """True if results cross a process boundary (return compact records)."""
+        return self.mode == "process"
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                recycle = {}
+                if self.max_tasks_per_child:
+                    if sys.version_info >= (3, 11):
+                        recycle["max_tasks_per_child"] = self.max_tasks_per_child
+                    else:
+                        print("Compute workers can't be recycled before Python 3.11; "
+                              "COMPUTE_MAX_TASKS_PER_CHILD is ignored", flush=True)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    # fork would copy the parent's caches and threads into every worker
+                    mp_context=multiprocessing.get_context("spawn"),
+                    **recycle,
+                )
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="compute")
+        return self._executor
+
+    async def run(self, fn: Callable, *args):
+        if self.mode == "inline":
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), fn, *args)
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+
+
+compute_backend = ComputeBackend(
+    mode=settings.COMPUTE_BACKEND,
+    workers=settings.COMPUTE_WORKERS,
+    max_tasks_per_child=settings.COMPUTE_MAX_TASKS_PER_CHILD or None,
+)
+
+
+def set_compute_backend(backend: ComputeBackend) -> ComputeBackend:
+    """Swap the active backend (benchmarks, tests); returns the previous one."""
+    global compute_backend
+    previous, compute_backend = compute_backend, backend
+    return previous
+
+
+def get_compute_backend() -> ComputeBackend:
+    return compute_backend
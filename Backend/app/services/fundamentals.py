@@ -0,0 +1,142 @@
+"""
+Cached fundamentals (the ticker.info fields the detail view shows).
+
+Fundamentals move at most once a day, so the nightly job in
+app/services/scheduler.py refreshes them for the whole universe and the
+detail view reads them from here. A symbol that isn't cached yet, or whose
+entry is older than FUNDAMENTALS_TTL_S (the nightly job skipped it), is
+fetched on demand; if that fetch fails the stale entry is served. Only the
+handful of fields enrich_stock_data uses are kept, not yfinance's full info
+dict (150+ keys per symbol).
+"""
+import json
+import os
+import tempfile
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.services.market_data import get_provider
+from app.services.single_flight import upstream
+from app.utils.market_status import get_current_ist_time
+
+FUNDAMENTAL_FIELDS = (
+    "trailingPE", "industryPE", "dividendYield", "returnOnEquity", "returnOnAssets",
+    "trailingEps", "bookValue", "priceToBook", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+    "fiftyDayAverage", "twoHundredDayAverage",
+)
+
+
+class FundamentalsCache:
+    """Per-symbol fundamentals with fetch timestamps, snapshot-able to a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        # When the last full (nightly) refresh finished
+        self.refreshed_at: Optional[datetime] = None
+        self.dirty = False
+        # Detail requests (executor threads) and the nightly job write concurrently
+        self._lock = threading.Lock()
+
+    def get(self, symbol: str, max_age_s: Optional[float] = None) -> Optional[Dict]:
+        """Cached fundamentals, or None if absent (or older than max_age_s, when given)."""
+        entry = self.entries.get(symbol)
+        if not entry:
+            return None
+        if max_age_s is not None:
+            age = (datetime.now() - datetime.fromisoformat(entry["fetched_at"])).total_seconds()
+            if age > max_age_s:
+                return None
+        return entry["data"]
+
+    def put(self, symbol: str, info: Dict) -> Dict:
+        # Absent keys stay absent so info.get(key, fallback) keeps working for callers
+        data = {k: info[k] for k in FUNDAMENTAL_FIELDS if k in info}
+        with self._lock:
+            self.entries[symbol] = {"data": data, "fetched_at": datetime.now().isoformat()}
+            self.dirty = True
+        return data
+
+    def save(self) -> bool:
+        with self._lock:
+            if not self.dirty:
+                return False
+            payload = json.dumps({
+                "refreshed_at": self.refreshed_at.isoformat() if self.refreshed_at else None,
+                "entries": self.entries,
+            })
+            self.dirty = False
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            self.dirty = True
+            raise
+        return True
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            self.entries = raw["entries"]
+            self.refreshed_at = datetime.fromisoformat(raw["refreshed_at"]) if raw.get("refreshed_at") else None
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Fundamentals snapshot unreadable, starting fresh: {e}", flush=True)
+            self.entries, self.refreshed_at = {}, None
+        self.dirty = False
+        return len(self.entries)
+
+
+fundamentals_cache = FundamentalsCache(settings.FUNDAMENTALS_FILE)
+
+
+def get_fundamentals(symbol: str) -> Dict:
+    """
+    Cached fundamentals for symbol; fetched (and cached) when missing or older
+    than FUNDAMENTALS_TTL_S. Blocking on a miss, so call it off the event loop.
+    """
+    data = fundamentals_cache.get(symbol, max_age_s=settings.FUNDAMENTALS_TTL_S)
+    if data is not None:
+        return data
+    try:
+        # Shared with concurrent detail requests for the same symbol
+        info = upstream.call(symbol, "fundamentals", lambda: get_provider().fetch_fundamentals(symbol), empty=None)
+    except Exception as e:
+        stale = fundamentals_cache.get(symbol)
+        if stale is None:
+            raise
+        print(f"Fundamentals fetch failed for {symbol}, serving cached: {e}", flush=True)
+        return stale
+    data = fundamentals_cache.put(symbol, info)
+    fundamentals_cache.save()
+    return data
+
+
+def refresh_fundamentals(symbols: List[str], refreshed_at: Optional[datetime] = None) -> int:
+    """
+    Re-fetch fundamentals for every symbol (one upstream call each, there is
+    no batch endpoint). Failures keep the previous entry. Blocking; run it
+    from an executor. Returns the number of symbols refreshed.
+    """
+    provider = get_provider()
+    refreshed = 0
+    for symbol in symbols:
+        try:
+            fundamentals_cache.put(symbol, provider.fetch_fundamentals(symbol))
+            refreshed += 1
+        except Exception as e:
+            print(f"Fundamentals fetch failed for {symbol}: {e}", flush=True)
+    fundamentals_cache.refreshed_at = refreshed_at or get_current_ist_time()
+    fundamentals_cache.dirty = True
+    fundamentals_cache.save()
+    return refreshed
@@ -0,0 +1,131 @@
+"""
+Adaptive refresh concurrency, bounded by process RSS.
+
+Instead of hand-tuned constants (the old Semaphore(1) / BATCH_SIZE = 10 /
+25-stock cap), each refresh tier has a governor that picks the pipeline's
+fetch concurrency, fetch group size and compute micro-batch for the next
+cycle from how the previous one went:
+
+- peak RSS reached the ceiling    -> halve everything (multiplicative decrease)
+- slower than the target cycle    -> one more fetcher, or larger groups once
+  and predicted peak has headroom    fetchers are maxed (additive increase)
+- otherwise                       -> hold
+
+The predicted peak scales the cycle's RSS growth (peak - start) by the change
+in in-flight load (fetchers x group size). Within a cycle, admit() pauses
+every fetcher but the first while RSS is over the ceiling, so one cycle
+can't run away before the next adjustment.
+"""
+import asyncio
+import gc
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict
+
+from app.config import settings
+from app.utils.memory import get_rss_mb
+
+# Grow only while the predicted peak stays below this share of the ceiling
+_HEADROOM = 0.85
+
+
+@dataclass
+class PipelineParams:
+    fetch_concurrency: int
+    group_size: int
+    compute_batch: int
+
+
+class ConcurrencyGovernor:
+    def __init__(self, start: PipelineParams, target_cycle_s: float,
+                 memory_ceiling_mb: float = settings.GOVERNOR_MEMORY_CEILING_MB,
+                 max_fetch_concurrency: int = settings.GOVERNOR_MAX_FETCH_CONCURRENCY,
+                 max_group_size: int = settings.GOVERNOR_MAX_GROUP_SIZE,
+                 max_pause_s: float = settings.GOVERNOR_MAX_PAUSE_S):
+        self.params = PipelineParams(**asdict(start))
+        self.target_cycle_s = target_cycle_s
+        self.memory_ceiling_mb = memory_ceiling_mb
+        self.max_fetch_concurrency = max(1, max_fetch_concurrency)
+        # A start group of 1 means single-symbol fetching; keep it that way
+        self.max_group_size = 1 if start.group_size <= 1 else max(start.group_size, max_group_size)
+        self.max_compute_batch = max(1, start.compute_batch * 2)
+        self.max_pause_s = max_pause_s
+        self.pauses = 0
+        self.last_action = "start"
+
+    def current(self) -> Dict[str, int]:
+        return asdict(self.params)
+
+    async def admit(self, worker: int) -> None:
+        """Called by fetch worker `worker` before each group; worker 0 never waits."""
+        if worker == 0 or get_rss_mb() < self.memory_ceiling_mb:
+            return
+        self.pauses += 1
+        gc.collect()
+        deadline = time.monotonic() + self.max_pause_s
+        while get_rss_mb() >= self.memory_ceiling_mb and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    def record(self, start_rss_mb: float, peak_rss_mb: float, duration_s: float) -> str:
+        """Adjust the parameters for the next cycle; returns the action taken."""
+        p = self.params
+        if peak_rss_mb >= self.memory_ceiling_mb:
+            p.fetch_concurrency = max(1, p.fetch_concurrency // 2)
+            p.group_size = max(1, p.group_size // 2)
+            p.compute_batch = max(1, p.compute_batch // 2)
+            action = "shrink"
+        elif duration_s > self.target_cycle_s:
+            load = p.fetch_concurrency * p.group_size
+            if p.fetch_concurrency < self.max_fetch_concurrency:
+                grown = (p.fetch_concurrency + 1, p.group_size)
+            else:
+                grown = (p.fetch_concurrency, min(self.max_group_size, p.group_size + max(1, p.group_size // 4)))
+            growth = max(0.0, peak_rss_mb - start_rss_mb)
+            predicted = start_rss_mb + growth * (grown[0] * grown[1]) / load
+            if grown[0] * grown[1] > load and predicted < self.memory_ceiling_mb * _HEADROOM:
+                p.fetch_concurrency, p.group_size = grown
+                p.compute_batch = min(self.max_compute_batch, max(p.compute_batch, p.group_size))
+                action = "grow"
+            else:
+                action = "hold"
+        else:
+            action = "hold"
+        self.last_action = action
+        return action
+
+    def stats(self) -> dict:
+        return {
+            **self.current(),
+            "target_cycle_s": self.target_cycle_s,
+            "memory_ceiling_mb": self.memory_ceiling_mb,
+            "pauses": self.pauses,
+            "last_action": self.last_action,
+        }
+
+
+def _build(tier: str) -> ConcurrencyGovernor:
+    batched = settings.FETCH_MODE == "batched"
+    if tier == "quotes":
+        group, target = settings.QUOTE_GROUP_SIZE, settings.QUOTES_TARGET_CYCLE_S
+    else:
+        group, target = settings.FETCH_GROUP_SIZE, settings.BARS_TARGET_CYCLE_S
+    start = PipelineParams(
+        fetch_concurrency=settings.REFRESH_FETCH_CONCURRENCY,
+        # Single mode fetches one Ticker per symbol whatever the group size
+        group_size=group if batched else 1,
+        compute_batch=settings.REFRESH_COMPUTE_BATCH,
+    )
+    return ConcurrencyGovernor(start, target_cycle_s=target)
+
+
+_governors: Dict[str, ConcurrencyGovernor] = {}
+
+
+def get_governor(tier: str) -> ConcurrencyGovernor:
+    if tier not in _governors:
+        _governors[tier] = _build(tier)
+    return _governors[tier]
+
+
+def get_governor_stats() -> Dict[str, dict]:
+    return {tier: g.stats() for tier, g in _governors.items()}
@@ -0,0 +1,186 @@
+"""
+Local on-disk store of daily OHLCV bars.
+
+Each symbol is kept as a single (6, n) float64 .npy file: row 0 holds the
+bar dates (days since epoch), rows 1-5 hold open/high/low/close/volume.
+Every row is contiguous, so each column can be sliced straight out of a
+memory-mapped read without copying the rest of the file.
+
+Writes go to a temp file in the same directory and are swapped in with
+os.replace, so readers never see a half-written file.
+"""
+import json
+import os
+import tempfile
+from dataclasses import dataclass
+from datetime import date, datetime
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from app.config import settings
+
+COLUMNS = ("open", "high", "low", "close", "volume")
+_DATE_ROW = 0
+
+
+@dataclass(frozen=True)
+class Bars:
+    """Daily bars for one symbol as parallel numpy arrays (oldest first)."""
+    dates: np.ndarray   # datetime64[D]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.dates)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.dates) == 0
+
+    @property
+    def last_date(self) -> Optional[date]:
+        if self.empty:
+            return None
+        return self.dates[-1].astype(date)
+
+    def tail(self, n: int) -> "Bars":
+        return Bars(*(getattr(self, f)[-n:] for f in ("dates",) + COLUMNS))
+
+    def index_of(self, target) -> Optional[int]:
+        """Position of the bar dated `target` (date/datetime), or None."""
+        key = np.datetime64(target.strftime("%Y-%m-%d"), "D")
+        pos = int(np.searchsorted(self.dates, key))
+        if pos < len(self.dates) and self.dates[pos] == key:
+            return pos
+        return None
+
+
+def frame_to_matrix(df: pd.DataFrame) -> np.ndarray:
+    """Convert a yfinance history frame to the (6, n) on-disk layout."""
+    index = df.index
+    if getattr(index, "tz", None) is not None:
+        index = index.tz_localize(None)
+    days = index.normalize().values.astype("datetime64[D]").astype(np.int64)
+    matrix = np.empty((len(COLUMNS) + 1, len(df)), dtype=np.float64)
+    matrix[_DATE_ROW] = days
+    for row, col in enumerate(COLUMNS, start=1):
+        matrix[row] = df[col.capitalize()].to_numpy(dtype=np.float64)
+    return matrix
+
+
+def matrix_to_bars(matrix: np.ndarray) -> Bars:
+    return Bars(
+        matrix[_DATE_ROW].astype(np.int64).astype("datetime64[D]"),
+        *(matrix[row] for row in range(1, len(COLUMNS) + 1)),
+    )
+
+
+def merge_matrix(old: np.ndarray, new: np.ndarray) -> np.ndarray:
+    """`old` with every bar dated on or after new's first bar replaced by `new`."""
+    keep = old[:, old[_DATE_ROW] < new[_DATE_ROW, 0]]
+    return np.concatenate([keep, new], axis=1)
+
+
+class HistoryStore:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, symbol: str, ext: str) -> str:
+        safe = symbol.replace("/", "_").replace(os.sep, "_")
+        return os.path.join(self.root, f"{safe}.{ext}")
+
+    def _load(self, symbol: str) -> Optional[np.ndarray]:
+        path = self._path(symbol, "npy")
+        if not os.path.exists(path):
+            return None
+        try:
+            return np.load(path, mmap_mode="r")
+        except (ValueError, OSError) as e:
+            print(f"History store: unreadable file for {symbol}: {e}", flush=True)
+            return None
+
+    def _write_atomic(self, path: str, writer) -> None:
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def read(self, symbol: str) -> Optional[Bars]:
+        """Memory-mapped view of the stored bars, or None if nothing is stored."""
+        matrix = self._load(symbol)
+        if matrix is None:
+            return None
+        return matrix_to_bars(matrix)
+
+    def read_overlay(self, symbol: str, new: Optional[np.ndarray]) -> Optional[Bars]:
+        """
+        Stored bars with a (6, n) bar matrix upserted in memory only, as
+        append() would, without writing anything. None if nothing is stored.
+        """
+        matrix = self._load(symbol)
+        if matrix is None or matrix.shape[1] == 0:
+            return None
+        if new is not None and new.shape[1]:
+            matrix = merge_matrix(matrix, new)
+        return matrix_to_bars(matrix)
+
+    def last_date(self, symbol: str) -> Optional[date]:
+        matrix = self._load(symbol)
+        if matrix is None or matrix.shape[1] == 0:
+            return None
+        return np.datetime64(int(matrix[_DATE_ROW, -1]), "D").astype(date)
+
+    def is_full(self, symbol: str) -> bool:
+        """True if the stored bars go back to the first listed day."""
+        return self.meta(symbol).get("full", False)
+
+    def meta(self, symbol: str) -> dict:
+        path = self._path(symbol, "json")
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, symbol: str, full: bool) -> None:
+        payload = json.dumps({"full": full, "synced_at": datetime.now().isoformat()}).encode()
+        self._write_atomic(self._path(symbol, "json"), lambda f: f.write(payload))
+
+    def replace(self, symbol: str, matrix: np.ndarray, full: bool = False) -> None:
+        """Overwrite the stored bars for symbol with a (6, n) bar matrix."""
+        self._write_atomic(self._path(symbol, "npy"), lambda f: np.save(f, matrix))
+        self._write_meta(symbol, full)
+
+    def append(self, symbol: str, new: np.ndarray) -> int:
+        """
+        Upsert a (6, n) bar matrix onto the stored history.
+
+        Stored bars dated on or after the first new bar are dropped first, so
+        re-fetching from the last stored date replaces a partial intraday bar
+        instead of duplicating it. Returns the number of bars written.
+        """
+        if new.shape[1] == 0:
+            return 0
+        old = self._load(symbol)
+        if old is None:
+            self.replace(symbol, new)
+            return new.shape[1]
+        merged = merge_matrix(old, new)
+        full = self.is_full(symbol)
+        self._write_atomic(self._path(symbol, "npy"), lambda f: np.save(f, merged))
+        self._write_meta(symbol, full)
+        return new.shape[1]
+
+
+history_store = HistoryStore(settings.HISTORY_STORE_DIR)
@@ -0,0 +1,229 @@
+"""
+Vectorized indicator engine over a symbols x days price matrix.
+
+Computes the same MACD / RSI / EMA / SMA values as the per-series helpers in
+app/services/indicators.py, but for the whole universe in one pass: the time
+axis is walked once and every step updates all symbols together.
+
+Rows are aligned on their most recent bar (right-aligned); shorter histories
+are left-padded with NaN, and each row only ever sees its own bars, so the
+numbers match running the pandas helpers on each symbol separately.
+"""
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from app.services.history_store import Bars
+
+# Trailing window of the average volume (about three months, like the quote feed's figure)
+AVG_VOLUME_DAYS = 63
+
+SERIES = ("macd", "signal", "hist", "rsi", "ema_20", "ema_50", "sma_20", "sma_50")
+
+
+@dataclass
+class PriceMatrix:
+    symbols: List[str]
+    lengths: np.ndarray  # real bar count per row
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    volume: np.ndarray
+
+
+@dataclass
+class SymbolIndicators:
+    """Indicator series for one symbol, aligned with its own bars."""
+    macd: np.ndarray
+    signal: np.ndarray
+    hist: np.ndarray
+    rsi: np.ndarray
+    ema_20: np.ndarray
+    ema_50: np.ndarray
+    sma_20: np.ndarray
+    sma_50: np.ndarray
+    year_high: float
+    year_low: float
+    avg_volume: float
+
+    def latest(self) -> Dict[str, Optional[float]]:
+        out = {}
+        for name in SERIES:
+            series = getattr(self, name)
+            val = series[-1] if len(series) else np.nan
+            out[name] = None if np.isnan(val) else float(val)
+        return out
+
+
+@dataclass
+class IndicatorMatrix:
+    symbols: List[str]
+    lengths: np.ndarray
+    macd: np.ndarray
+    signal: np.ndarray
+    hist: np.ndarray
+    rsi: np.ndarray
+    ema_20: np.ndarray
+    ema_50: np.ndarray
+    sma_20: np.ndarray
+    sma_50: np.ndarray
+    year_high: np.ndarray
+    year_low: np.ndarray
+    avg_volume: np.ndarray
+
+    def __post_init__(self):
+        self._rows = {s: i for i, s in enumerate(self.symbols)}
+
+    def for_symbol(self, symbol: str) -> Optional[SymbolIndicators]:
+        i = self._rows.get(symbol)
+        if i is None:
+            return None
+        n = int(self.lengths[i])
+        return SymbolIndicators(
+            *(getattr(self, name)[i, -n:] if n else getattr(self, name)[i, :0] for name in SERIES),
+            year_high=float(self.year_high[i]),
+            year_low=float(self.year_low[i]),
+            avg_volume=float(self.avg_volume[i]),
+        )
+
+    def latest(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """Latest value of every series, keyed by symbol."""
+        last = {name: getattr(self, name)[:, -1] for name in SERIES}
+        return {
+            symbol: {name: (None if np.isnan(last[name][i]) else float(last[name][i])) for name in SERIES}
+            for i, symbol in enumerate(self.symbols)
+        }
+
+
+def stack_bars(bars_by_symbol: Dict[str, Bars], max_days: Optional[int] = None) -> PriceMatrix:
+    """
+    Build right-aligned (N, T) close/high/low/volume matrices from stored bars.
+
+    max_days trims every row to its most recent bars; the indicators need
+    ~60 bars to settle, so callers that only want latest values can pass a
+    window instead of stacking full histories.
+    """
+    symbols = [s for s, b in bars_by_symbol.items() if b is not None and not b.empty]
+    lengths = np.array([len(bars_by_symbol[s]) for s in symbols], dtype=np.int64)
+    if max_days is not None:
+        lengths = np.minimum(lengths, max_days)
+    width = int(lengths.max()) if len(lengths) else 0
+
+    mats = {col: np.full((len(symbols), width), np.nan) for col in ("close", "high", "low", "volume")}
+    for i, symbol in enumerate(symbols):
+        bars = bars_by_symbol[symbol]
+        n = int(lengths[i])
+        for col, mat in mats.items():
+            mat[i, width - n:] = getattr(bars, col)[-n:]
+    return PriceMatrix(symbols, lengths, **mats)
+
+
+def ewm_mean(x: np.ndarray, span: int) -> np.ndarray:
+    """Row-wise equivalent of pd.Series.ewm(span=span, adjust=False).mean()."""
+    alpha = 2.0 / (span + 1.0)
+    old_wt_factor = 1.0 - alpha
+    n_rows, n_cols = x.shape
+    out = np.empty_like(x, dtype=np.float64)
+    if n_cols == 0:
+        return out
+
+    weighted = x[:, 0].astype(np.float64, copy=True)
+    old_wt = np.ones(n_rows)
+    out[:, 0] = weighted
+    with np.errstate(invalid="ignore"):
+        for t in range(1, n_cols):
+            cur = x[:, t]
+            is_obs = cur == cur
+            started = weighted == weighted
+            # Missing observations still decay the old weight (ignore_na=False)
+            old_wt = np.where(started, old_wt * old_wt_factor, old_wt)
+            blended = (old_wt * weighted + alpha * cur) / (old_wt + alpha)
+            update = started & is_obs & (weighted != cur)
+            weighted = np.where(update, blended, weighted)
+            old_wt = np.where(started & is_obs, 1.0, old_wt)
+            weighted = np.where(~started & is_obs, cur, weighted)
+            out[:, t] = weighted
+    return out
+
+
+def rolling_mean(x: np.ndarray, window: int) -> np.ndarray:
+    """Row-wise equivalent of pd.Series.rolling(window).mean() (NaN until a full window)."""
+    out = np.full(x.shape, np.nan)
+    if x.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(x, window, axis=1).sum(axis=-1) / window
+    return out
+
+
+def _first_valid(x: np.ndarray) -> np.ndarray:
+    valid = ~np.isnan(x)
+    first = valid.argmax(axis=1)
+    first[~valid.any(axis=1)] = x.shape[1]
+    return first
+
+
+def rsi(close: np.ndarray, period: int = 14) -> np.ndarray:
+    """Row-wise equivalent of indicators.calculate_rsi (simple rolling means of gains/losses)."""
+    delta = np.full(close.shape, np.nan)
+    delta[:, 1:] = np.diff(close, axis=1)
+    # Series.where(cond, 0) turns NaN deltas into 0, including the first bar
+    with np.errstate(invalid="ignore"):
+        gain = np.where(delta > 0, delta, 0.0)
+        loss = np.where(delta < 0, -delta, 0.0)
+    avg_gain = rolling_mean(gain, period)
+    avg_loss = rolling_mean(loss, period)
+
+    # Windows reaching into the left padding do not exist for the real series
+    cols = np.arange(close.shape[1])
+    padded = cols[None, :] < (_first_valid(close) + period - 1)[:, None]
+    avg_gain[padded] = np.nan
+    avg_loss[padded] = np.nan
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = avg_gain / avg_loss
+        return 100 - (100 / (1 + rs))
+
+
+def _tail_stat(x: np.ndarray, lengths: np.ndarray, days: int, fn) -> np.ndarray:
+    tail = x[:, -days:] if x.shape[1] else x
+    out = np.full(x.shape[0], np.nan)
+    has_data = lengths > 0
+    if has_data.any():
+        with np.errstate(invalid="ignore"):
+            out[has_data] = fn(tail[has_data], axis=1)
+    return out
+
+
+def compute_indicators(prices: PriceMatrix) -> IndicatorMatrix:
+    """Compute every indicator for all rows of the price matrix in one pass."""
+    close = prices.close
+    ema_12 = ewm_mean(close, 12)
+    ema_26 = ewm_mean(close, 26)
+    macd = ema_12 - ema_26
+    signal = ewm_mean(macd, 9)
+
+    return IndicatorMatrix(
+        symbols=prices.symbols,
+        lengths=prices.lengths,
+        macd=macd,
+        signal=signal,
+        hist=macd - signal,
+        rsi=rsi(close),
+        ema_20=ewm_mean(close, 20),
+        ema_50=ewm_mean(close, 50),
+        sma_20=rolling_mean(close, 20),
+        sma_50=rolling_mean(close, 50),
+        year_high=_tail_stat(prices.high, prices.lengths, 252, np.nanmax),
+        year_low=_tail_stat(prices.low, prices.lengths, 252, np.nanmin),
+        avg_volume=_tail_stat(prices.volume, prices.lengths, AVG_VOLUME_DAYS, np.nanmean),
+    )
+
+
+def compute_for_bars(bars_by_symbol: Dict[str, Bars], max_days: Optional[int] = None) -> IndicatorMatrix:
+    return compute_indicators(stack_bars(bars_by_symbol, max_days=max_days))
+
+
+def compute_for_symbol(symbol: str, bars: Bars) -> Optional[SymbolIndicators]:
+    """Single-symbol convenience wrapper (a 1 x T matrix)."""
+    return compute_for_bars({symbol: bars}).for_symbol(symbol)
@@ -0,0 +1,325 @@
+"""
+Incremental (O(1) per bar) indicator state for live updates.
+
+Each SymbolIndicatorState keeps the recursive state behind the list-view
+indicators: the EMA values (12/26 for MACD, 9 for the signal, 20/50), the
+rolling gain/loss windows behind RSI and the rolling sums behind SMA 20/50.
+
+`commit(close, day)` folds in a finished daily bar. `peek(price)` returns
+the indicator values as if `price` were the close of the next (still
+forming) bar, without touching the state, so intraday refreshes only cost
+a handful of float operations per symbol.
+
+The update rules mirror the batch engine (pandas ewm(adjust=False) and
+rolling(window).mean()), so a state seeded from history reports the same
+numbers as a full recompute. Note the existing RSI is built from simple
+rolling means of gains/losses (not Wilder smoothing), and this keeps that.
+"""
+import json
+import os
+import tempfile
+from collections import deque
+from typing import Dict, Iterable, Optional
+
+from app.config import settings
+from app.services.persistence import persistence
+
+NAN = float("nan")
+
+
+def _isnan(x: float) -> bool:
+    return x != x
+
+
+class EMAState:
+    """pd.Series.ewm(span=span, adjust=False).mean(), one value at a time."""
+
+    __slots__ = ("alpha", "value", "old_wt")
+
+    def __init__(self, span: int, value: float = NAN, old_wt: float = 1.0):
+        self.alpha = 2.0 / (span + 1.0)
+        self.value = value
+        self.old_wt = old_wt
+
+    def _next(self, x: float):
+        if _isnan(self.value):
+            return x, self.old_wt
+        old_wt = self.old_wt * (1.0 - self.alpha)
+        if _isnan(x):
+            # Missing observation: value carries, weight keeps decaying
+            return self.value, old_wt
+        if self.value != x:
+            return (old_wt * self.value + self.alpha * x) / (old_wt + self.alpha), 1.0
+        return self.value, 1.0
+
+    def peek(self, x: float) -> float:
+        return self._next(x)[0]
+
+    def update(self, x: float) -> float:
+        self.value, self.old_wt = self._next(x)
+        return self.value
+
+
+class RollingMeanState:
+    """pd.Series.rolling(window).mean() via a running sum over a ring buffer."""
+
+    __slots__ = ("window", "buf", "total", "nans")
+
+    def __init__(self, window: int, values: Iterable[float] = ()):
+        self.window = window
+        self.buf = deque(maxlen=window)
+        self.total = 0.0
+        self.nans = 0
+        for v in values:
+            self.update(v)
+
+    def _mean(self, total: float, nans: int, count: int) -> float:
+        if count < self.window or nans:
+            return NAN
+        return total / self.window
+
+    def peek(self, x: float) -> float:
+        total, nans, count = self.total, self.nans, len(self.buf)
+        if count == self.window:
+            out = self.buf[0]
+            if _isnan(out):
+                nans -= 1
+            else:
+                total -= out
+            count -= 1
+        if _isnan(x):
+            nans += 1
+        else:
+            total += x
+        return self._mean(total, nans, count + 1)
+
+    def update(self, x: float) -> float:
+        if len(self.buf) == self.window:
+            out = self.buf[0]
+            if _isnan(out):
+                self.nans -= 1
+            else:
+                self.total -= out
+        self.buf.append(x)
+        if _isnan(x):
+            self.nans += 1
+        else:
+            self.total += x
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self._mean(self.total, self.nans, len(self.buf))
+
+
+class RSIState:
+    """indicators.calculate_rsi: rolling means of gains/losses over `period` bars."""
+
+    __slots__ = ("prev_close", "gains", "losses")
+
+    def __init__(self, period: int = 14):
+        self.prev_close = NAN
+        self.gains = RollingMeanState(period)
+        self.losses = RollingMeanState(period)
+
+    @staticmethod
+    def _split(prev_close: float, close: float):
+        delta = close - prev_close
+        # NaN deltas (first bar, gaps) count as 0, like Series.where(cond, 0)
+        gain = delta if delta > 0 else 0.0
+        loss = -delta if delta < 0 else 0.0
+        return gain, loss
+
+    @staticmethod
+    def _rsi(avg_gain: float, avg_loss: float) -> float:
+        if _isnan(avg_gain) or _isnan(avg_loss):
+            return NAN
+        if avg_loss == 0:
+            return NAN if avg_gain == 0 else 100.0
+        return 100 - (100 / (1 + avg_gain / avg_loss))
+
+    def peek(self, close: float) -> float:
+        gain, loss = self._split(self.prev_close, close)
+        return self._rsi(self.gains.peek(gain), self.losses.peek(loss))
+
+    def update(self, close: float) -> float:
+        gain, loss = self._split(self.prev_close, close)
+        self.gains.update(gain)
+        self.losses.update(loss)
+        self.prev_close = close
+        return self.value
+
+    @property
+    def value(self) -> float:
+        return self._rsi(self.gains.value, self.losses.value)
+
+
+class SymbolIndicatorState:
+    """All list-view indicators for one symbol, committed through `last_date`."""
+
+    def __init__(self):
+        self.last_date: Optional[str] = None
+        self.ema_12 = EMAState(12)
+        self.ema_26 = EMAState(26)
+        self.signal = EMAState(9)
+        self.ema_20 = EMAState(20)
+        self.ema_50 = EMAState(50)
+        self.sma_20 = RollingMeanState(20)
+        self.sma_50 = RollingMeanState(50)
+        self.rsi = RSIState(14)
+
+    @classmethod
+    def from_closes(cls, closes: Iterable[float], last_date: str) -> "SymbolIndicatorState":
+        """Seed by replaying history once (O(n)); afterwards every bar is O(1)."""
+        state = cls()
+        for close in closes:
+            state.commit(float(close))
+        state.last_date = last_date
+        return state
+
+    def commit(self, close: float, day: Optional[str] = None) -> None:
+        macd = self.ema_12.update(close) - self.ema_26.update(close)
+        self.signal.update(macd)
+        self.ema_20.update(close)
+        self.ema_50.update(close)
+        self.sma_20.update(close)
+        self.sma_50.update(close)
+        self.rsi.update(close)
+        if day is not None:
+            self.last_date = day
+
+    @staticmethod
+    def _values(macd, signal, rsi, ema_20, ema_50, sma_20, sma_50) -> Dict[str, Optional[float]]:
+        raw = {
+            "macd": macd, "signal": signal, "hist": macd - signal, "rsi": rsi,
+            "ema_20": ema_20, "ema_50": ema_50, "sma_20": sma_20, "sma_50": sma_50,
+        }
+        return {k: (None if _isnan(v) else v) for k, v in raw.items()}
+
+    def peek(self, price: float) -> Dict[str, Optional[float]]:
+        """Indicator values with `price` as the close of the forming bar."""
+        macd = self.ema_12.peek(price) - self.ema_26.peek(price)
+        return self._values(
+            macd, self.signal.peek(macd), self.rsi.peek(price),
+            self.ema_20.peek(price), self.ema_50.peek(price),
+            self.sma_20.peek(price), self.sma_50.peek(price),
+        )
+
+    def latest(self) -> Dict[str, Optional[float]]:
+        """Indicator values as of the last committed bar."""
+        return self._values(
+            self.ema_12.value - self.ema_26.value, self.signal.value, self.rsi.value,
+            self.ema_20.value, self.ema_50.value, self.sma_20.value, self.sma_50.value,
+        )
+
+    # --- Snapshot ---
+
+    def to_dict(self) -> dict:
+        def ema(s: EMAState):
+            return [s.value, s.old_wt]
+
+        def rolling(s: RollingMeanState):
+            return list(s.buf)
+
+        return {
+            "last_date": self.last_date,
+            "ema": {name: ema(getattr(self, name)) for name in ("ema_12", "ema_26", "signal", "ema_20", "ema_50")},
+            "sma_20": rolling(self.sma_20),
+            "sma_50": rolling(self.sma_50),
+            "rsi": {"prev_close": self.rsi.prev_close, "gains": rolling(self.rsi.gains), "losses": rolling(self.rsi.losses)},
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SymbolIndicatorState":
+        state = cls()
+        state.last_date = data.get("last_date")
+        for name, (value, old_wt) in data["ema"].items():
+            ema = getattr(state, name)
+            ema.value, ema.old_wt = value, old_wt
+        state.sma_20 = RollingMeanState(20, data["sma_20"])
+        state.sma_50 = RollingMeanState(50, data["sma_50"])
+        state.rsi.prev_close = data["rsi"]["prev_close"]
+        state.rsi.gains = RollingMeanState(14, data["rsi"]["gains"])
+        state.rsi.losses = RollingMeanState(14, data["rsi"]["losses"])
+        return state
+
+
+class LiveIndicators:
+    """Latest-values-only stand-in for SymbolIndicators on the incremental path."""
+
+    def __init__(self, values: Dict[str, Optional[float]], avg_volume: float = float("nan")):
+        self.values = values
+        self.avg_volume = avg_volume
+
+    def latest(self) -> Dict[str, Optional[float]]:
+        return self.values
+
+
+class IndicatorStateBook:
+    """Per-symbol states, snapshot-able to a JSON file."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.states: Dict[str, SymbolIndicatorState] = {}
+        self.dirty = False
+
+    def get(self, symbol: str) -> Optional[SymbolIndicatorState]:
+        return self.states.get(symbol)
+
+    def put(self, symbol: str, state: SymbolIndicatorState) -> None:
+        self.states[symbol] = state
+        self.dirty = True
+
+    def save(self) -> bool:
+        """Write the states now if anything changed. Blocking."""
+        if not self.dirty:
+            return False
+        self.dirty = False
+        self._write(dict(self.states))
+        return True
+
+    def schedule_save(self) -> bool:
+        """Hand a save to the background writer (a newer one replaces it); False if nothing changed."""
+        if not self.dirty:
+            return False
+        # put() replaces states and never mutates a stored one, so a shallow copy stays consistent
+        states = dict(self.states)
+        self.dirty = False
+        persistence.schedule("indicator_state", lambda: self._write(states))
+        return True
+
+    def _write(self, states: Dict[str, "SymbolIndicatorState"]) -> int:
+        try:
+            payload = json.dumps({s: st.to_dict() for s, st in states.items()}, allow_nan=True)
+            directory = os.path.dirname(self.path) or "."
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as f:
+                    f.write(payload)
+                os.replace(tmp, self.path)
+            except BaseException:
+                if os.path.exists(tmp):
+                    os.remove(tmp)
+                raise
+        except BaseException:
+            # Retried with the next save
+            self.dirty = True
+            raise
+        return len(payload)
+
+    def load(self) -> int:
+        try:
+            with open(self.path, "r") as f:
+                raw = json.load(f)
+            self.states = {s: SymbolIndicatorState.from_dict(d) for s, d in raw.items()}
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"Indicator state snapshot unreadable, starting fresh: {e}", flush=True)
+            self.states = {}
+        self.dirty = False
+        return len(self.states)
+
+
+indicator_states = IndicatorStateBook(settings.INDICATOR_STATE_FILE)
@@ -0,0 +1,168 @@
+"""
+Upstream market-data providers.
+
+Every daily-bar and fundamentals download goes through a MarketDataProvider
+so the refresh can run against Yahoo Finance in production and against
+FakeProvider in tests and benchmarks (no network). Providers return bars already split per
+symbol in the history store's (6, n) matrix layout.
+"""
+import time
+import zlib
+from abc import ABC, abstractmethod
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from app.config import settings
+from app.services.history_store import frame_to_matrix
+
+_PERIOD_DAYS = {"1mo": 31, "2mo": 62, "3mo": 93, "6mo": 186, "1y": 366, "2y": 731, "5y": 1827, "max": 365 * 20}
+
+
+class MarketDataProvider(ABC):
+    """Source of daily OHLCV bars. `start` and `period` are mutually exclusive."""
+
+    name = "base"
+
+    @abstractmethod
+    def fetch_history(self, symbols: List[str], period: Optional[str] = None,
+                      start: Optional[date] = None) -> Dict[str, np.ndarray]:
+        """Bars per symbol as (6, n) matrices; symbols with no data are omitted."""
+
+    @abstractmethod
+    def fetch_fundamentals(self, symbol: str) -> Dict:
+        """Fundamentals for one symbol, keyed like yfinance's Ticker.info."""
+
+
+class YFinanceProvider(MarketDataProvider):
+    """
+    Yahoo Finance via yfinance.
+
+    In "batched" mode a whole group of symbols is requested with one
+    yf.download call and the combined frame is split per symbol; in
+    "single" mode each symbol gets its own Ticker.history call.
+    """
+
+    name = "yfinance"
+
+    def __init__(self, mode: str = "batched"):
+        self.mode = mode
+
+    def fetch_history(self, symbols, period=None, start=None):
+        kwargs = {"start": start.strftime("%Y-%m-%d")} if start else {"period": period or "2mo"}
+        if self.mode == "single" or len(symbols) == 1:
+            out = {}
+            for symbol in symbols:
+                hist = yf.Ticker(symbol).history(**kwargs)
+                if not hist.empty:
+                    out[symbol] = frame_to_matrix(hist)
+                del hist
+            return out
+
+        combined = yf.download(
+            symbols, group_by="ticker", auto_adjust=True, threads=False,
+            progress=False, **kwargs,
+        )
+        out = {}
+        if combined is None or combined.empty:
+            return out
+        for symbol in symbols:
+            if symbol not in combined.columns.get_level_values(0):
+                continue
+            # The combined index is the union of all dates; drop rows this symbol lacks
+            frame = combined[symbol].dropna(subset=["Close"])
+            if not frame.empty:
+                out[symbol] = frame_to_matrix(frame)
+        del combined
+        return out
+
+    def fetch_fundamentals(self, symbol):
+        return yf.Ticker(symbol).info or {}
+
+
+class FakeProvider(MarketDataProvider):
+    """
+    Deterministic offline provider: a seeded random walk per symbol over
+    weekdays up to today. Symbols listed in `missing` return no data;
+    `latency_s` is slept once per call to mimic an upstream round trip.
+    """
+
+    name = "fake"
+
+    def __init__(self, days_back: int = 400, missing: Optional[List[str]] = None, latency_s: float = 0.0):
+        self.days_back = days_back
+        self.missing = set(missing or [])
+        self.latency_s = latency_s
+        self.calls = 0
+
+    def _series(self, symbol: str) -> pd.DataFrame:
+        end = pd.Timestamp(datetime.now().date())
+        index = pd.bdate_range(end=end, periods=self.days_back)
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        base = 100 + (zlib.crc32(symbol.encode()) % 3000)
+        closes = base * np.exp(np.cumsum(rng.normal(0, 0.015, len(index))))
+        spread = closes * rng.uniform(0.002, 0.02, len(index))
+        return pd.DataFrame({
+            "Open": closes - spread / 2,
+            "High": closes + spread,
+            "Low": closes - spread,
+            "Close": closes,
+            "Volume": rng.integers(10_000, 5_000_000, len(index)).astype(float),
+        }, index=index)
+
+    def fetch_history(self, symbols, period=None, start=None):
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if start is not None:
+            since = pd.Timestamp(start)
+        else:
+            since = pd.Timestamp(datetime.now().date() - timedelta(days=_PERIOD_DAYS.get(period or "2mo", 62)))
+        out = {}
+        for symbol in symbols:
+            if symbol in self.missing:
+                continue
+            frame = self._series(symbol)
+            frame = frame[frame.index >= since]
+            if not frame.empty:
+                out[symbol] = frame_to_matrix(frame)
+        return out
+
+    def fetch_fundamentals(self, symbol):
+        self.calls += 1
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        if symbol in self.missing:
+            return {}
+        rng = np.random.default_rng(zlib.crc32(symbol.encode()))
+        return {
+            "trailingPE": round(float(rng.uniform(8, 80)), 2),
+            "dividendYield": round(float(rng.uniform(0, 4)), 2),
+            "returnOnEquity": round(float(rng.uniform(0.02, 0.35)), 4),
+            "returnOnAssets": round(float(rng.uniform(0.01, 0.2)), 4),
+            "trailingEps": round(float(rng.uniform(1, 200)), 2),
+            "bookValue": round(float(rng.uniform(20, 2000)), 2),
+            "priceToBook": round(float(rng.uniform(0.5, 15)), 2),
+        }
+
+
+_provider: Optional[MarketDataProvider] = None
+
+
+def get_provider() -> MarketDataProvider:
+    global _provider
+    if _provider is None:
+        if settings.MARKET_DATA_PROVIDER == "fake":
+            _provider = FakeProvider()
+        else:
+            _provider = YFinanceProvider(mode=settings.FETCH_MODE)
+    return _provider
+
+
+def set_provider(provider: Optional[MarketDataProvider]) -> None:
+    """Swap the active provider (tests, benchmarks); None restores the configured one."""
+    global _provider
+    _provider = provider
@@ -0,0 +1,199 @@
+"""
+Background writer for everything the refresh cycle persists.
+
+Callers on the event loop (or any thread) hand work over and return at
+once. A single daemon thread performs the writes:
+
+- schedule(key, write): a pending job per key, latest wins. Snapshots
+  published in quick succession are written once, with the newest one;
+  the indicator state file ("indicator_state") goes the same way. The
+  thread waits PERSIST_COALESCE_S after the first job before writing, so
+  bursts collapse into one write.
+- append(path, text): lines for status/debug logs, batched into one open()
+  per file per pass. A file that would grow past PERSIST_LOG_MAX_BYTES is
+  first rotated to "<path>.1" (one backup kept), so logs stay bounded.
+
+flush() waits until everything handed over so far is on disk. close(),
+called from the app lifespan on shutdown, flushes and stops the thread.
+Write durations, bytes and failures per key are kept for /metrics/persistence.
+"""
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from app.config import settings
+
+
+class _KeyStats:
+    def __init__(self):
+        self.scheduled = 0
+        self.writes = 0
+        self.coalesced = 0
+        self.failures = 0
+        self.last_ms: Optional[float] = None
+        self.max_ms = 0.0
+        self.last_bytes: Optional[int] = None
+        self.total_bytes = 0
+        self.last_error: Optional[str] = None
+        self.last_written_at: Optional[float] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "scheduled": self.scheduled,
+            "writes": self.writes,
+            "coalesced": self.coalesced,
+            "failures": self.failures,
+            "last_write_ms": round(self.last_ms, 2) if self.last_ms is not None else None,
+            "max_write_ms": round(self.max_ms, 2),
+            "last_bytes": self.last_bytes,
+            "total_bytes": self.total_bytes,
+            "last_error": self.last_error,
+            "last_written_at": self.last_written_at,
+        }
+
+
+class BackgroundWriter:
+    def __init__(self, coalesce_s: float = settings.PERSIST_COALESCE_S,
+                 max_log_bytes: int = settings.PERSIST_LOG_MAX_BYTES):
+        self.coalesce_s = coalesce_s
+        self.max_log_bytes = max_log_bytes
+        self._cond = threading.Condition()
+        self._jobs: Dict[str, Callable[[], Optional[int]]] = {}
+        self._lines: Dict[str, List[str]] = {}
+        self._stats: Dict[str, _KeyStats] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._busy = False
+        self._hurry = 0  # flush() callers waiting: skip the coalescing wait
+        self._closed = False
+        self.lines_written = 0
+        self.rotations = 0
+
+    def schedule(self, key: str, write: Callable[[], Optional[int]]) -> None:
+        """Run `write()` (returning bytes written) in the background, replacing a pending job for `key`."""
+        with self._cond:
+            if self._closed:
+                print(f"Background writer closed; dropping {key} write", flush=True)
+                return
+            stats = self._stats.setdefault(key, _KeyStats())
+            stats.scheduled += 1
+            if key in self._jobs:
+                stats.coalesced += 1
+            self._jobs[key] = write
+            self._start()
+            self._cond.notify_all()
+
+    def append(self, path: str, text: str) -> None:
+        """Append `text` to the file at `path` in the background."""
+        with self._cond:
+            if self._closed:
+                return
+            self._lines.setdefault(path, []).append(text)
+            self._start()
+            self._cond.notify_all()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Block until all work handed over so far is written; False on timeout. Not for the event loop."""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._cond:
+            self._hurry += 1
+            self._cond.notify_all()
+            try:
+                while self._jobs or self._lines or self._busy:
+                    remaining = deadline - time.monotonic() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+                return True
+            finally:
+                self._hurry -= 1
+
+    def close(self, timeout: Optional[float] = settings.PERSIST_FLUSH_TIMEOUT_S) -> bool:
+        """Flush, then stop the writer thread; work handed over meanwhile is dropped. Blocking."""
+        flushed = self.flush(timeout)
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        with self._cond:
+            # Usable again (a later schedule() starts a new thread), e.g. for another app lifespan
+            if thread is None or not thread.is_alive():
+                self._closed = False
+                self._thread = None
+        return flushed
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="background-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not (self._jobs or self._lines or self._closed):
+                    self._cond.wait()
+                if self._closed and not (self._jobs or self._lines):
+                    return
+                # Let a burst of snapshots collapse into one write
+                if self._jobs and self.coalesce_s > 0 and not self._hurry and not self._closed:
+                    self._cond.wait_for(lambda: self._hurry or self._closed, timeout=self.coalesce_s)
+                jobs, self._jobs = self._jobs, {}
+                lines, self._lines = self._lines, {}
+                self._busy = True
+            try:
+                for path, texts in lines.items():
+                    self._write_lines(path, texts)
+                for key, write in jobs.items():
+                    self._write(key, write)
+            finally:
+                with self._cond:
+                    self._busy = False
+                    self._cond.notify_all()
+
+    def _write_lines(self, path: str, texts: List[str]) -> None:
+        data = "".join(texts)
+        try:
+            if self.max_log_bytes > 0 and os.path.exists(path) \
+                    and os.path.getsize(path) + len(data) > self.max_log_bytes:
+                os.replace(path, path + ".1")
+                self.rotations += 1
+            with open(path, "a") as f:
+                f.write(data)
+            self.lines_written += len(texts)
+        except OSError as e:
+            print(f"Background writer: failed to append to {path}: {e}", flush=True)
+
+    def _write(self, key: str, write: Callable[[], Optional[int]]) -> None:
+        stats = self._stats[key]
+        start = time.perf_counter()
+        try:
+            size = write()
+        except Exception as e:
+            stats.failures += 1
+            stats.last_error = repr(e)
+            print(f"Background writer: {key} write failed: {e!r}", flush=True)
+            return
+        elapsed = (time.perf_counter() - start) * 1000
+        stats.writes += 1
+        stats.last_ms = elapsed
+        stats.max_ms = max(stats.max_ms, elapsed)
+        stats.last_bytes = size
+        stats.total_bytes += size or 0
+        stats.last_written_at = time.time()
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "coalesce_s": self.coalesce_s,
+                "pending": sorted(self._jobs),
+                "pending_lines": sum(len(t) for t in self._lines.values()),
+                "busy": self._busy,
+                "lines_written": self.lines_written,
+                "log_rotations": self.rotations,
+                "keys": {key: s.to_dict() for key, s in self._stats.items()},
+            }
+
+
+persistence = BackgroundWriter()
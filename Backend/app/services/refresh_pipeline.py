@@ -0,0 +1,168 @@
+"""
+Streaming market-data refresh: fetch -> compute -> publish over bounded queues.
+
+Fetch workers sync one group of symbols at a time (a single upstream call
+in batched mode) and push each symbol's bars onto a bounded queue; when
+compute falls behind, the put blocks and fetching pauses (backpressure)
+instead of piling frames up in memory. The compute stage
+drains whatever is queued (up to `compute_batch`) through the vectorized
+indicator engine, and the bars for a symbol are dropped as soon as its
+StockResponse is built. The publish stage only ever holds finished
+StockResponse objects.
+"""
+import asyncio
+import gc
+import inspect
+import time
+from dataclasses import dataclass, asdict
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from app.schemas import StockResponse
+from app.services.history_store import Bars
+from app.utils.memory import RssSampler
+
+FetchFn = Callable[[List[str]], Dict[str, Optional[Bars]]]
+# May be a coroutine function (e.g. handing the batch to a worker pool)
+ComputeFn = Callable[[List[Tuple[str, Bars]]], Union[List[StockResponse], Awaitable[List[StockResponse]]]]
+
+AdmitFn = Callable[[int], Awaitable[None]]
+
+_DONE = object()
+
+
+@dataclass
+class CycleStats:
+    started_at: str
+    tier: str = ""
+    symbols: int = 0
+    fetched: int = 0
+    processed: int = 0
+    failed: int = 0
+    duration_s: float = 0.0
+    start_rss_mb: float = 0.0
+    peak_rss_mb: float = 0.0
+    fetch_concurrency: int = 1
+    group_size: int = 1
+    queue_size: int = 0
+    compute_batch: int = 0
+    governor_action: str = ""
+
+    def to_dict(self) -> dict:
+        return asdict(self)
+
+
+async def run_pipeline(
+    symbols: Sequence[str],
+    fetch: FetchFn,
+    compute: ComputeFn,
+    group_size: int = 1,
+    fetch_concurrency: int = 2,
+    queue_size: int = 8,
+    compute_batch: int = 25,
+    admit: Optional[AdmitFn] = None,
+) -> Tuple[List[StockResponse], CycleStats]:
+    """
+    Run one refresh cycle over `symbols`.
+
+    `fetch` takes a group of up to `group_size` symbols, is blocking
+    (network/disk) and runs in the default executor; `compute` turns a
+    micro-batch of (symbol, bars) into responses. If given, `admit(worker)`
+    is awaited by each fetch worker before every group (memory throttling).
+    """
+    loop = asyncio.get_running_loop()
+    sampler = RssSampler()
+    stats = CycleStats(
+        started_at=datetime.now().isoformat(),
+        symbols=len(symbols),
+        start_rss_mb=round(sampler.start_mb, 1),
+        fetch_concurrency=fetch_concurrency,
+        group_size=group_size,
+        queue_size=queue_size,
+        compute_batch=compute_batch,
+    )
+    start = time.time()
+
+    group_size = max(1, group_size)
+    pending = iter([list(symbols[i:i + group_size]) for i in range(0, len(symbols), group_size)])
+    bars_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+    out_q: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+
+    async def fetch_worker(worker: int):
+        for group in pending:
+            if admit is not None:
+                await admit(worker)
+            try:
+                fetched = await loop.run_in_executor(None, fetch, group)
+            except Exception as e:
+                print(f"Fetch failed for group starting {group[0]}: {e}", flush=True)
+                fetched = {}
+            for symbol in group:
+                bars = fetched.get(symbol)
+                if bars is None:
+                    stats.failed += 1
+                    continue
+                stats.fetched += 1
+                # Blocks while compute is behind (backpressure)
+                await bars_q.put((symbol, bars))
+            del fetched
+            sampler.sample()
+
+    async def compute_worker():
+        done = False
+        while not done:
+            batch = []
+            item = await bars_q.get()
+            while True:
+                if item is _DONE:
+                    done = True
+                    break
+                batch.append(item)
+                if len(batch) >= compute_batch or bars_q.empty():
+                    break
+                item = bars_q.get_nowait()
+            if not batch:
+                continue
+            try:
+                stocks = compute(batch)
+                if inspect.isawaitable(stocks):
+                    stocks = await stocks
+            except Exception as e:
+                print(f"Compute failed for batch of {len(batch)}: {e}", flush=True)
+                stats.failed += len(batch)
+                stocks = []
+            # Raw bars are no longer needed once the responses exist
+            batch.clear()
+            sampler.sample()
+            for stock in stocks:
+                await out_q.put(stock)
+            del stocks
+        await out_q.put(_DONE)
+
+    async def publisher() -> List[StockResponse]:
+        results = []
+        while True:
+            stock = await out_q.get()
+            if stock is _DONE:
+                return results
+            results.append(stock)
+
+    fetchers = [asyncio.create_task(fetch_worker(i)) for i in range(max(1, fetch_concurrency))]
+    compute_task = asyncio.create_task(compute_worker())
+    publish_task = asyncio.create_task(publisher())
+    try:
+        await asyncio.gather(*fetchers)
+        await bars_q.put(_DONE)
+        results = await publish_task
+        await compute_task
+    except BaseException:
+        for task in fetchers + [compute_task, publish_task]:
+            task.cancel()
+        raise
+
+    gc.collect()
+    sampler.sample()
+    stats.processed = len(results)
+    stats.duration_s = round(time.time() - start, 2)
+    stats.peak_rss_mb = round(sampler.peak_mb, 1)
+    return results, stats
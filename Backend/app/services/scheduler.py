@@ -1,36 +1,205 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from app.services.stocks import fetch_stock_data
-from app.config import settings
-from app.services.cache import cache
+"""
+Tiered background jobs on the event loop.
+
+Each tier has its own cadence, so slow-moving data isn't re-fetched on the
+fast loop:
+
+- quotes:        today's forming bar for every symbol, every
+                 QUOTE_REFRESH_INTERVAL seconds while the market is OPEN
+- bars:          daily bars + indicators, synced to the local store and
+                 published on startup and once after close
+                 (REFRESH_PHASE_INTERVALS)
+- fundamentals:  ticker.info for the detail view, nightly at
+                 FUNDAMENTALS_REFRESH_AT on trading days
+
+A job never overlaps itself: a run that comes due (or is triggered) while
+the previous one is still going is skipped and counted. Due times get a
+random jitter of up to `jitter_s` seconds, redrawn after every run, and the
+last few runs of each job are kept for /api/v1/metrics/jobs.
+"""
 import asyncio
-from datetime import datetime
-
-scheduler = AsyncIOScheduler()
-
-async def update_market_data():
-    """
-    Background task to fetch and cache market data for all tracked stocks.
-    
-    This function:
-    1. Fetches data for all NSE symbols defined in settings.
-    2. Forces an update to bypass existing cache.
-    3. Caches the result for efficient retrieval by API endpoints.
-    """
-    print(f"[{datetime.now()}] Starting background market data update for {len(settings.ALL_NSE_SYMBOLS)} stocks...")
-    try:
-        # Fetch data for all symbols with force_update=True to ensure fresh data
-        stocks = await fetch_stock_data(settings.ALL_NSE_SYMBOLS, include_chart=False, force_update=True)
-        
-        print(f"[{datetime.now()}] Market data update complete. Fetched {len(stocks)} stocks.")
-        
-    except Exception as e:
-        print(f"[{datetime.now()}] Error in background update: {e}")
-
-def start_scheduler():
-    """
-    Initialize and start the background scheduler.
-    Sets up a recurring job to update market data every 60 seconds.
-    """
-    # Run immediately on startup by setting next_run_time=datetime.now()
-    scheduler.add_job(update_market_data, 'interval', seconds=60, id='market_update', next_run_time=datetime.now())
+import random
+import time
+import traceback
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from app.config import settings
+from app.utils.market_status import get_current_ist_time, get_next_refresh_time, get_next_daily_time
+from app.services import stocks
+from app.services.fundamentals import fundamentals_cache, refresh_fundamentals
+
+ScheduleFn = Callable[[datetime, Optional[datetime]], Optional[datetime]]
+
+# Longest single sleep; due times are re-evaluated at least this often
+MAX_SLEEP_S = 900
+
+
+class Job:
+    def __init__(self, name: str, func: Callable[[], Awaitable], schedule: ScheduleFn,
+                 jitter_s: float = 0.0, run_on_start: bool = False,
+                 last_run: Optional[datetime] = None, history: int = 20):
+        self.name = name
+        self.func = func
+        self.schedule = schedule
+        self.jitter_s = jitter_s
+        self.run_on_start = run_on_start
+        self.last_run = last_run
+        self.next_run: Optional[datetime] = None
+        self.running = False
+        self.skipped = 0
+        self.runs = deque(maxlen=history)
+        self._jitter = random.uniform(0, jitter_s)
+
+    def due_at(self, now: datetime) -> Optional[datetime]:
+        due = self.schedule(now, self.last_run)
+        if due is not None:
+            due += timedelta(seconds=self._jitter)
+        self.next_run = due
+        return due
+
+    async def run(self) -> bool:
+        """Run once unless already running. Returns False if the run was skipped."""
+        if self.running:
+            self.skipped += 1
+            return False
+        self.running = True
+        started_at = get_current_ist_time()
+        start = time.time()
+        status, error = "ok", None
+        try:
+            await self.func()
+        except Exception as e:
+            status, error = "error", str(e)
+            print(f"Job {self.name} failed: {e}", flush=True)
+            traceback.print_exc()
+        finally:
+            self.running = False
+            self.last_run = started_at
+            self._jitter = random.uniform(0, self.jitter_s)
+            self.runs.append({
+                "started_at": started_at.isoformat(),
+                "duration_s": round(time.time() - start, 2),
+                "status": status,
+                "error": error,
+            })
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "name": self.name,
+            "running": self.running,
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "next_run": self.next_run.isoformat() if self.next_run else None,
+            "skipped": self.skipped,
+            "runs": list(self.runs),
+        }
+
+
+class JobScheduler:
+    def __init__(self, clock: Callable[[], datetime] = get_current_ist_time):
+        self.clock = clock
+        self.jobs: Dict[str, Job] = {}
+        self.tasks: List[asyncio.Task] = []
+
+    def add(self, job: Job) -> Job:
+        self.jobs[job.name] = job
+        return job
+
+    async def _loop(self, job: Job):
+        if job.run_on_start:
+            await job.run()
+        while True:
+            now = self.clock()
+            due = job.due_at(now)
+            if due is None:
+                await asyncio.sleep(MAX_SLEEP_S)
+                continue
+            delay = (due - now).total_seconds()
+            if delay > 0:
+                await asyncio.sleep(min(delay, MAX_SLEEP_S))
+                continue
+            await job.run()
+
+    def start(self):
+        self.tasks = [asyncio.create_task(self._loop(job), name=f"job:{name}") for name, job in self.jobs.items()]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+
+    def next_run(self, *names: str) -> Optional[datetime]:
+        """Earliest next run among the named jobs (all jobs if none given)."""
+        times = [j.next_run for n, j in self.jobs.items() if (not names or n in names) and j.next_run]
+        return min(times) if times else None
+
+    def stats(self) -> List[dict]:
+        return [job.stats() for job in self.jobs.values()]
+
+
+async def update_fundamentals():
+    loop = asyncio.get_running_loop()
+    symbols = stocks.get_universe()
+    started_at = get_current_ist_time()
+    refreshed = await loop.run_in_executor(None, refresh_fundamentals, symbols, started_at)
+    print(f"Fundamentals refreshed for {refreshed}/{len(symbols)} symbols.", flush=True)
+
+
+def build_scheduler() -> JobScheduler:
+    quote_rules = {"OPEN": settings.QUOTE_REFRESH_INTERVAL}
+    fundamentals_at = datetime.strptime(settings.FUNDAMENTALS_REFRESH_AT, "%H:%M").time()
+
+    scheduler = JobScheduler()
+    scheduler.add(Job(
+        "bars", stocks.refresh_market_data,
+        schedule=lambda now, last: get_next_refresh_time(now, last, settings.REFRESH_PHASE_INTERVALS),
+        jitter_s=settings.BARS_JOB_JITTER,
+        run_on_start=True,
+    ))
+    if settings.QUOTE_REFRESH_INTERVAL:
+        scheduler.add(Job(
+            "quotes", stocks.refresh_quotes,
+            schedule=lambda now, last: get_next_refresh_time(now, last, quote_rules),
+            jitter_s=settings.QUOTE_JOB_JITTER,
+        ))
+    scheduler.add(Job(
+        "fundamentals", update_fundamentals,
+        schedule=lambda now, last: get_next_daily_time(now, last, fundamentals_at),
+        jitter_s=settings.FUNDAMENTALS_JOB_JITTER,
+        # Survive restarts without re-fetching the whole universe
+        last_run=fundamentals_cache.refreshed_at,
+    ))
+    return scheduler
+
+
+scheduler: Optional[JobScheduler] = None
+
+
+def start_scheduler() -> JobScheduler:
+    """Load local state and start every tier. Call from the app lifespan (running loop)."""
+    global scheduler
+    stocks.load_local_state()
+    scheduler = build_scheduler()
     scheduler.start()
+    return scheduler
+
+
+async def stop_scheduler():
+    global scheduler
+    if scheduler is not None:
+        await scheduler.stop()
+        scheduler = None
+
+
+def get_next_data_refresh() -> Optional[datetime]:
+    """When listed prices next change (quotes or bars tier), if scheduled."""
+    if scheduler is None:
+        return None
+    return scheduler.next_run("quotes", "bars")
+
+
+def get_job_stats() -> List[dict]:
+    return scheduler.stats() if scheduler is not None else []
@@ -0,0 +1,158 @@
+"""
+Single-flight for on-demand upstream calls, keyed by (symbol, kind).
+
+A stock page opened by fifty users at once used to mean fifty identical
+history and fast_info downloads. Here the first caller for a key makes the
+call and everyone arriving while it runs waits for that result instead
+(async callers await it, executor threads block on it). Results are not
+cached beyond the flight, except "no data" answers (unknown or delisted
+symbols): those are remembered for UPSTREAM_NEGATIVE_TTL_S, so repeated
+requests for them don't go upstream either. Only kinds whose empty answer
+really means "nothing there" opt in (history: None only when nothing was
+ever stored for the symbol); quotes and fundamentals come back empty on
+rate limits and network trouble too, so they pass empty=None. Errors are
+shared with the callers of that flight but never cached.
+
+Per kind, /metrics/upstream reports requests, actual upstream calls, calls
+suppressed (shared flights + negative hits) and the coalescing ratio
+(requests per upstream call).
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from app.config import settings
+
+FlightKey = Tuple[str, str]
+
+# Pruned of expired entries once it grows past this
+_NEGATIVE_PRUNE_AT = 1024
+
+
+def no_data(result: Any) -> bool:
+    """Default "nothing upstream" test: None or an empty container."""
+    return result is None or (hasattr(result, "__len__") and len(result) == 0)
+
+
+class _KindStats:
+    def __init__(self):
+        self.requests = 0
+        self.calls = 0
+        self.shared = 0
+        self.negative_hits = 0
+        self.no_data = 0
+        self.errors = 0
+
+    def to_dict(self) -> dict:
+        return {
+            "requests": self.requests,
+            "upstream_calls": self.calls,
+            "shared": self.shared,
+            "negative_hits": self.negative_hits,
+            "suppressed": self.shared + self.negative_hits,
+            "no_data": self.no_data,
+            "errors": self.errors,
+            "coalescing_ratio": round(self.requests / self.calls, 2) if self.calls else None,
+        }
+
+
+class SingleFlight:
+    def __init__(self, negative_ttl_s: float = settings.UPSTREAM_NEGATIVE_TTL_S):
+        self.negative_ttl_s = negative_ttl_s
+        self._lock = threading.Lock()
+        self._inflight: Dict[FlightKey, Future] = {}
+        # key -> (monotonic expiry, the empty result to hand back)
+        self._negative: Dict[FlightKey, Tuple[float, Any]] = {}
+        self._stats: Dict[str, _KindStats] = {}
+
+    def call(self, symbol: str, kind: str, fn: Callable[[], Any],
+             empty: Optional[Callable[[Any], bool]] = no_data) -> Any:
+        """
+        fn() for (symbol, kind), shared with concurrent callers; results for
+        which empty() is true are negative-cached (empty=None: never).
+        Blocking: for threads, not the event loop.
+        """
+        flight, owner = self._join((symbol, kind))
+        if owner:
+            self._lead((symbol, kind), flight, fn, empty)
+        return flight.result()
+
+    async def run(self, symbol: str, kind: str, fn: Callable[[], Any],
+                  empty: Optional[Callable[[Any], bool]] = no_data) -> Any:
+        """call() for the event loop: the leader runs the blocking fn in the default executor."""
+        flight, owner = self._join((symbol, kind))
+        if owner:
+            # Finishes (and settles the flight for the others) even if this request is cancelled
+            asyncio.get_running_loop().run_in_executor(None, self._lead, (symbol, kind), flight, fn, empty)
+        return await asyncio.wrap_future(flight)
+
+    def _join(self, key: FlightKey) -> Tuple[Future, bool]:
+        """The flight for `key` and whether this caller has to run it."""
+        with self._lock:
+            stats = self._stats.setdefault(key[1], _KindStats())
+            stats.requests += 1
+            negative = self._negative.get(key)
+            if negative is not None:
+                expires, value = negative
+                if time.monotonic() < expires:
+                    stats.negative_hits += 1
+                    answered = Future()
+                    answered.set_result(value)
+                    return answered, False
+                del self._negative[key]
+            flight = self._inflight.get(key)
+            if flight is not None:
+                stats.shared += 1
+                return flight, False
+            flight = self._inflight[key] = Future()
+            # Running futures can't be cancelled, so one waiter going away can't fail the rest
+            flight.set_running_or_notify_cancel()
+            stats.calls += 1
+            return flight, True
+
+    def _lead(self, key: FlightKey, flight: Future, fn: Callable[[], Any],
+              empty: Optional[Callable[[Any], bool]]) -> None:
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._inflight.pop(key, None)
+                self._stats[key[1]].errors += 1
+            flight.set_exception(e)
+            return
+        with self._lock:
+            self._inflight.pop(key, None)
+            if empty is not None and empty(result):
+                self._stats[key[1]].no_data += 1
+                if self.negative_ttl_s > 0:
+                    now = time.monotonic()
+                    if len(self._negative) >= _NEGATIVE_PRUNE_AT:
+                        self._negative = {k: v for k, v in self._negative.items() if v[0] > now}
+                    self._negative[key] = (now + self.negative_ttl_s, result)
+        flight.set_result(result)
+
+    def clear(self) -> None:
+        """Forget the remembered "no data" answers."""
+        with self._lock:
+            self._negative.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            kinds = {kind: s.to_dict() for kind, s in self._stats.items()}
+            requests = sum(s.requests for s in self._stats.values())
+            calls = sum(s.calls for s in self._stats.values())
+            return {
+                "negative_ttl_s": self.negative_ttl_s,
+                "in_flight": len(self._inflight),
+                "negative_entries": len(self._negative),
+                "requests": requests,
+                "upstream_calls": calls,
+                "suppressed": sum(s.shared + s.negative_hits for s in self._stats.values()),
+                "coalescing_ratio": round(requests / calls, 2) if calls else None,
+                "kinds": kinds,
+            }
+
+
+upstream = SingleFlight()
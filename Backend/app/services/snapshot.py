@@ -0,0 +1,255 @@
+"""
+Immutable, versioned market snapshots.
+
+Every refresh publishes a new MarketSnapshot (tuple of frozen StockResponse
+objects plus a version and build time) by swapping a single reference, so a
+request that grabs get_snapshot() once sees one consistent list for its
+whole lifetime, however many refreshes land meanwhile. Nothing in a
+published snapshot is ever modified; per-request variations (enriched
+detail views, re-ranking) are model_copy()s.
+
+Versions start from the wall-clock milliseconds at startup and go up by one
+per publish; the snapshot loaded from disk at startup is numbered above the
+version it was saved with. So versions are never reused across restarts
+(even with a clock that stepped back) and can key response caches, ETags,
+cursors and delta feeds.
+
+For the delta feed each publish also records what changed against the
+previous version, per symbol and per (dotted) field, in a bounded ring of
+SNAPSHOT_HISTORY deltas. Flattening and diffing cost a model_dump per row,
+so the refresh cycle runs prepare() in an executor and only commit() (the
+reference swap) on the event loop. Only the last version's flattened rows are kept to
+diff against, not the old snapshots themselves. last_updated is stamped on
+every rebuild, so it doesn't count as a change by itself and only travels
+along with a symbol's real changes.
+
+Listeners registered with add_listener() (the push stream) are called after
+every publish with the new snapshot, its delta and the flattened rows.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, replace
+from functools import cached_property
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from app.config import settings
+from app.schemas import StockResponse
+from app.utils.columns import StockColumns
+from app.utils.movers import Movers
+from app.utils.market_status import get_current_ist_time
+
+
+@dataclass(frozen=True)
+class MarketSnapshot:
+    version: int
+    built_at: datetime
+    stocks: Tuple[StockResponse, ...]
+    # What produced it: "bars", "quotes", "disk" (cache file at startup) or "empty"
+    source: str = "empty"
+
+    @cached_property
+    def positions(self) -> Dict[str, int]:
+        """Symbol -> index into `stocks`; built by prepare()."""
+        return {s.symbol: i for i, s in enumerate(self.stocks)}
+
+    def get(self, symbol: str) -> Optional[StockResponse]:
+        i = self.positions.get(symbol)
+        return self.stocks[i] if i is not None else None
+
+    def get_many(self, symbols: Iterable[str], keep_order: bool = False) -> List[StockResponse]:
+        """
+        Stocks for `symbols` that are in the snapshot, each once: in snapshot
+        (rank) order, or in the order asked for with keep_order.
+        """
+        positions = self.positions
+        found = [positions[s] for s in dict.fromkeys(symbols) if s in positions]
+        return [self.stocks[i] for i in (found if keep_order else sorted(found))]
+
+    @cached_property
+    def columns(self) -> StockColumns:
+        """Columnar mirror and indexes for filtering/sorting (app/utils/columns.py); built by prepare()."""
+        return StockColumns(self.stocks)
+
+    @cached_property
+    def movers(self) -> Movers:
+        """Precomputed top-K rankings (app/utils/movers.py); built by prepare()."""
+        return Movers(self.columns)
+
+
+@dataclass(frozen=True)
+class SnapshotDelta:
+    """What changed from version - 1 to version."""
+    version: int
+    changed: Dict[str, Dict[str, Any]]  # symbol -> {dotted field: new value}
+    added: Tuple[str, ...]
+    removed: Tuple[str, ...]
+
+
+def flatten_stock(stock: StockResponse) -> Dict[str, Any]:
+    """JSON-ready fields of a stock keyed by dotted path ("indicators.rsi_value"), minus last_updated."""
+    out: Dict[str, Any] = {}
+
+    def walk(prefix: str, value: Any):
+        if isinstance(value, dict) and value:
+            for key, item in value.items():
+                walk(f"{prefix}.{key}" if prefix else key, item)
+        else:
+            out[prefix] = value
+
+    walk("", stock.model_dump(mode="json", exclude={"last_updated"}))
+    return out
+
+
+def diff_fields(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    changed = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    # Fields that vanished (e.g. a key dropped from a nested dict) read as None
+    changed.update({k: None for k in old if k not in new})
+    return changed
+
+
+def _diff(snapshot: MarketSnapshot, old_rows: Dict[str, Dict[str, Any]],
+          rows: Dict[str, Dict[str, Any]]) -> SnapshotDelta:
+    changed = {}
+    for stock in snapshot.stocks:
+        fields = diff_fields(old_rows.get(stock.symbol, {}), rows[stock.symbol])
+        if fields:
+            fields["last_updated"] = stock.last_updated.isoformat()
+            changed[stock.symbol] = fields
+    added = tuple(s for s in rows if s not in old_rows)
+    removed = tuple(s for s in old_rows if s not in rows)
+    return SnapshotDelta(snapshot.version, changed, added, removed)
+
+
+# Per-snapshot structures prepare() builds; they don't depend on the version
+_DERIVED = ("positions", "columns", "movers")
+
+
+def _renumber(snapshot: MarketSnapshot, version: int) -> MarketSnapshot:
+    """`snapshot` as `version`, keeping the derived structures already built for it."""
+    renumbered = replace(snapshot, version=version)
+    renumbered.__dict__.update({name: snapshot.__dict__[name] for name in _DERIVED if name in snapshot.__dict__})
+    return renumbered
+
+
+class PreparedPublish(NamedTuple):
+    """A snapshot with its flattened rows and delta, computed against version `base_version`."""
+    snapshot: MarketSnapshot
+    rows: Dict[str, Dict[str, Any]]
+    delta: SnapshotDelta
+    base_version: int
+
+
+class SnapshotStore:
+    def __init__(self, history: int = settings.SNAPSHOT_HISTORY):
+        self._lock = threading.Lock()
+        self._current = MarketSnapshot(int(time.time() * 1000), get_current_ist_time(), ())
+        self._rows: Dict[str, Dict[str, Any]] = {}
+        self._deltas = deque(maxlen=history)
+        self._listeners: List[Callable] = []
+
+    def current(self) -> MarketSnapshot:
+        return self._current
+
+    def current_rows(self) -> Tuple[MarketSnapshot, Dict[str, Dict[str, Any]]]:
+        """The current snapshot with its flattened rows (treat them as read-only)."""
+        with self._lock:
+            return self._current, self._rows
+
+    def add_listener(self, listener: Callable[[MarketSnapshot, SnapshotDelta, Dict[str, Dict[str, Any]]], None]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def prepare(self, stocks: Iterable[StockResponse], source: str, after_version: int = 0) -> PreparedPublish:
+        """
+        The expensive half of publish(): the snapshot's symbol index, columns
+        (including StockColumns.fields) and rankings, its flattened rows and the delta against the current
+        version. Blocking (a model_dump per row); run it off the event loop,
+        then hand the result to commit(). The version is above both the
+        current one and `after_version` (e.g. the one persisted before a restart).
+        """
+        stocks = tuple(stocks)
+        with self._lock:
+            base, base_rows = self._current, self._rows
+        snapshot = MarketSnapshot(max(base.version, after_version) + 1, get_current_ist_time(), stocks, source)
+        # Symbol index, columns, indexes and rankings are built here, so no request pays for them
+        snapshot.positions
+        snapshot.movers
+        # Every scalar column (Arrow / MessagePack responses, the snapshot file)
+        snapshot.columns.fields
+        rows = {s.symbol: flatten_stock(s) for s in stocks}
+        return PreparedPublish(snapshot, rows, _diff(snapshot, base_rows, rows), base.version)
+
+    def commit(self, prepared: PreparedPublish) -> MarketSnapshot:
+        """Make a prepare()d snapshot current and notify listeners."""
+        with self._lock:
+            snapshot, delta = prepared.snapshot, prepared.delta
+            if prepared.base_version != self._current.version:
+                # Another publish landed after prepare(): renumber and diff against it instead
+                snapshot = _renumber(snapshot, max(self._current.version + 1, snapshot.version))
+                delta = _diff(snapshot, self._rows, prepared.rows)
+            self._deltas.append(delta)
+            # Freed after the lock is released (a previous snapshot is thousands of objects)
+            retired = self._current, self._rows
+            # Single reference swap: readers see the old snapshot or the new one, never a mix
+            self._current = snapshot
+            self._rows = rows = prepared.rows
+        del retired
+        for listener in list(self._listeners):
+            try:
+                listener(snapshot, delta, rows)
+            except Exception as e:
+                print(f"Snapshot listener failed: {e}", flush=True)
+        return snapshot
+
+    def publish(self, stocks: Iterable[StockResponse], source: str, after_version: int = 0) -> MarketSnapshot:
+        """prepare() + commit() in one blocking call (startup, tests); the refresh cycle splits them."""
+        return self.commit(self.prepare(stocks, source, after_version))
+
+    def changes_since(self, since: int) -> dict:
+        """
+        Net changes from version `since` to the current one. full_reload is set
+        when `since` is older than the ring (or unknown, e.g. before a restart).
+        """
+        with self._lock:
+            current, deltas = self._current, list(self._deltas)
+        payload = {"since": since, "version": current.version, "built_at": current.built_at.isoformat(),
+                   "full_reload": False, "changed": {}, "added": [], "removed": []}
+        if since == current.version:
+            return payload
+        if since > current.version or not deltas or since < deltas[0].version - 1:
+            payload["full_reload"] = True
+            return payload
+
+        changed: Dict[str, Dict[str, Any]] = {}
+        added, removed = set(), set()
+        for delta in deltas:
+            if delta.version <= since:
+                continue
+            for symbol in delta.removed:
+                changed.pop(symbol, None)
+                # Added and removed within the window: the client never saw it
+                if symbol in added:
+                    added.discard(symbol)
+                else:
+                    removed.add(symbol)
+            for symbol in delta.added:
+                if symbol in removed:
+                    removed.discard(symbol)
+                else:
+                    added.add(symbol)
+            for symbol, fields in delta.changed.items():
+                changed.setdefault(symbol, {}).update(fields)
+        payload.update(changed=changed, added=sorted(added), removed=sorted(removed))
+        return payload
+
+
+snapshots = SnapshotStore()
+
+
+def get_snapshot() -> MarketSnapshot:
+    return snapshots.current()
@@ -0,0 +1,292 @@
+"""
+Binary on-disk copy of the published snapshot, for a fast cold start.
+
+Layout (little-endian):
+
+  header   magic "NGTASNAP", format version (u16), reserved (u16), rows (u32),
+           snapshot version (i64), payload bytes (u64), CRC-32 of the payload (u32)
+  payload  manifest length (u32) + manifest (JSON: schema fingerprint, build
+           time, source, and where each block sits), then 8-byte aligned blocks:
+           - string table: (count + 1) int64 byte offsets + one UTF-8 blob
+           - one column per StockResponse field, keyed by dotted name:
+               f8 / i8 / b1   raw float64 / int64 / bool arrays (NaN = None)
+               str            int32 ids into the string table (-1 = None)
+               optbool        int8, -1 = None
+               json           int32 string ids of JSON text (chart_data,
+                              returns, derived, and anything else non-scalar)
+
+Columns come straight from StockColumns.fields, so writing costs one pass
+over arrays the snapshot already has. Loading checks the magic, format
+version, CRC and schema fingerprint, then rebuilds the rows with
+model_construct (no per-field validation: the data was validated before it
+was published and is unchanged since, as the checksum shows). A file
+written for another StockResponse schema is rejected rather than misread.
+
+Writes go to a temp file in the same directory and are swapped in with
+os.replace, so a crash mid-write leaves the previous file intact.
+"""
+import gc
+import hashlib
+import json
+import os
+import struct
+import tempfile
+import zlib
+from datetime import datetime
+from typing import Any, Dict, List, NamedTuple, Tuple, get_args
+
+import numpy as np
+from pydantic import TypeAdapter
+
+from app.schemas import ChartDataPoint, StockFlags, StockHistory, Indicators, StockResponse
+from app.services.snapshot import MarketSnapshot
+from app.utils.columns import SCALAR_FIELDS
+
+MAGIC = b"NGTASNAP"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<8sHHIqQI")
+_ALIGN = 8
+
+_NESTED = {"history": StockHistory, "indicators": Indicators, "flags": StockFlags}
+_SCALAR_NAMES = {dotted for dotted, _, _ in SCALAR_FIELDS}
+# Fields that aren't scalar columns: stored per row as JSON text
+_JSON_FIELDS = [name for name in StockResponse.model_fields
+                if name not in _NESTED and name not in _SCALAR_NAMES]
+_DATETIME_FIELDS = {dotted for dotted, _, kind in SCALAR_FIELDS if kind is datetime}
+_STOCK_LIST = TypeAdapter(List[StockResponse])
+
+
+def _nullable(attrs: Tuple[str, ...]) -> bool:
+    model = StockResponse if len(attrs) == 1 else _NESTED[attrs[0]]
+    return type(None) in get_args(model.model_fields[attrs[-1]].annotation)
+
+
+# Float columns store None as NaN; only these get None back (the rest keep NaN)
+_NULLABLE_FLOATS = {dotted for dotted, attrs, kind in SCALAR_FIELDS if kind is float and _nullable(attrs)}
+
+
+def _schema_fingerprint() -> str:
+    layout = [(dotted, kind.__name__) for dotted, _, kind in SCALAR_FIELDS] + [(n, "json") for n in _JSON_FIELDS]
+    return hashlib.sha1(json.dumps(layout).encode()).hexdigest()[:16]
+
+
+SCHEMA = _schema_fingerprint()
+
+
+class SnapshotFileError(ValueError):
+    """The file isn't a readable snapshot for this format and schema."""
+
+
+class LoadedSnapshot(NamedTuple):
+    stocks: List[StockResponse]
+    version: int
+    built_at: datetime
+    source: str
+
+
+class _Strings:
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+
+    def id(self, value) -> int:
+        if value is None:
+            return -1
+        return self.ids.setdefault(value, len(self.ids))
+
+    def encode(self) -> Tuple[bytes, bytes]:
+        blobs = [s.encode() for s in self.ids]
+        offsets = np.zeros(len(blobs) + 1, dtype="<i8")
+        np.cumsum([len(b) for b in blobs], out=offsets[1:])
+        return offsets.tobytes(), b"".join(blobs)
+
+
+def _column_block(values: np.ndarray, strings: _Strings) -> Tuple[str, bytes]:
+    if values.dtype == np.float64:
+        return "f8", values.astype("<f8").tobytes()
+    if values.dtype == np.int64:
+        return "i8", values.astype("<i8").tobytes()
+    if values.dtype == bool:
+        return "b1", values.tobytes()
+    present = [v for v in values if v is not None]
+    if all(isinstance(v, str) for v in present):
+        return "str", np.array([strings.id(v) for v in values], dtype="<i4").tobytes()
+    if all(isinstance(v, bool) for v in present):
+        return "optbool", np.array([-1 if v is None else int(v) for v in values], dtype="i1").tobytes()
+    return "json", np.array([strings.id(None if v is None else json.dumps(v)) for v in values], dtype="<i4").tobytes()
+
+
+def encode_snapshot(snapshot: MarketSnapshot) -> bytes:
+    strings = _Strings()
+    blocks: List[Tuple[str, str, bytes]] = []
+    for name, values in snapshot.columns.fields.items():
+        kind, data = _column_block(values, strings)
+        blocks.append((name, kind, data))
+    dumped = _STOCK_LIST.dump_python(list(snapshot.stocks), mode="json", include={"__all__": set(_JSON_FIELDS)})
+    for name in _JSON_FIELDS:
+        ids = [strings.id(None if row[name] is None else json.dumps(row[name], separators=(",", ":")))
+               for row in dumped]
+        blocks.append((name, "json", np.array(ids, dtype="<i4").tobytes()))
+    string_offsets, string_blob = strings.encode()
+
+    layout, body, position = {}, [], 0
+
+    def place(data: bytes) -> Tuple[int, int]:
+        nonlocal position
+        pad = -position % _ALIGN
+        body.append(b"\0" * pad + data)
+        position += pad
+        start = position
+        position += len(data)
+        return start, len(data)
+
+    layout["string_offsets"] = place(string_offsets)
+    layout["string_blob"] = place(string_blob)
+    columns = [{"name": name, "kind": kind, "block": place(data)} for name, kind, data in blocks]
+    manifest = json.dumps({
+        "schema": SCHEMA,
+        "built_at": snapshot.built_at.isoformat(),
+        "source": snapshot.source,
+        "strings": len(strings.ids),
+        "layout": layout,
+        "columns": columns,
+    }, separators=(",", ":")).encode()
+    # Block offsets are relative to the end of the manifest; pad it so they stay aligned
+    manifest += b" " * (-(4 + len(manifest)) % _ALIGN)
+    payload = struct.pack("<I", len(manifest)) + manifest + b"".join(body)
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, 0, len(snapshot.stocks), snapshot.version,
+                         len(payload), zlib.crc32(payload))
+    return header + payload
+
+
+def write_snapshot_file(path: str, snapshot: MarketSnapshot) -> int:
+    """Atomically replace `path` with `snapshot`; returns the bytes written. Blocking."""
+    data = encode_snapshot(snapshot)
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+    return len(data)
+
+
+def _block(buffer: memoryview, base: int, block, dtype: str) -> np.ndarray:
+    start, length = block
+    return np.frombuffer(buffer, dtype=dtype, count=length // np.dtype(dtype).itemsize, offset=base + start)
+
+
+def decode_snapshot(data: bytes) -> LoadedSnapshot:
+    if len(data) < HEADER.size:
+        raise SnapshotFileError("truncated header")
+    magic, fmt, _, rows, version, payload_len, crc = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise SnapshotFileError("not a snapshot file")
+    if fmt != FORMAT_VERSION:
+        raise SnapshotFileError(f"format version {fmt}, expected {FORMAT_VERSION}")
+    payload = memoryview(data)[HEADER.size:]
+    if len(payload) != payload_len or zlib.crc32(payload) != crc:
+        raise SnapshotFileError("checksum mismatch (truncated or corrupt)")
+
+    (manifest_len,) = struct.unpack_from("<I", payload)
+    manifest = json.loads(bytes(payload[4:4 + manifest_len]))
+    if manifest["schema"] != SCHEMA:
+        raise SnapshotFileError("written for a different StockResponse schema")
+    base = 4 + manifest_len
+
+    offsets = _block(payload, base, manifest["layout"]["string_offsets"], "<i8").tolist()
+    start, _ = manifest["layout"]["string_blob"]
+    blob = bytes(payload[base + start:base + start + offsets[-1]])
+    strings = [blob[a:b].decode() for a, b in zip(offsets, offsets[1:])]
+
+    def lookup(ids: np.ndarray) -> List[Any]:
+        return [strings[i] if i >= 0 else None for i in ids.tolist()]
+
+    columns: Dict[str, List[Any]] = {}
+    for column in manifest["columns"]:
+        name, kind, block = column["name"], column["kind"], column["block"]
+        if kind == "f8":
+            values = _block(payload, base, block, "<f8")
+            nan = np.isnan(values) if name in _NULLABLE_FLOATS else None
+            values = values.tolist()
+            if nan is not None and nan.any():
+                for i in np.flatnonzero(nan).tolist():
+                    values[i] = None
+        elif kind == "i8":
+            values = _block(payload, base, block, "<i8").tolist()
+        elif kind == "b1":
+            values = _block(payload, base, block, "?").tolist()
+        elif kind == "str":
+            values = lookup(_block(payload, base, block, "<i4"))
+        elif kind == "optbool":
+            values = [None if v < 0 else bool(v) for v in _block(payload, base, block, "i1").tolist()]
+        elif kind == "json":
+            values = [None if v is None else json.loads(v) for v in lookup(_block(payload, base, block, "<i4"))]
+        else:
+            raise SnapshotFileError(f"unknown column kind {kind!r}")
+        if name in _DATETIME_FIELDS:
+            values = [None if v is None else datetime.fromisoformat(v) for v in values]
+        if len(values) != rows:
+            raise SnapshotFileError(f"column {name} has {len(values)} rows, expected {rows}")
+        columns[name] = values
+
+    return LoadedSnapshot(_rebuild(columns, rows), version,
+                          datetime.fromisoformat(manifest["built_at"]), manifest["source"])
+
+
+def _construct(model, values: Dict[str, Any]):
+    """
+    model_construct(**values) when `values` holds every field of `model`:
+    the same instance state, without its per-field default/alias pass, which
+    dominates when rebuilding thousands of rows (model_construct makes the
+    binary load no faster than the JSON one). It writes pydantic's instance
+    attributes directly, so pydantic is pinned in requirements.txt and
+    tests/test_snapshot_file.py checks the result against model_construct.
+    """
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+def _records(columns: Dict[str, List[Any]], names: List[str], keys: List[str]):
+    """Row dicts {key: value} from the column lists `names`, transposed with zip."""
+    return (dict(zip(keys, values)) for values in zip(*(columns[name] for name in names)))
+
+
+def _rebuild(columns: Dict[str, List[Any]], rows: int) -> List[StockResponse]:
+    # Serialization follows __dict__ order, so rows are built in model field order;
+    # the nested models' slots are placeholders until they're constructed
+    top = list(StockResponse.model_fields)
+    parts = [_records({**columns, **{prefix: [None] * rows for prefix in _NESTED}}, top, top)]
+    for prefix in _NESTED:
+        names = [name for name in columns if name.startswith(prefix + ".")]
+        parts.append(_records(columns, names, [name[len(prefix) + 1:] for name in names]))
+
+    # Tens of thousands of acyclic containers: collections mid-build would only rescan them
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        stocks = []
+        for fields, *nested in zip(*parts):
+            for (prefix, model), values in zip(_NESTED.items(), nested):
+                fields[prefix] = _construct(model, values)
+            fields["chart_data"] = [_construct(ChartDataPoint, point) for point in fields["chart_data"] or []]
+            stocks.append(_construct(StockResponse, fields))
+    finally:
+        if gc_enabled:
+            gc.enable()
+    return stocks
+
+
+def read_snapshot_file(path: str) -> LoadedSnapshot:
+    """Stocks stored at `path`. FileNotFoundError if absent, SnapshotFileError if unusable. Blocking."""
+    with open(path, "rb") as f:
+        data = f.read()
+    return decode_snapshot(data)
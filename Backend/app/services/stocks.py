@@ -4,22 +4,35 @@ import numpy as np
 import asyncio
 import time
 import traceback
-from datetime import datetime
-from typing import List, Dict, Any, Optional
+from datetime import date, datetime
+from typing import List, Dict, Any, Optional, Tuple, Union
 import asyncio
 import time
 import traceback
 import gc
 import json
 import os
+from collections import deque
+from dataclasses import dataclass
 from app.config import settings
 from app.schemas import StockResponse, StockHistory, Indicators, StockFlags, ChartDataPoint, StockExtendedDetails
 from app.services.indicators import (
-    calculate_macd, calculate_rsi, calculate_ema, calculate_sma,
     get_macd_status, get_rsi_status, get_trend, calculate_strength
 )
+from app.services.indicator_engine import AVG_VOLUME_DAYS, SymbolIndicators, compute_for_bars, compute_for_symbol
+from app.services.indicator_state import indicator_states, SymbolIndicatorState, LiveIndicators
 from app.utils.trading import get_last_trading_days, is_trading_day
-from app.utils.market_status import get_market_view_mode
+from app.utils.market_status import get_market_view_mode, get_current_ist_time
+from app.services.history_store import history_store, Bars
+from app.services.refresh_pipeline import run_pipeline
+from app.services.market_data import get_provider
+from app.services.compute import get_compute_backend
+from app.services.governor import get_governor
+from app.services.snapshot import snapshots, get_snapshot, MarketSnapshot
+from app.services.snapshot_file import read_snapshot_file, write_snapshot_file, SnapshotFileError
+from app.services.persistence import persistence
+from app.services.fundamentals import fundamentals_cache, get_fundamentals
+from app.services.single_flight import upstream
 import pytz
 from pydantic import ValidationError
 try:
@@ -38,37 +51,51 @@ def get_live_fno_stocks():
     pass
     return []
 
-# --- Global In-Memory Cache ---
-CACHE = {
-    "fno": {"data": [], "updated": 0},
-    "last_refresh": None
-}
 
-# Resolve absolute path for cache file to avoid CWD issues on Render
+# Per-cycle refresh stats (duration, peak RSS, ...), newest last
+REFRESH_STATS = deque(maxlen=50)
+
+# Resolve absolute path for cache file to avoid CWD issues on Render.
+# Legacy JSON cache: only read at startup when there is no binary snapshot file yet.
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) # app/services
 CACHE_FILE = os.path.join(BASE_DIR, "..", "..", "market_data_cache.json")
 CACHE_FILE = os.path.abspath(CACHE_FILE)
 
-def save_cache():
-    """Save valid stocks to disk for fast reload"""
+def save_cache(snapshot: Optional[MarketSnapshot] = None):
+    """Save the published stocks to the binary snapshot file for fast reload (blocking: run off the loop)"""
+    snapshot = snapshot or get_snapshot()
     try:
-        data = [s.model_dump(mode='json') for s in CACHE["fno"]["data"]]
-        with open(CACHE_FILE, "w") as f:
-            json.dump(data, f)
-        print(f"Cache saved to {CACHE_FILE} ({len(data)} items)", flush=True)
+        size = write_snapshot_file(settings.SNAPSHOT_FILE, snapshot)
+        print(f"Cache saved to {settings.SNAPSHOT_FILE} ({len(snapshot.stocks)} items, {size // 1024} KB)", flush=True)
     except Exception as e:
         print(f"Failed to save cache: {e}", flush=True)
 
+def persist_snapshot(snapshot: MarketSnapshot):
+    """Hand `snapshot` to the background writer; a newer one handed over before the write replaces it"""
+    persistence.schedule("snapshot", lambda: write_snapshot_file(settings.SNAPSHOT_FILE, snapshot))
+
 def load_cache():
-    """Load stocks from disk on startup"""
+    """Load stocks from disk on startup: the binary snapshot file, else the legacy JSON cache"""
+    try:
+        start = time.perf_counter()
+        loaded = read_snapshot_file(settings.SNAPSHOT_FILE)
+        # Numbered above the saved version: ETags, cursors and deltas never see a version twice
+        snapshots.publish(loaded.stocks, source="disk", after_version=loaded.version)
+        print(f"Loaded {len(loaded.stocks)} stocks from {settings.SNAPSHOT_FILE} "
+              f"in {(time.perf_counter() - start) * 1000:.1f} ms.", flush=True)
+        return True
+    except FileNotFoundError:
+        pass
+    except (OSError, SnapshotFileError) as e:
+        print(f"Snapshot file unusable ({e}), falling back to {CACHE_FILE}", flush=True)
+
     try:
         if os.path.exists(CACHE_FILE):
             print(f"Loading cache from {CACHE_FILE}...", flush=True)
             with open(CACHE_FILE, "r") as f:
                 data = json.load(f)
                 stocks = [StockResponse(**item) for item in data]
-                CACHE["fno"]["data"] = stocks
-                CACHE["fno"]["updated"] = time.time()
+                snapshots.publish(stocks, source="disk")
                 print(f"Loaded {len(stocks)} stocks from cache.", flush=True)
                 return True
     except Exception as e:
@@ -84,6 +111,166 @@ def get_safe_value(val, default=None):
         return val.item()
     return val
 
+def sync_histories(symbols: List[str], period: str = "2mo", full: bool = False) -> Dict[str, Optional[Bars]]:
+    """
+    Bring the locally stored daily bars for a group of symbols up to date.
+
+    Only bars from the last stored date onwards are downloaded; symbols with
+    nothing stored get `period` (or the whole history when full=True). The
+    group is fetched with at most two provider calls: one for symbols seen
+    before and one for new ones. Blocking (network + disk), so call it from
+    an executor.
+    """
+    provider = get_provider()
+    last_dates = {s: history_store.last_date(s) for s in symbols}
+
+    if full:
+        fresh = [s for s in symbols if not history_store.is_full(s)]
+        known = []
+    else:
+        fresh = [s for s in symbols if last_dates[s] is None]
+        known = [s for s in symbols if last_dates[s] is not None]
+
+    if fresh:
+        fetched = provider.fetch_history(fresh, period="max" if full else period)
+        for symbol, matrix in fetched.items():
+            history_store.replace(symbol, matrix, full=full)
+        del fetched
+    if known:
+        # Re-fetch the oldest last-stored day too so partial intraday bars get replaced
+        since = min(last_dates[s] for s in known)
+        fetched = provider.fetch_history(known, start=since)
+        for symbol, matrix in fetched.items():
+            history_store.append(symbol, matrix)
+        del fetched
+
+    out = {}
+    for symbol in symbols:
+        bars = history_store.read(symbol)
+        out[symbol] = bars if bars is not None and not bars.empty else None
+    return out
+
+def sync_history(symbol: str, period: str = "2mo", full: bool = False) -> Optional[Bars]:
+    """Single-symbol sync_histories()."""
+    return sync_histories([symbol], period=period, full=full)[symbol]
+
+def info_from_bars(bars: Bars, avg_volume: float = 0.0) -> Dict:
+    """Quote-style info dict derived from the last two stored bars (plus the engine's average volume)."""
+    prev = -2 if len(bars) > 1 else -1
+    return {
+        'lastPrice': float(bars.close[-1]),
+        'previousClose': float(bars.close[prev]),
+        'dayHigh': float(bars.high[-1]),
+        'dayLow': float(bars.low[-1]),
+        'volume': int(bars.volume[-1]),
+        'marketCap': 0, # Not critical for list view
+        'averageVolume': avg_volume if np.isfinite(avg_volume) else 0,
+        'yearHigh': float(bars.high[-252:].max()),
+        'yearLow': float(bars.low[-252:].min()),
+    }
+
+def build_chart_data(bars: Bars, ind: SymbolIndicators, points: int = 50) -> List[ChartDataPoint]:
+    """Chart points for the last `points` bars; indicator series are aligned with bars."""
+    chart_data = []
+    start = max(len(bars) - points, 0)
+    for i in range(start, len(bars)):
+        chart_data.append(ChartDataPoint(
+            date=str(bars.dates[i]),
+            open=float(bars.open[i]),
+            high=float(bars.high[i]),
+            low=float(bars.low[i]),
+            close=float(bars.close[i]),
+            volume=int(bars.volume[i]),
+            macd=get_safe_value(ind.macd[i]),
+            signal=get_safe_value(ind.signal[i]),
+            hist=get_safe_value(ind.hist[i]),
+            rsi=get_safe_value(ind.rsi[i]),
+            ema_20=get_safe_value(ind.ema_20[i]),
+            ema_50=get_safe_value(ind.ema_50[i])
+        ))
+    return chart_data
+
+def plan_stock_batch(batch: List[Tuple[str, Bars]]) -> List[Tuple]:
+    """
+    Parent side of the compute stage: decide per symbol between the O(1)
+    incremental path and a full recompute.
+
+    A symbol whose incremental indicator state is already committed through
+    its last finished bar gets its indicator values here (during market hours
+    by peeking at the live close of the forming bar, otherwise from the state
+    as is). Symbols with a newly finished daily bar (or no state yet) are left
+    for the full vectorized recompute. Returns compute_stock_batch() tasks:
+    (symbol, bars, values or None, partial, finished_through).
+    """
+    now_ist = get_current_ist_time()
+    market_open = get_market_view_mode(now_ist)['status'] == "OPEN"
+    today = now_ist.strftime("%Y-%m-%d")
+    # All a task needs: the indicator lookback, and a year for the 52W high/low
+    keep = max(settings.INDICATOR_LOOKBACK_BARS, 252)
+
+    tasks = []
+    for symbol, bars in batch:
+        # While the market is open today's bar is still forming
+        partial = market_open and str(bars.dates[-1]) == today and len(bars) > 1
+        finished_through = str(bars.dates[-2] if partial else bars.dates[-1])
+        state = indicator_states.get(symbol)
+        values = None
+        if state is not None and state.last_date == finished_through:
+            values = state.peek(float(bars.close[-1])) if partial else state.latest()
+        tasks.append((symbol, bars.tail(keep), values, partial, finished_through))
+    return tasks
+
+def compute_stock_batch(tasks: List[Tuple], as_records: bool = False) -> List[Tuple]:
+    """
+    Build the responses for a planned batch. Pure (no module state), so it
+    can run inline, in a thread or in a worker process.
+
+    Returns (symbol, stock, state) per symbol that could be processed; state
+    is the re-seeded SymbolIndicatorState for symbols that went through the
+    full recompute, else None. With as_records=True stock and state come back
+    as plain dicts, which pickle far smaller and faster than the objects.
+    """
+    lookback = settings.INDICATOR_LOOKBACK_BARS
+    full = [(symbol, bars) for symbol, bars, values, _, _ in tasks if values is None]
+    engine = compute_for_bars(dict(full), max_days=lookback) if full else None
+
+    results = []
+    for symbol, bars, values, partial, finished_through in tasks:
+        state = None
+        if values is None:
+            indicators = engine.for_symbol(symbol)
+            finished = bars.close[:-1] if partial else bars.close
+            state = SymbolIndicatorState.from_closes(finished[-lookback:], finished_through)
+        else:
+            # Same window as the engine's avg_volume, so both paths rank alike
+            indicators = LiveIndicators(values, float(np.nanmean(bars.volume[-AVG_VOLUME_DAYS:])))
+        # Manual Fast Info extraction from history to save an extra API call
+        info = info_from_bars(bars, indicators.avg_volume)
+        stock = process_stock_data(symbol, bars, info, include_chart=False,
+                                   indicators=indicators)
+        if stock is None:
+            continue
+        if as_records:
+            stock = stock.model_dump()
+            state = state.to_dict() if state is not None else None
+        results.append((symbol, stock, state))
+    del engine
+    return results
+
+async def build_stock_responses(batch: List[Tuple[str, Bars]]) -> List[StockResponse]:
+    """Compute stage of the refresh, run on the configured compute backend."""
+    backend = get_compute_backend()
+    tasks = plan_stock_batch(batch)
+    results = await backend.run(compute_stock_batch, tasks, backend.out_of_process)
+    stocks = []
+    for symbol, stock, state in results:
+        if isinstance(state, dict):
+            state = SymbolIndicatorState.from_dict(state)
+        if state is not None:
+            indicator_states.put(symbol, state)
+        stocks.append(StockResponse.model_validate(stock) if isinstance(stock, dict) else stock)
+    return stocks
+
 def get_strength_label(pct_change: float) -> str:
     if pct_change > 0.5:
         return "Buyers Dominating"
@@ -158,8 +345,21 @@ def create_stock_response_from_fast_info(symbol: str, info: Dict) -> StockRespon
 # Import standardized calculations
 from app.utils.calculations import calculate_strength_label, calculate_3d_avg, calculate_avg_strength_label
 
-def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include_chart: bool = False) -> Optional[StockResponse]:
+def process_stock_data(symbol: str, bars: Bars, info: Dict, include_chart: bool = False,
+                       indicators: Optional[Union[SymbolIndicators, LiveIndicators]] = None) -> Optional[StockResponse]:
+    """
+    Build the StockResponse for one symbol.
+
+    `indicators` is this symbol's slice of a batch compute_for_bars() run, or
+    the latest values from its incremental state; when omitted the engine is
+    run on this symbol alone.
+    """
     try:
+        current_price = float(info.get('lastPrice', 0.0))
+        prev_close = float(info.get('previousClose', 0.0))
+        current_change_abs = current_price - prev_close
+        current_change = (current_change_abs / prev_close * 100) if prev_close else 0.0
+
         now_ist = datetime.now(pytz.timezone('Asia/Kolkata'))
         
         view_mode = get_market_view_mode(now_ist)
@@ -184,22 +384,13 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
              # ... (Keep existing implementation or simplify if needed) ...
              # We can actually reuse the same logic
              # But for simpler logic:
-             target_str = target_date.strftime("%Y-%m-%d")
              try:
-                 # Standardize lookup
-                 if hasattr(hist_data.index, 'strftime'):
-                    formatted_index = hist_data.index.strftime("%Y-%m-%d")
-                 else:
-                    return 0.0
-                    
-                 if target_str in formatted_index:
-                        loc = hist_data.index.get_loc(target_str)
-                        if isinstance(loc, slice): loc = loc.start
-                        if isinstance(loc, int) and loc > 0:
-                            close = hist_data['Close'].iloc[loc]
-                            prev_day_close = hist_data['Close'].iloc[loc - 1]
-                            if prev_day_close and prev_day_close != 0:
-                                return (close - prev_day_close) / prev_day_close * 100
+                 loc = bars.index_of(target_date)
+                 if loc:
+                     close = bars.close[loc]
+                     prev_day_close = bars.close[loc - 1]
+                     if prev_day_close and prev_day_close != 0:
+                         return float((close - prev_day_close) / prev_day_close * 100)
              except:
                 pass
              return 0.0
@@ -227,22 +418,17 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
         # Use Standardized Calculation
         avg_3day = calculate_3d_avg(p_day1, p_day2, p_day3)
 
-        # 3. Indicators
-        closes = hist_data['Close']
-        macd, signal, hist = calculate_macd(closes)
-        rsi = calculate_rsi(closes)
-        ema_20 = calculate_ema(closes, 20)
-        ema_50 = calculate_ema(closes, 50)
-        sma_20 = calculate_sma(closes, 20)
-        sma_50 = calculate_sma(closes, 50)
+        # 3. Indicators (vectorized engine, usually precomputed for the whole batch)
+        ind = indicators if indicators is not None else compute_for_symbol(symbol, bars)
+        latest = ind.latest()
 
         # Statuses
-        macd_val = macd.iloc[-1] if not pd.isna(macd.iloc[-1]) else 0
-        signal_val = signal.iloc[-1] if not pd.isna(signal.iloc[-1]) else 0
-        hist_val = hist.iloc[-1] if not pd.isna(hist.iloc[-1]) else 0
-        rsi_val = rsi.iloc[-1] if not pd.isna(rsi.iloc[-1]) else 50
-        ema_20_val = ema_20.iloc[-1] if not pd.isna(ema_20.iloc[-1]) else current_price
-        ema_50_val = ema_50.iloc[-1] if not pd.isna(ema_50.iloc[-1]) else current_price
+        macd_val = latest['macd'] if latest['macd'] is not None else 0
+        signal_val = latest['signal'] if latest['signal'] is not None else 0
+        hist_val = latest['hist'] if latest['hist'] is not None else 0
+        rsi_val = latest['rsi'] if latest['rsi'] is not None else 50
+        ema_20_val = latest['ema_20'] if latest['ema_20'] is not None else current_price
+        ema_50_val = latest['ema_50'] if latest['ema_50'] is not None else current_price
         
         macd_status = get_macd_status(macd_val, signal_val, hist_val)
         rsi_status = get_rsi_status(rsi_val)
@@ -279,22 +465,8 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
         # 6. Chart Data - OPTIMIZED: Only generate if requested (Lazy Loading)
         chart_data = []
         if include_chart:
-            recent_hist = hist_data.tail(50)
-            for date, row in recent_hist.iterrows():
-                chart_data.append(ChartDataPoint(
-                    date=date.strftime("%Y-%m-%d"),
-                    open=row['Open'],
-                    high=row['High'],
-                    low=row['Low'],
-                    close=row['Close'],
-                    volume=row['Volume'],
-                    macd=get_safe_value(macd.loc[date]),
-                    signal=get_safe_value(signal.loc[date]),
-                    hist=get_safe_value(hist.loc[date]),
-                    rsi=get_safe_value(rsi.loc[date]),
-                    ema_20=get_safe_value(ema_20.loc[date]),
-                    ema_50=get_safe_value(ema_50.loc[date])
-                ))
+            chart_ind = ind if isinstance(ind, SymbolIndicators) else compute_for_symbol(symbol, bars)
+            chart_data = build_chart_data(bars, chart_ind)
 
         return StockResponse(
             symbol=symbol,
@@ -307,6 +479,7 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
             day_high=round(info.get('dayHigh', 0.0), 2),
             day_low=round(info.get('dayLow', 0.0), 2),
             volume=int(info.get('volume', 0)),
+            volume_ratio=round(curr_vol / avg_vol, 2) if avg_vol else None,
             market_cap=info.get('marketCap'),
             last_updated=datetime.now(),
             rank=0, # Calculated later
@@ -324,16 +497,16 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
                 volatility_3_day=0.0
             ),
             indicators=Indicators(
-                macd_line=get_safe_value(macd.iloc[-1]),
-                signal_line=get_safe_value(signal.iloc[-1]),
-                macd_histogram=get_safe_value(hist.iloc[-1]),
+                macd_line=latest['macd'],
+                signal_line=latest['signal'],
+                macd_histogram=latest['hist'],
                 macd_status=macd_status,
-                rsi_value=get_safe_value(rsi.iloc[-1]),
+                rsi_value=latest['rsi'],
                 rsi_zone=rsi_status,
-                sma_20=get_safe_value(sma_20.iloc[-1]),
-                sma_50=get_safe_value(sma_50.iloc[-1]),
-                ema_20=get_safe_value(ema_20.iloc[-1]),
-                ema_50=get_safe_value(ema_50.iloc[-1]),
+                sma_20=latest['sma_20'],
+                sma_50=latest['sma_50'],
+                ema_20=latest['ema_20'],
+                ema_50=latest['ema_50'],
                 trend=trend,
                 buyer_strength_score=buyer_score,
                 seller_strength_score=seller_score,
@@ -369,282 +542,319 @@ def process_stock_data(symbol: str, hist_data: pd.DataFrame, info: Dict, include
         traceback.print_exc()
         return None
 
+def fetch_fast_info(symbol: str) -> Dict:
+    """
+    Quote fields from yfinance fast_info (each attribute read is a request).
+    Fetch errors propagate; only fields this symbol doesn't have default. Blocking.
+    """
+    info = yf.Ticker(symbol).fast_info
+    def safe_get(key, default=0.0):
+        try:
+            val = getattr(info, key, default)
+            return val if val is not None else default
+        except (KeyError, AttributeError, TypeError):
+            return default
+
+    return {
+        'lastPrice': info.last_price or 0.0,
+        'previousClose': info.previous_close or 0.0,
+        'dayHigh': safe_get('day_high'),
+        'dayLow': safe_get('day_low'),
+        'volume': safe_get('last_volume', 0),
+        'marketCap': safe_get('market_cap'),
+        'averageVolume': safe_get('three_month_average_volume'),
+        'yearHigh': safe_get('year_high'),
+        'yearLow': safe_get('year_low'),
+    }
+
 async def fetch_stock_data(symbol: str) -> Optional[StockResponse]:
     try:
-        loop = asyncio.get_event_loop()
-        ticker = yf.Ticker(symbol)
-        
-        # Run blocking calls in executor
-        # Run blocking calls in executor
-        # Optimized: Use default executor (None) to avoid creating new threads for every request
-        
-        # Fetch history (need enough for indicators + 3 days)
-        # 3 months is safe
-        hist = await loop.run_in_executor(None, lambda: ticker.history(period="3mo"))
+        # Upstream calls run in the default executor, one flight per (symbol, kind):
+        # concurrent requests for the same uncached symbol share them, and a symbol
+        # with no history at all is answered from memory for UPSTREAM_NEGATIVE_TTL_S
+
+        # Sync stored history (need enough for indicators + 3 days)
+        # 3 months is safe for a first sync
+        bars = await upstream.run(symbol, "history", lambda: sync_history(symbol, period="3mo"))
         
         # Fetch fast_info (SAFE)
         info_dict = {}
         try:
-            info = await loop.run_in_executor(None, lambda: ticker.fast_info)
-            def safe_get(key, default=0.0):
-                try:
-                    val = getattr(info, key, default)
-                    return val if val is not None else default
-                except Exception:
-                    return default
-
-            info_dict = {
-                'lastPrice': safe_get('last_price'),
-                'previousClose': safe_get('previous_close'),
-                'dayHigh': safe_get('day_high'),
-                'dayLow': safe_get('day_low'),
-                'volume': safe_get('last_volume', 0),
-                'marketCap': safe_get('market_cap'),
-                'averageVolume': safe_get('three_month_average_volume'),
-                'yearHigh': safe_get('year_high'),
-                'yearLow': safe_get('year_low'),
-            }
+            # A missing price is as likely a rate limit as a dead symbol: never negative-cached
+            info_dict = dict(await upstream.run(symbol, "fast_info", lambda: fetch_fast_info(symbol), empty=None))
         except Exception as e:
             print(f"FastInfo failed for {symbol}: {e}. Falling back to History.", flush=True)
 
         # CRITICAL FALLBACK: If fast_info failed or returned 0s, use History
-        if not hist.empty:
-            last_row = hist.iloc[-1]
-            prev_row = hist.iloc[-2] if len(hist) > 1 else last_row
-            
-            if not info_dict.get('lastPrice'):
-                info_dict['lastPrice'] = last_row['Close']
-            if not info_dict.get('previousClose'):
-                info_dict['previousClose'] = prev_row['Close']
-            if not info_dict.get('dayHigh'):
-                info_dict['dayHigh'] = last_row['High']
-            if not info_dict.get('dayLow'):
-                info_dict['dayLow'] = last_row['Low']
-            if not info_dict.get('volume'):
-                info_dict['volume'] = last_row['Volume']
+        if bars is not None:
+            bar_info = info_from_bars(bars)
+            for key in ('lastPrice', 'previousClose', 'dayHigh', 'dayLow', 'volume'):
+                if not info_dict.get(key):
+                    info_dict[key] = bar_info[key]
         
         # If still no price, we can't process
-        if not info_dict.get('lastPrice'):
+        if bars is None or not info_dict.get('lastPrice'):
             print(f"Skipping {symbol}: No price data available from Info or History", flush=True)
             return None
 
-        return process_stock_data(symbol, hist, info_dict)
+        return process_stock_data(symbol, bars, info_dict)
 
     except Exception as e:
         msg = f"Error fetching {symbol}: {repr(e)}\n{traceback.format_exc()}"
         print(msg, flush=True)
-        try:
-             with open("backend_debug.log", "w") as f:
-                 f.write(msg)
-        except:
-             pass
+        # Appended off the event loop (it used to overwrite the log on every error)
+        persistence.append("backend_debug.log", f"{datetime.now()} {msg}\n")
         return None
 
-async def refresh_market_data():
-    """Background task to refresh data periodically using Bulk Download (Reliable)"""
-    
-    # 1. Fast Load from Disk
+def get_universe() -> List[str]:
+    """Symbols to refresh: the live F&O list if available, else the config list (de-duplicated)."""
+    live_symbols = get_live_fno_stocks()
+    if live_symbols:
+        print(f"Loaded {len(live_symbols)} F&O symbols from NSE Live.")
+        symbols = live_symbols
+    else:
+        print(f"Using fallback config F&O list ({len(settings.FNO_STOCKS)}).")
+        symbols = settings.FNO_STOCKS
+    # The config list repeats the blue chips; keep first-seen order
+    return list(dict.fromkeys(symbols))
+
+def load_local_state():
+    """Fast start from disk: last published stocks, indicator state and fundamentals."""
     load_cache()
+    loaded_states = indicator_states.load()
+    if loaded_states:
+        print(f"Loaded indicator state for {loaded_states} symbols.", flush=True)
+    loaded_fundamentals = fundamentals_cache.load()
+    if loaded_fundamentals:
+        print(f"Loaded fundamentals for {loaded_fundamentals} symbols.", flush=True)
+
+def fetch_quotes(symbols: List[str]) -> Dict[str, Optional[Bars]]:
+    """
+    Quotes-tier fetch: stored bars with the latest bars from upstream laid
+    over them in memory (today's forming bar while the market is open).
 
-    while True:
-        try:
-            with open("task_status.txt", "a") as f:
-                f.write(f"Task Loop Start (Bulk): {datetime.now()}\n")
-            
-            print("Refreshing market data (Bulk)...", flush=True)
-            start_time = time.time()
-            
-            print("Refreshing market data (Bulk)...", flush=True)
-            start_time = time.time()
-            
-            # Dynamic Fetch
-            live_symbols = get_live_fno_stocks()
-            if live_symbols:
-                print(f"Loaded {len(live_symbols)} F&O symbols from NSE Live.")
-                symbols = live_symbols
-            else:
-                print(f"Using fallback config F&O list ({len(settings.FNO_STOCKS)}).")
-                symbols = settings.FNO_STOCKS
-            
-            # HARD CAP: Only process top 25 stocks to stay under 512MB
-            # Python + Pandas overhead is ~300MB baseline + ~10MB per stock operation
-            # 25 is safe. 50 might push it.
-            if len(symbols) > 25:
-                 print(f"Cap applied: Limiting from {len(symbols)} to 25 stocks for stability.")
-                 symbols = symbols[:25]
-            
-            valid_stocks = []
-            
-            # SEMAPHORE: STRICT LIMIT TO 1 (Sequential) to prevent 512MB OOM
-            # Even 2-3 threads can spike memory during DataFrame creation.
-            # Sequential is safer and "Fast Enough" with the Seed Data.
-            sem = asyncio.Semaphore(1)
-
-            async def fetch_and_process(symbol):
-                async with sem:
-                    try:
-                        loop = asyncio.get_event_loop()
-                        ticker = yf.Ticker(symbol)
-                        
-                        # Fetch History (Blocking)
-                        # REDUCED HISTORY to 2mo to save RAM (approx 44 rows)
-                        hist = await loop.run_in_executor(None, lambda: ticker.history(period="2mo"))
-                        
-                        if hist.empty: return None
-
-                        # Manual Fast Info extraction from history to save an extra API call
-                        last_row = hist.iloc[-1]
-                        prev_row = hist.iloc[-2] if len(hist) > 1 else last_row
-                        
-                        info_dict = {
-                            'lastPrice': float(last_row['Close']),
-                            'previousClose': float(prev_row['Close']),
-                            'dayHigh': float(last_row['High']),
-                            'dayLow': float(last_row['Low']),
-                            'volume': int(last_row['Volume']),
-                            'marketCap': 0, # Not critical for list view
-                            'averageVolume': 0,
-                            'yearHigh': float(hist['High'].max()),
-                            'yearLow': float(hist['Low'].min()),
-                        }
-                        
-                        # Process (CPU bound, fast)
-                        processed = process_stock_data(symbol, hist, info_dict, include_chart=False)
-                        
-                        # Explicit cleanup
-                        del hist
-                        del ticker
-                        return processed
-                    except Exception:
-                        return None
-
-            # Gather all tasks
-            tasks = [fetch_and_process(sym) for sym in symbols]
-            
-            # Process as they complete to show progress? No, gather is easier for now.
-            # To avoid huge task list overhead, we can process in batches of 10 tasks.
-            
-            BATCH_SIZE = 10
-            total_processed = 0
-            
-            for i in range(0, len(symbols), BATCH_SIZE):
-                batch_tasks = tasks[i:i + BATCH_SIZE]
-                print(f"Processing Batch {i//BATCH_SIZE + 1}...", flush=True)
-                results = await asyncio.gather(*batch_tasks)
-                
-                for res in results:
-                    if res: valid_stocks.append(res)
-                
-                # Cleanup after batch
-                del results
-                del batch_tasks
-                gc.collect()
-                # Tiny yield
-                await asyncio.sleep(0.1)
-
-            print(f"Refreshed {len(valid_stocks)} stocks.", flush=True)
-
-            # Redundant loop removed (logic moved to batched chunks)
-
-            with open("task_status.txt", "a") as f:
-                f.write(f"Bulk Fetched: {len(valid_stocks)}/{len(symbols)}\n")
-
-            # Fallback: If Yahoo Finance failed (0 stocks), generate Mock Data
-            if not valid_stocks:
-                print("WARNING: Yahoo Finance failed. Generatng MOCK DATA.", flush=True)
-                import random
-                for i, symbol in enumerate(symbols[:50]): # limiting to 50
-                    base_price = random.uniform(100, 3000)
-                    change_pct = random.uniform(-2.5, 2.5)
-                    price = base_price * (1 + change_pct/100)
-                    
-                    mock_stock = StockResponse(
-                        symbol=symbol,
-                        name=symbol,
-                        sector=settings.SECTOR_MAPPING.get(symbol, "Unknown"),
-                        current_price=round(price, 2),
-                        previous_close=round(base_price, 2),
-                        current_change_abs=round(price - base_price, 2),
-                        current_change=round(change_pct, 2),
-                        day_high=round(price * 1.01, 2),
-                        day_low=round(price * 0.99, 2),
-                        volume=random.randint(10000, 1000000),
-                        market_cap=random.uniform(1000, 500000),
-                        last_updated=datetime.now(),
-                        rank=i+1,
-                        history=get_dummy_history(),
-                        indicators=get_dummy_indicators(),
-                        flags=get_dummy_flags(),
-                        chart_data=[],
-                        current_strength=get_strength_label(change_pct),
-                        day1_strength="Neutral",
-                        day2_strength="Neutral",
-                        day3_strength="Neutral",
-                        avg_3day_strength="Neutral"
-                    )
-                    valid_stocks.append(mock_stock)
-
-            if valid_stocks:
-                # Sort and Rank
-                valid_stocks.sort(key=lambda x: abs(x.history.avg_3day))
-                for idx, stock in enumerate(valid_stocks):
-                    stock.rank = idx + 1
-                
-                CACHE["fno"]["data"] = valid_stocks
-                CACHE["fno"]["updated"] = time.time()
-                CACHE["last_refresh"] = datetime.now()
-                
-                # 2. Save to Disk
-                save_cache()
-            
-            print(f"Market data refresh complete. {len(valid_stocks)} stocks. Time: {time.time() - start_time:.2f}s", flush=True)
-
-        except Exception as e:
-            print(f"Error in refresh task: {e}", flush=True)
-            with open("task_status.txt", "a") as f:
-                traceback.print_exc()
-        finally:
-            gc.collect()
-            
-        await asyncio.sleep(settings.REFRESH_INTERVAL)
+    Downloads from the oldest last-stored date, like sync_histories, but
+    nothing is written; the bars tier persists the settled bar after close.
+    Symbols with nothing stored are left to the bars tier. Blocking.
+    """
+    last_dates = {s: history_store.last_date(s) for s in symbols}
+    known = [s for s in symbols if last_dates[s] is not None]
+    fetched = get_provider().fetch_history(known, start=min(last_dates[s] for s in known)) if known else {}
+    out = {}
+    for symbol in symbols:
+        out[symbol] = history_store.read_overlay(symbol, fetched.get(symbol)) if symbol in known else None
+    del fetched
+    return out
+
+def build_mock_stocks(symbols: List[str]) -> List[StockResponse]:
+    """Random placeholder stocks, used only when nothing could be fetched or loaded."""
+    import random
+    mock_stocks = []
+    for i, symbol in enumerate(symbols[:50]): # limiting to 50
+        base_price = random.uniform(100, 3000)
+        change_pct = random.uniform(-2.5, 2.5)
+        price = base_price * (1 + change_pct/100)
+        
+        mock_stocks.append(StockResponse(
+            symbol=symbol,
+            name=symbol,
+            sector=settings.SECTOR_MAPPING.get(symbol, "Unknown"),
+            current_price=round(price, 2),
+            previous_close=round(base_price, 2),
+            current_change_abs=round(price - base_price, 2),
+            current_change=round(change_pct, 2),
+            day_high=round(price * 1.01, 2),
+            day_low=round(price * 0.99, 2),
+            volume=random.randint(10000, 1000000),
+            volume_ratio=round(random.uniform(0.3, 3.0), 2),
+            market_cap=random.uniform(1000, 500000),
+            last_updated=datetime.now(),
+            rank=i+1,
+            history=get_dummy_history(),
+            indicators=get_dummy_indicators(),
+            flags=get_dummy_flags(),
+            chart_data=[],
+            current_strength=get_strength_label(change_pct),
+            day1_strength="Neutral",
+            day2_strength="Neutral",
+            day3_strength="Neutral",
+            avg_3day_strength="Neutral"
+        ))
+    return mock_stocks
+
+async def run_refresh_cycle(tier: str, fetch, persist: bool = True) -> int:
+    """
+    One fetch -> compute -> publish cycle over the whole universe.
 
-def get_cached_stocks() -> List[StockResponse]:
-    return CACHE["fno"]["data"]
+    Symbols the cycle couldn't refresh keep their previously published entry,
+    so an upstream hiccup never drops rows from the list. Returns the number
+    of stocks refreshed.
+    """
+    persistence.append("task_status.txt", f"Task Loop Start ({tier}): {datetime.now()}\n")
+
+    print(f"Refreshing market data ({tier})...", flush=True)
+    start_time = time.time()
+    symbols = get_universe()
+
+    # Streaming fetch -> compute -> publish with bounded queues.
+    # Raw frames never leave the fetch stage and bars are dropped once each
+    # response is built.
+    # Concurrency and batch sizes come from this tier's RSS governor
+    governor = get_governor(tier)
+    valid_stocks, cycle = await run_pipeline(
+        symbols,
+        fetch=fetch,
+        compute=build_stock_responses,
+        queue_size=settings.REFRESH_QUEUE_SIZE,
+        admit=governor.admit,
+        **governor.current(),
+    )
+    cycle.tier = tier
+    cycle.governor_action = governor.record(cycle.start_rss_mb, cycle.peak_rss_mb, cycle.duration_s)
+    REFRESH_STATS.append(cycle.to_dict())
+    # Serialized and written by the background writer, like the snapshot
+    indicator_states.schedule_save()
+    print(f"Refresh cycle ({tier}): {cycle.processed}/{cycle.symbols} stocks, "
+          f"{cycle.duration_s:.2f}s, peak RSS {cycle.peak_rss_mb:.1f} MB, "
+          f"fetchers={cycle.fetch_concurrency} group={cycle.group_size} -> {cycle.governor_action}", flush=True)
+
+    persistence.append("task_status.txt", f"Fetched ({tier}): {len(valid_stocks)}/{len(symbols)}\n")
+
+    refreshed = len(valid_stocks)
+    refreshed_symbols = {s.symbol for s in valid_stocks}
+    universe = set(symbols)
+    valid_stocks.extend(s for s in get_snapshot().stocks
+                        if s.symbol in universe and s.symbol not in refreshed_symbols)
+
+    # Fallback: If Yahoo Finance failed and nothing was published yet, generate Mock Data
+    if not valid_stocks:
+        print("WARNING: Yahoo Finance failed. Generatng MOCK DATA.", flush=True)
+        valid_stocks = build_mock_stocks(symbols)
+
+    # Sort and Rank (stocks are frozen; carried-over ones may sit in the live snapshot)
+    valid_stocks.sort(key=lambda x: abs(x.history.avg_3day))
+    ranked = [stock if stock.rank == idx + 1 else stock.model_copy(update={"rank": idx + 1})
+              for idx, stock in enumerate(valid_stocks)]
+
+    # Flattening and diffing the rows runs off the loop; only the reference swap runs here
+    prepared = await asyncio.get_running_loop().run_in_executor(None, snapshots.prepare, ranked, tier)
+    snapshot = snapshots.commit(prepared)
+    del valid_stocks
+
+    if persist:
+        # Written by the background writer; the cycle doesn't wait for the disk
+        persist_snapshot(snapshot)
+
+    print(f"Market data refresh ({tier}) complete. {refreshed}/{len(snapshot.stocks)} stocks, "
+          f"version {snapshot.version}. Time: {time.time() - start_time:.2f}s", flush=True)
+    gc.collect()
+    return refreshed
+
+async def refresh_market_data() -> int:
+    """Bars tier: sync the daily-bar store, recompute indicators, publish and persist."""
+    return await run_refresh_cycle("bars", sync_histories)
+
+async def refresh_quotes() -> int:
+    """Quotes tier: reprice from the forming bar (O(1) indicator peeks); nothing is written to disk."""
+    return await run_refresh_cycle("quotes", fetch_quotes, persist=False)
+
+def get_cached_stocks() -> Tuple[StockResponse, ...]:
+    """Stocks of the current snapshot. Routes needing more than one read should hold get_snapshot() instead."""
+    return get_snapshot().stocks
 
 def get_stock_detail(symbol: str) -> Optional[StockResponse]:
-    # Try cache first
-    for s in CACHE["fno"]["data"]:
-        if s.symbol == symbol:
-            return s
-    return None
+    return get_snapshot().get(symbol)
 
 async def get_stocks_by_symbols(symbols: List[str]) -> List[StockResponse]:
-    cached = get_cached_stocks()
-    return [s for s in cached if s.symbol in symbols]
+    return get_snapshot().get_many(symbols)
 
 def start_background_tasks():
     # This is now handled in main.py lifespan
     pass
 
+def compute_returns(closes_long: np.ndarray) -> Dict[str, Optional[float]]:
+    """Multi-horizon % returns from a full daily close history (oldest first)."""
+    returns = {}
+    current_close = float(closes_long[-1])
+
+    def calculate_return(days_ago):
+        # Ensure we have enough data
+        if len(closes_long) > days_ago:
+            # Use [-days_ago] as approximation
+            prev_close = float(closes_long[-days_ago])
+            if prev_close and prev_close > 0:
+                return round(((current_close - prev_close) / prev_close) * 100, 2)
+        return None
+
+    # Trading days approximations (approx 252 trading days per year)
+    returns['1M'] = calculate_return(21)
+    returns['3M'] = calculate_return(63)
+    returns['1Y'] = calculate_return(252)
+    returns['3Y'] = calculate_return(252 * 3)
+    returns['5Y'] = calculate_return(252 * 5)
+
+    # All Time Return
+    first_close = float(closes_long[0])
+    if first_close > 0:
+        returns['All'] = round(((current_close - first_close) / first_close) * 100, 2)
+    else:
+        returns['All'] = None
+    return returns
+
+@dataclass(frozen=True)
+class HistoryExtras:
+    """Detail-view data derived from a symbol's full daily history, valid while `last_date` is its newest bar."""
+    last_date: date
+    returns: Dict[str, Optional[float]]
+    chart_data: Optional[List[ChartDataPoint]] = None
+
+# symbol -> HistoryExtras; replaced once the bars tier stores a newer daily bar
+HISTORY_EXTRAS: Dict[str, HistoryExtras] = {}
+
+def get_history_extras(symbol: str, with_chart: bool = False) -> Optional[HistoryExtras]:
+    """
+    Returns (and chart points, if with_chart) for the detail view. Served from
+    HISTORY_EXTRAS while the stored history is complete and has no newer bar,
+    so a warm symbol reads two small local files and calls nothing upstream.
+    Blocking on a miss (may download missing history).
+    """
+    cached = HISTORY_EXTRAS.get(symbol)
+    if cached is not None and (cached.chart_data is not None or not with_chart) \
+            and history_store.is_full(symbol) and history_store.last_date(symbol) == cached.last_date:
+        return cached
+
+    # Full history comes from the local store; only missing bars are downloaded
+    bars = upstream.call(symbol, "history_full", lambda: sync_history(symbol, full=True))
+    if bars is None:
+        return None
+    chart_data = cached.chart_data if cached is not None and cached.last_date == bars.last_date else None
+    if with_chart and chart_data is None:
+        # Calculate indicators on this history (last 50 points)
+        chart_data = build_chart_data(bars, compute_for_symbol(symbol, bars))
+    extras = HistoryExtras(bars.last_date, compute_returns(bars.close), chart_data)
+    HISTORY_EXTRAS[symbol] = extras
+    return extras
+
 def enrich_stock_data(stock: StockResponse) -> StockResponse:
     """
     Fetches detailed fundamental and return data for a single stock on-demand.
     This is a blocking call (web request) so it should be used only for detail views.
+    Returns an enriched copy; the snapshot's stock is left untouched.
     """
+    updates = {}
     try:
         symbol = stock.symbol
-        ticker = yf.Ticker(symbol)
         
-        # 1. Fetch Info (Fundamentals)
-        info = ticker.info
+        # 1. Fundamentals (refreshed nightly by the scheduler; fetched once on a miss)
+        info = get_fundamentals(symbol)
         
         # Fundamentals
-        stock.pe_ratio = info.get('trailingPE')
+        updates['pe_ratio'] = info.get('trailingPE')
         # Industry PE is often not direct. Try proxies or None.
-        stock.industry_pe = info.get('industryPE') 
+        updates['industry_pe'] = info.get('industryPE') 
         
-        stock.dividend_yield = info.get('dividendYield')
-        if stock.dividend_yield and stock.dividend_yield < 1: 
+        updates['dividend_yield'] = info.get('dividendYield')
+        if updates['dividend_yield'] and updates['dividend_yield'] < 1: 
              # Heuristic: if less than 1 (100%), it might be a ratio, 
              # BUT yfinance usually gives 0.0192 for 1.92%. 
              # WAIT. My previous debug said 1.92. 
@@ -660,90 +870,35 @@ def enrich_stock_data(stock: StockResponse) -> StockResponse:
         # If I had multiplied 1.92 * 100 I got 192.0.
         # So I should NOT multiply.
         
-        if stock.dividend_yield: stock.dividend_yield = round(stock.dividend_yield, 2)
+        if updates['dividend_yield']: updates['dividend_yield'] = round(updates['dividend_yield'], 2)
 
-        stock.roe = info.get('returnOnEquity')
-        if stock.roe: stock.roe = round(stock.roe * 100, 2)
+        updates['roe'] = info.get('returnOnEquity')
+        if updates['roe']: updates['roe'] = round(updates['roe'] * 100, 2)
         
         # ROCE Proxy (ROA is closest available often)
-        stock.roce = info.get('returnOnAssets') # As proxy if ROCE unavailable
-        if stock.roce: stock.roce = round(stock.roce * 100, 2)
+        updates['roce'] = info.get('returnOnAssets') # As proxy if ROCE unavailable
+        if updates['roce']: updates['roce'] = round(updates['roce'] * 100, 2)
         
-        stock.eps = info.get('trailingEps')
-        stock.book_value = info.get('bookValue')
-        stock.pb_ratio = info.get('priceToBook')
+        updates['eps'] = info.get('trailingEps')
+        updates['book_value'] = info.get('bookValue')
+        updates['pb_ratio'] = info.get('priceToBook')
         
         # 52W High/Low fallback/overwrite
-        stock.fifty_two_week_high = info.get('fiftyTwoWeekHigh', stock.fifty_two_week_high)
-        stock.fifty_two_week_low = info.get('fiftyTwoWeekLow', stock.fifty_two_week_low)
+        updates['fifty_two_week_high'] = info.get('fiftyTwoWeekHigh', stock.fifty_two_week_high)
+        updates['fifty_two_week_low'] = info.get('fiftyTwoWeekLow', stock.fifty_two_week_low)
         
         # DMA
-        stock.dma_50 = info.get('fiftyDayAverage')
-        stock.dma_200 = info.get('twoHundredDayAverage')
-        
-        # 2. Calculate Returns (1M, 3M, 1Y, 3Y, 5Y, All Time)
-        # Fetch max history to cover all cases
-        hist_long = ticker.history(period="max")
-        
-        returns = {}
-        if not hist_long.empty:
-            current_close = hist_long['Close'].iloc[-1]
-            
-            def calculate_return(days_ago):
-                # Ensure we have enough data
-                if len(hist_long) > days_ago:
-                    # Use iloc[-days_ago] as approximation
-                    prev_close = hist_long['Close'].iloc[-days_ago]
-                    if prev_close and prev_close > 0:
-                        return round(((current_close - prev_close) / prev_close) * 100, 2)
-                return None
-
-            # Trading days approximations (approx 252 trading days per year)
-            returns['1M'] = calculate_return(21)
-            returns['3M'] = calculate_return(63)
-            returns['1Y'] = calculate_return(252)
-            returns['3Y'] = calculate_return(252 * 3)
-            returns['5Y'] = calculate_return(252 * 5)
-            
-            # All Time Return
-            first_close = hist_long['Close'].iloc[0]
-            if first_close > 0:
-                returns['All'] = round(((current_close - first_close) / first_close) * 100, 2)
-            else:
-                returns['All'] = None
-
-            # Re-generate Chart Data if missing (Lazy Load)
-            if not stock.chart_data:
-                # Calculate indicators on this history
-                closes = hist_long['Close']
-                macd, signal, hist = calculate_macd(closes)
-                rsi = calculate_rsi(closes)
-                ema_20 = calculate_ema(closes, 20)
-                ema_50 = calculate_ema(closes, 50)
-                
-                chart_data = []
-                # Last 50 points
-                recent_hist = hist_long.tail(50)
-                for date, row in recent_hist.iterrows():
-                    chart_data.append(ChartDataPoint(
-                        date=date.strftime("%Y-%m-%d"),
-                        open=row['Open'],
-                        high=row['High'],
-                        low=row['Low'],
-                        close=row['Close'],
-                        volume=row['Volume'],
-                        macd=get_safe_value(macd.loc[date]),
-                        signal=get_safe_value(signal.loc[date]),
-                        hist=get_safe_value(hist.loc[date]),
-                        rsi=get_safe_value(rsi.loc[date]),
-                        ema_20=get_safe_value(ema_20.loc[date]),
-                        ema_50=get_safe_value(ema_50.loc[date])
-                    ))
-                stock.chart_data = chart_data
-        
-        stock.returns = returns
+        updates['dma_50'] = info.get('fiftyDayAverage')
+        updates['dma_200'] = info.get('twoHundredDayAverage')
         
-        return stock
+        # 2. Returns (1M, 3M, 1Y, 3Y, 5Y, All Time) and chart, cached until the next daily bar
+        extras = get_history_extras(symbol, with_chart=not stock.chart_data)
+        if extras is not None:
+            if extras.chart_data is not None and not stock.chart_data:
+                updates['chart_data'] = extras.chart_data
+            updates['returns'] = extras.returns
+        else:
+            updates['returns'] = {}
     except Exception as e:
         print(f"Error enriching {stock.symbol}: {e}", flush=True)
-        return stock
+    return stock.model_copy(update=updates)
@@ -0,0 +1,238 @@
+"""
+Push stream of snapshot updates (Server-Sent Events).
+
+Each connection subscribes to a topic: every symbol, a symbol list (or the
+saved watchlist), and optionally a filter with the /stocks/fno query
+parameters. Connections with the same topic share one Topic, so a publish
+costs one membership pass and one JSON encoding per distinct topic, not per
+client; the encoded frame is then offered to each subscriber's bounded queue.
+
+A subscriber whose queue is full (a tab that stopped reading) is dropped:
+its queue is replaced by a single "reset" frame and its stream ends, so one
+stalled client can't make the server buffer without limit. The client
+reconnects and starts again from a "snapshot" frame.
+
+Frames (rows use the delta feed's dotted field names):
+  event: snapshot  {version, built_at, rows: {symbol: {field: value}}}, on connect
+  event: delta     {version, changed: {symbol: {field: value}}, added, removed}
+  event: reset     {reason}, the client was dropped and should reconnect
+plus a ": ping" comment every STREAM_HEARTBEAT_S while idle. Symbols that
+start matching a filter arrive in `added` with their full row in `changed`;
+symbols that stop matching arrive in `removed`.
+"""
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, FrozenSet, Iterable, Optional, Set, Tuple
+
+from app.config import settings
+from app.services.snapshot import MarketSnapshot, SnapshotDelta, SnapshotStore, snapshots
+from app.utils.filters import apply_filters
+from app.utils.query_cache import cached_filters
+
+TopicKey = Tuple[Optional[FrozenSet[str]], Tuple[Tuple[str, Any], ...]]
+
+HEARTBEAT = b": ping\n\n"
+
+
+def encode_frame(event: str, payload: dict, event_id: Optional[int] = None) -> bytes:
+    data = json.dumps(payload, separators=(",", ":"))
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event}\ndata: {data}\n\n".encode()
+
+
+RESET = encode_frame("reset", {"reason": "slow_consumer"})
+
+
+class StreamFull(Exception):
+    """Raised by subscribe() when STREAM_MAX_SUBSCRIBERS connections are open."""
+
+
+class Topic:
+    def __init__(self, key: TopicKey):
+        self.key = key
+        self.symbols, items = key
+        self.filters = dict(items)
+        self.subscribers: Set["Subscriber"] = set()
+        # Symbols in the topic as of the last frame built
+        self.members: Optional[FrozenSet[str]] = None
+        self._snapshot_frame: Tuple[int, bytes] = (-1, b"")
+
+    def matching(self, snapshot: MarketSnapshot, rows: Dict[str, Dict[str, Any]]) -> FrozenSet[str]:
+        if not self.filters:
+            return frozenset(rows) if self.symbols is None else self.symbols & rows.keys()
+        if self.symbols is None:
+            # Same key space as /stocks/fno, so a page and its stream share cached results
+            return frozenset(s.symbol for s in cached_filters(snapshot.version, snapshot.columns, **self.filters))
+        stocks = [s for s in snapshot.stocks if s.symbol in self.symbols]
+        return frozenset(s.symbol for s in apply_filters(stocks, **self.filters))
+
+    def snapshot_frame(self, snapshot: MarketSnapshot, rows: Dict[str, Dict[str, Any]]) -> bytes:
+        version, frame = self._snapshot_frame
+        if version == snapshot.version:
+            return frame
+        members = self.matching(snapshot, rows)
+        if self.members is None:
+            self.members = members
+        payload = {
+            "version": snapshot.version,
+            "built_at": snapshot.built_at.isoformat(),
+            "rows": {s.symbol: {**rows[s.symbol], "last_updated": s.last_updated.isoformat()}
+                     for s in snapshot.stocks if s.symbol in members},
+        }
+        frame = encode_frame("snapshot", payload, snapshot.version)
+        self._snapshot_frame = (snapshot.version, frame)
+        return frame
+
+    def delta_frame(self, snapshot: MarketSnapshot, delta: SnapshotDelta,
+                    rows: Dict[str, Dict[str, Any]]) -> Optional[bytes]:
+        """This topic's share of `delta`, or None if nothing in it changed."""
+        members = self.matching(snapshot, rows)
+        previous = self.members if self.members is not None else members
+        self.members = members
+        entered, left = members - previous, previous - members
+
+        changed = {symbol: fields for symbol, fields in delta.changed.items()
+                   if symbol in members and symbol not in entered}
+        if entered:
+            for stock in snapshot.stocks:
+                if stock.symbol in entered:
+                    changed[stock.symbol] = {**rows[stock.symbol], "last_updated": stock.last_updated.isoformat()}
+        if not changed and not left:
+            return None
+        payload = {"version": snapshot.version, "changed": changed,
+                   "added": sorted(entered), "removed": sorted(left)}
+        return encode_frame("delta", payload, snapshot.version)
+
+
+class Subscriber:
+    def __init__(self, topic: Topic, buffer: int, version: int):
+        self.topic = topic
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max(1, buffer))
+        # Last snapshot version this client has been sent
+        self.version = version
+        self.dropped = False
+
+
+class StreamHub:
+    def __init__(self, store: SnapshotStore = snapshots,
+                 buffer: int = settings.STREAM_CLIENT_BUFFER,
+                 max_subscribers: int = settings.STREAM_MAX_SUBSCRIBERS,
+                 heartbeat_s: float = settings.STREAM_HEARTBEAT_S):
+        self.store = store
+        self.buffer = buffer
+        self.max_subscribers = max_subscribers
+        self.heartbeat_s = heartbeat_s
+        self._topics: Dict[TopicKey, Topic] = {}
+        self._count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listening = False
+        self.published = 0
+        self.frames_sent = 0
+        self.dropped = 0
+
+    @staticmethod
+    def topic_key(symbols: Optional[Iterable[str]] = None, filters: Optional[Dict[str, Any]] = None) -> TopicKey:
+        return (frozenset(symbols) if symbols is not None else None,
+                tuple(sorted((filters or {}).items())))
+
+    def subscribe(self, symbols: Optional[Iterable[str]] = None,
+                  filters: Optional[Dict[str, Any]] = None) -> Subscriber:
+        """Register a client (must run on the event loop); its first frame is the topic's snapshot."""
+        if self._count >= self.max_subscribers:
+            raise StreamFull(f"{self._count} stream subscribers already connected")
+        self._loop = asyncio.get_running_loop()
+        if not self._listening:
+            self.store.add_listener(self.on_publish)
+            self._listening = True
+
+        key = self.topic_key(symbols, filters)
+        topic = self._topics.get(key)
+        if topic is None:
+            topic = self._topics[key] = Topic(key)
+        snapshot, rows = self.store.current_rows()
+        subscriber = Subscriber(topic, self.buffer, snapshot.version)
+        subscriber.queue.put_nowait(topic.snapshot_frame(snapshot, rows))
+        topic.subscribers.add(subscriber)
+        self._count += 1
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        topic = subscriber.topic
+        if subscriber in topic.subscribers:
+            topic.subscribers.discard(subscriber)
+            self._count -= 1
+        if not topic.subscribers and self._topics.get(topic.key) is topic:
+            del self._topics[topic.key]
+
+    def on_publish(self, snapshot: MarketSnapshot, delta: SnapshotDelta,
+                   rows: Dict[str, Dict[str, Any]]) -> None:
+        """Snapshot listener; hops onto the event loop if published from another thread."""
+        if not self._topics or self._loop is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._fan_out(snapshot, delta, rows)
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._fan_out, snapshot, delta, rows)
+        except RuntimeError:
+            pass  # loop already closed (shutdown)
+
+    def _fan_out(self, snapshot: MarketSnapshot, delta: SnapshotDelta,
+                 rows: Dict[str, Dict[str, Any]]) -> None:
+        self.published += 1
+        for topic in list(self._topics.values()):
+            frame = topic.delta_frame(snapshot, delta, rows)
+            for subscriber in list(topic.subscribers):
+                # Joined after this version was published: its snapshot frame already covers it
+                if subscriber.version >= snapshot.version:
+                    continue
+                subscriber.version = snapshot.version
+                if frame is not None:
+                    self._offer(subscriber, frame)
+
+    def _offer(self, subscriber: Subscriber, frame: bytes) -> None:
+        try:
+            subscriber.queue.put_nowait(frame)
+            self.frames_sent += 1
+        except asyncio.QueueFull:
+            self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber) -> None:
+        subscriber.dropped = True
+        self.dropped += 1
+        self.unsubscribe(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(RESET)
+
+    async def frames(self, subscriber: Subscriber) -> AsyncIterator[bytes]:
+        """The subscriber's SSE byte stream; unsubscribes when the client goes away."""
+        try:
+            while True:
+                try:
+                    frame = await asyncio.wait_for(subscriber.queue.get(), timeout=self.heartbeat_s)
+                except asyncio.TimeoutError:
+                    yield HEARTBEAT
+                    continue
+                yield frame
+                if frame is RESET:
+                    break
+        finally:
+            self.unsubscribe(subscriber)
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._count,
+            "topics": len(self._topics),
+            "published": self.published,
+            "frames_sent": self.frames_sent,
+            "dropped_slow": self.dropped,
+            "buffer": self.buffer,
+        }
+
+
+hub = StreamHub()
@@ -0,0 +1,3 @@
+# Simple in-memory watchlist for demo (per user session ideally, but global here):
+# the followed symbols live in the app cache under this key
+WATCHLIST_KEY = "user_watchlist"
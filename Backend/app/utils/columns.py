@@ -0,0 +1,188 @@
+"""
+Columnar mirror of a snapshot's stocks, for filtering and sorting with NumPy.
+
+Numeric fields become float64/int64 arrays, flags become bool arrays and the
+low-cardinality labels (sector, MACD status, RSI zone, strengths) become
+integer codes into a small vocabulary. A predicate on a label is evaluated
+once per distinct value and broadcast through the codes, so it keeps the
+exact Python string semantics (lower()/upper() comparisons included).
+
+Built once per published snapshot (MarketSnapshot.columns, at publish time)
+and never modified afterwards. Alongside the columns it keeps secondary
+indexes for the planner in app/utils/filters.py:
+
+- every label column: value -> sorted row ids (a posting list)
+- price, volume, change and avg_3day: row ids sorted by value, for a
+  binary-search range lookup (NaN rows are kept aside: a NaN passes any
+  range filter, as it always has)
+
+An index probe reports its result size before materializing any rows, so
+the planner can start from the most selective one.
+
+`fields` (built on first use) holds every scalar field of StockResponse as
+a column, keyed by dotted name, for the binary list formats in
+app/utils/wire_format.py.
+"""
+from datetime import datetime
+from functools import cached_property
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple, Union, get_args, get_origin
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.schemas import StockResponse
+
+
+class Probe(NamedTuple):
+    """An index lookup: how many rows it selects, and how to get them (sorted row ids)."""
+    size: int
+    rows: Callable[[], np.ndarray]
+
+
+_NO_ROWS = np.empty(0, dtype=np.intp)
+
+
+class Categorical:
+    def __init__(self, values: Sequence[str]):
+        index: Dict[str, int] = {}
+        self.codes = np.fromiter((index.setdefault(v, len(index)) for v in values), dtype=np.int32, count=len(values))
+        self.vocab: List[str] = list(index)
+        # Posting lists: a stable argsort groups rows by code, ascending within each group
+        self.counts = np.bincount(self.codes, minlength=len(self.vocab))
+        self.postings = np.split(np.argsort(self.codes, kind="stable"), np.cumsum(self.counts)[:-1])
+
+    def allowed(self, predicate: Callable[[str], bool]) -> np.ndarray:
+        return np.fromiter((bool(predicate(v)) for v in self.vocab), dtype=bool, count=len(self.vocab))
+
+    def mask(self, predicate: Callable[[str], bool], rows: Optional[np.ndarray] = None) -> np.ndarray:
+        codes = self.codes if rows is None else self.codes[rows]
+        return self.allowed(predicate)[codes]
+
+    def probe(self, predicate: Callable[[str], bool]) -> Probe:
+        chosen = np.flatnonzero(self.allowed(predicate))
+        size = int(self.counts[chosen].sum())
+        if len(chosen) == 1:
+            return Probe(size, lambda: self.postings[chosen[0]])
+        return Probe(size, lambda: np.sort(np.concatenate([self.postings[c] for c in chosen] or [_NO_ROWS])))
+
+
+class RangeIndex:
+    def __init__(self, values: np.ndarray):
+        nan = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(values), dtype=bool)
+        self.nan_rows = np.flatnonzero(nan)
+        valid = np.flatnonzero(~nan)
+        self.order = valid[np.argsort(values[valid], kind="stable")]
+        self.sorted = values[self.order]
+
+    def probe(self, low=None, high=None) -> Probe:
+        """Rows with not (value < low) and not (value > high)."""
+        start = int(np.searchsorted(self.sorted, low, side="left")) if low is not None else 0
+        stop = int(np.searchsorted(self.sorted, high, side="right")) if high is not None else len(self.sorted)
+        stop = max(start, stop)
+        return Probe(stop - start + len(self.nan_rows),
+                     lambda: np.sort(np.concatenate((self.order[start:stop], self.nan_rows))))
+
+
+def _scalar_fields(model=StockResponse, prefix: str = "") -> List[Tuple[str, Tuple[str, ...], type]]:
+    """(dotted name, attribute path, type) of each scalar field; lists and dicts are skipped."""
+    found = []
+    for name, field in model.model_fields.items():
+        annotation = field.annotation
+        if get_origin(annotation) is Union:
+            annotation = next(a for a in get_args(annotation) if a is not type(None))
+        path = f"{prefix}{name}"
+        if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+            found += [(dotted, (name,) + attrs, kind)
+                      for dotted, attrs, kind in _scalar_fields(annotation, f"{path}.")]
+        elif annotation in (str, float, int, bool, datetime):
+            found.append((path, (name,), annotation))
+    return found
+
+
+SCALAR_FIELDS = _scalar_fields()
+
+
+class StockColumns:
+    def __init__(self, stocks: Sequence[StockResponse]):
+        self.stocks = tuple(stocks)
+        n = len(self.stocks)
+
+        def floats(get):
+            return np.fromiter((get(s) for s in self.stocks), dtype=np.float64, count=n)
+
+        def ints(get):
+            return np.fromiter((get(s) for s in self.stocks), dtype=np.int64, count=n)
+
+        def bools(get):
+            return np.fromiter((get(s) for s in self.stocks), dtype=bool, count=n)
+
+        self.price = floats(lambda s: s.current_price)
+        self.change = floats(lambda s: s.current_change)
+        self.volume = ints(lambda s: s.volume)
+        self.volume_ratio = floats(lambda s: s.volume_ratio if s.volume_ratio is not None else np.nan)
+        self.rank = ints(lambda s: s.rank)
+        self.avg_3day = floats(lambda s: s.history.avg_3day)
+        self.volatility = floats(lambda s: s.history.volatility_3_day)
+        # Missing RSI sorts as 0, like the row-wise sort key did
+        self.rsi = floats(lambda s: s.indicators.rsi_value or 0)
+        self.buyer_strength = ints(lambda s: s.indicators.buyer_strength_score)
+
+        self.is_constant = bools(lambda s: s.flags.is_constant_price)
+        self.is_gainer = bools(lambda s: s.flags.is_gainer_today)
+        self.is_loser = bools(lambda s: s.flags.is_loser_today)
+        self.is_high_volume = bools(lambda s: s.flags.is_high_volume)
+        self.is_breakout = bools(lambda s: s.flags.is_breakout_candidate)
+
+        self.sector = Categorical([s.sector for s in self.stocks])
+        self.macd_status = Categorical([s.indicators.macd_status for s in self.stocks])
+        self.rsi_zone = Categorical([s.indicators.rsi_zone for s in self.stocks])
+        self.current_strength = Categorical([s.current_strength for s in self.stocks])
+        self.day1_strength = Categorical([s.day1_strength for s in self.stocks])
+        self.day2_strength = Categorical([s.day2_strength for s in self.stocks])
+        self.day3_strength = Categorical([s.day3_strength for s in self.stocks])
+        self.avg_3day_strength = Categorical([s.avg_3day_strength for s in self.stocks])
+
+        self.symbol = np.array([s.symbol for s in self.stocks], dtype=str)
+        self.symbol_lower = np.array([s.symbol.lower() for s in self.stocks], dtype=str)
+        self.name_lower = np.array([s.name.lower() if s.name else "" for s in self.stocks], dtype=str)
+
+        self.price_index = RangeIndex(self.price)
+        self.volume_index = RangeIndex(self.volume)
+        self.change_index = RangeIndex(self.change)
+        self.avg_3day_index = RangeIndex(self.avg_3day)
+
+    def __len__(self) -> int:
+        return len(self.stocks)
+
+    @cached_property
+    def fields(self) -> Dict[str, np.ndarray]:
+        """
+        Every scalar field as a column: float64 for floats (NaN where None),
+        int64 / bool where always set, object (str, ISO datetime or None)
+        otherwise. Published snapshots have it built by SnapshotStore.prepare(),
+        off the event loop.
+        """
+        columns = {}
+        for dotted, attrs, kind in SCALAR_FIELDS:
+            values = []
+            for stock in self.stocks:
+                value = stock
+                for attr in attrs:
+                    value = getattr(value, attr)
+                values.append(value)
+            if kind is float:
+                column = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+            elif kind in (int, bool) and None not in values:
+                column = np.array(values, dtype=np.int64 if kind is int else bool)
+            else:
+                if kind is datetime:
+                    values = [v.isoformat() if v is not None else None for v in values]
+                column = np.empty(len(values), dtype=object)
+                column[:] = values
+            column.setflags(write=False)
+            columns[dotted] = column
+        return columns
+
+    def take(self, indices: np.ndarray) -> List[StockResponse]:
+        stocks = self.stocks
+        return [stocks[i] for i in indices.tolist()]
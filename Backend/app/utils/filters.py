@@ -1,8 +1,13 @@
-from typing import List, Optional
+import inspect
+from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
 from app.schemas import StockResponse
+from app.utils.columns import StockColumns
 
 def apply_filters(
-    stocks: List[StockResponse],
+    stocks: Union[Sequence[StockResponse], StockColumns],
     search: Optional[str] = None,
     sector: Optional[str] = None,
     min_price: Optional[float] = None,
@@ -38,142 +43,282 @@ def apply_filters(
     sort_by: Optional[str] = None,
     sort_dir: str = "asc"
 ) -> List[StockResponse]:
-    
-    # Create a shallow copy to avoid modifying the cache in-place (if we were sorting in place, but we are building a new list)
-    # Optimization: One-pass filtering
-    
-    # Pre-process comma-separated strings into sets for O(1) lookups
-    macd_statuses = set(macd_status.split(',')) if macd_status else None
-    rsi_zones = set(rsi_zone.split(',')) if rsi_zone else None
-    strength_filters = set(strength.lower().split(',')) if strength else None
-    
-    d1_strengths = set(p_day1_strength.lower().split(',')) if p_day1_strength else None
-    d2_strengths = set(p_day2_strength.lower().split(',')) if p_day2_strength else None
-    d3_strengths = set(p_day3_strength.lower().split(',')) if p_day3_strength else None
-    avg3_strengths = set(avg3_strength.lower().split(',')) if avg3_strength else None
-
-    # Pre-process search term
-    search_lower = search.lower() if search else None
-
-    filtered = []
-    
-    for s in stocks:
-        # 1. Search
-        if search_lower:
-            if search_lower not in s.symbol.lower() and (not s.name or search_lower not in s.name.lower()):
-                continue
-        
-        # 2. Sector
-        if sector and s.sector != sector:
-            continue
-            
-        # 3. Price
-        if min_price is not None and s.current_price < min_price:
-            continue
-        if max_price is not None and s.current_price > max_price:
-            continue
-            
-        # 4. Volume
-        if min_volume is not None and s.volume < min_volume:
-            continue
-        if max_volume is not None and s.volume > max_volume:
-            continue
-            
-        # 5. Change %
-        if min_change_pct is not None and s.current_change < min_change_pct:
-            continue
-        if max_change_pct is not None and s.current_change > max_change_pct:
-            continue
-            
-        # 6. Avg 3-Day Change % (Mapped to new args too)
-        # Support both min_avg_3day_pct (old) and min_avg3 (new)
-        limit_min_avg = min_avg3 if min_avg3 is not None else min_avg_3day_pct
-        limit_max_avg = max_avg3 if max_avg3 is not None else max_avg_3day_pct
-        
-        if limit_min_avg is not None and s.history.avg_3day < limit_min_avg:
-            continue
-        if limit_max_avg is not None and s.history.avg_3day > limit_max_avg:
-            continue
-            
-        # 7. Volatility
-        if min_volatility is not None and s.history.volatility_3_day < min_volatility:
-            continue
-        if max_volatility is not None and s.history.volatility_3_day > max_volatility:
-            continue
-            
-        # 8. Rank
-        if max_rank is not None and s.rank > max_rank:
-            continue
-            
-        # 9. Flags
-        if constant_only and not s.flags.is_constant_price:
-            continue
-        if gainers_only and not s.flags.is_gainer_today:
-            continue
-        if losers_only and not s.flags.is_loser_today:
-            continue
-        if high_volume_only and not s.flags.is_high_volume:
-            continue
-            
-        # 10. Indicators
-        if macd_statuses and s.indicators.macd_status not in macd_statuses:
-            continue
-            
-        # RSI Zone - check both renamed field and potentially old usage
-        # Schema has rsi_zone.
-        if rsi_zones and s.indicators.rsi_zone not in rsi_zones:
-            continue
-            
-        if strength_filters:
-            # Note: strength_label might be "Buyers Dominating", we match "buyers"
-            # Also support matching 'current_strength' field which is simpler
-            # The schema has 'current_strength' which is just "Buyers", "Sellers", "Balanced" (from calculations.py)
-            # But 'indicators.strength_label' is "Buyers Dominating" (from indicators.py - legacy?)
-            # Let's check 'current_strength' as it is the standardized one
-            if s.current_strength.lower() not in strength_filters:
-                continue
-        
-        # 11. Specific Strengths (Legacy)
-        if d1_strengths and s.day1_strength.lower() not in d1_strengths:
-            continue
-        if d2_strengths and s.day2_strength.lower() not in d2_strengths:
-            continue
-        if d3_strengths and s.day3_strength.lower() not in d3_strengths:
-            continue
-        if avg3_strengths and s.avg_3day_strength.lower() not in avg3_strengths:
-            continue
-            
-        # 12. Strict UI Strength Filters (New Params)
-        # Exact match logic (Case-insensitive)
-        if today_str and s.current_strength.upper() != today_str.upper():
-            continue
-        if p1_str and s.day1_strength.upper() != p1_str.upper():
-            continue
-        if p2_str and s.day2_strength.upper() != p2_str.upper():
-            continue
-        if p3_str and s.day3_strength.upper() != p3_str.upper():
-            continue
-        if avg3_str and s.avg_3day_strength.upper() != avg3_str.upper():
-            continue
+    """
+    Stocks matching every given filter, in input order or sorted by `sort_by`.
+
+    Runs on the columnar mirror: pass snapshot.columns to reuse the one
+    built at publish time; a plain list is converted first.
+    """
+    params = dict(locals())  # the filter arguments, before anything else is bound
+    del params["stocks"]
+    columns = stocks if isinstance(stocks, StockColumns) else StockColumns(stocks)
+    return columns.take(filter_indices(columns, filter_key(params)))
+
+
+# Normalized filters: ((name, value), ...) for every active filter, plus ("sort", ...)
+FilterKey = Tuple[Tuple[str, Any], ...]
 
-        filtered.append(s)
-
-    # 12. Sorting
-    if sort_by:
-        reverse = sort_dir == "desc"
-        
-        def get_sort_key(s: StockResponse):
-            if sort_by == "rank": return s.rank
-            if sort_by == "symbol": return s.symbol
-            if sort_by == "price": return s.current_price
-            if sort_by == "change": return s.current_change
-            if sort_by == "volume": return s.volume
-            if sort_by == "avg_3day": return s.history.avg_3day
-            if sort_by == "volatility": return s.history.volatility_3_day
-            if sort_by == "rsi": return s.indicators.rsi_value or 0
-            if sort_by == "strength": return s.indicators.buyer_strength_score
-            return s.rank
-            
-        filtered.sort(key=get_sort_key, reverse=reverse)
-        
-    return filtered
+_RANGE_PARAMS = ("min_price", "max_price", "min_volume", "max_volume", "min_change_pct", "max_change_pct",
+                 "min_volatility", "max_volatility", "max_rank")
+_FLAG_PARAMS = ("constant_only", "gainers_only", "losers_only", "high_volume_only")
+# Comma-separated, exact match
+_LIST_PARAMS = ("macd_status", "rsi_zone")
+# Comma-separated, case-insensitive
+_FOLDED_LIST_PARAMS = ("strength", "p_day1_strength", "p_day2_strength", "p_day3_strength", "avg3_strength")
+# Single value, case-insensitive
+_STRICT_PARAMS = ("today_str", "p1_str", "p2_str", "p3_str", "avg3_str")
+
+
+def filter_key(params: Mapping[str, Any]) -> FilterKey:
+    """
+    Hashable, normalized form of apply_filters' arguments: two argument sets
+    with the same key select the same rows in the same order. Unset and
+    no-op filters are dropped, comma-lists become sorted tuples, labels that
+    compare case-insensitively are case-folded, and the old/new 3-day average
+    bounds are merged.
+    """
+    key: Dict[str, Any] = {}
+    if params.get("search"):
+        key["search"] = params["search"].lower()
+    if params.get("sector"):
+        key["sector"] = params["sector"]
+    for name in _RANGE_PARAMS:
+        if params.get(name) is not None:
+            key[name] = params[name]
+    # Support both min_avg_3day_pct (old) and min_avg3 (new)
+    for new, old in (("min_avg3", "min_avg_3day_pct"), ("max_avg3", "max_avg_3day_pct")):
+        value = params.get(new) if params.get(new) is not None else params.get(old)
+        if value is not None:
+            key[new] = value
+    for name in _FLAG_PARAMS:
+        if params.get(name):
+            key[name] = True
+    for name in _LIST_PARAMS:
+        if params.get(name):
+            key[name] = tuple(sorted(set(params[name].split(','))))
+    for name in _FOLDED_LIST_PARAMS:
+        if params.get(name):
+            key[name] = tuple(sorted(set(params[name].lower().split(','))))
+    for name in _STRICT_PARAMS:
+        if params.get(name):
+            key[name] = params[name].upper()
+    if params.get("sort_by"):
+        key["sort"] = (SORT_COLUMNS.get(params["sort_by"], "rank"), params.get("sort_dir", "asc") == "desc")
+    return tuple(sorted(key.items()))
+
+
+# Use the indexes only on large universes (the full NSE list, not just F&O),
+# and only if the best one keeps at most this share of the rows; otherwise a
+# single vectorized pass over every row is cheaper than index lookups
+INDEX_MIN_ROWS = 10_000
+INDEX_SELECTIVITY = 0.25
+
+
+def filter_indices(columns: StockColumns, key: FilterKey) -> np.ndarray:
+    """Row indices selected (and ordered) by a filter key."""
+    filters = dict(key)
+    sort = filters.pop("sort", None)
+    rows = candidate_rows(columns, filters)
+    if rows is None:
+        indices = np.flatnonzero(filter_mask(columns, **filters))
+    else:
+        # Every filter (indexed ones included) re-checked on the candidates only
+        indices = rows[filter_mask(columns, rows=rows, **filters)]
+    if sort is not None:
+        indices = sort_indices(columns, indices, *sort)
+    return indices
+
+
+def candidate_rows(columns: StockColumns, filters: Dict[str, Any]) -> Optional[np.ndarray]:
+    """
+    Sorted row ids that can possibly match, from intersecting the selective
+    indexes smallest first; None if no index narrows things enough to beat a
+    full scan.
+    """
+    if len(columns) < INDEX_MIN_ROWS:
+        return None
+    probes = []
+    if filters.get("sector"):
+        sector = filters["sector"]
+        probes.append(columns.sector.probe(lambda v: v == sector))
+    for index, low, high in (
+        (columns.price_index, "min_price", "max_price"),
+        (columns.volume_index, "min_volume", "max_volume"),
+        (columns.change_index, "min_change_pct", "max_change_pct"),
+        (columns.avg_3day_index, "min_avg3", "max_avg3"),
+    ):
+        if filters.get(low) is not None or filters.get(high) is not None:
+            probes.append(index.probe(filters.get(low), filters.get(high)))
+    for column, name in ((columns.macd_status, "macd_status"), (columns.rsi_zone, "rsi_zone")):
+        if filters.get(name):
+            allowed = filters[name]
+            probes.append(column.probe(lambda v: v in allowed))
+    for column, listed, strict in (
+        (columns.current_strength, "strength", "today_str"),
+        (columns.day1_strength, "p_day1_strength", "p1_str"),
+        (columns.day2_strength, "p_day2_strength", "p2_str"),
+        (columns.day3_strength, "p_day3_strength", "p3_str"),
+        (columns.avg_3day_strength, "avg3_strength", "avg3_str"),
+    ):
+        if filters.get(listed):
+            wanted = filters[listed]
+            probes.append(column.probe(lambda v: v.lower() in wanted))
+        if filters.get(strict):
+            target = filters[strict]
+            probes.append(column.probe(lambda v: v.upper() == target))
+
+    limit = len(columns) * INDEX_SELECTIVITY
+    selective = sorted((p for p in probes if p.size <= limit), key=lambda p: p.size)
+    if not selective:
+        return None
+    rows = selective[0].rows()
+    for probe in selective[1:]:
+        if len(rows) == 0:
+            break
+        rows = np.intersect1d(rows, probe.rows(), assume_unique=True)
+    return rows
+
+
+def filter_mask(columns: StockColumns, search=None, sector=None, min_price=None, max_price=None,
+                min_volume=None, max_volume=None, min_change_pct=None, max_change_pct=None,
+                min_avg3=None, max_avg3=None, min_volatility=None, max_volatility=None, max_rank=None,
+                constant_only=False, gainers_only=False, losers_only=False, high_volume_only=False,
+                macd_status=(), rsi_zone=(), strength=(), p_day1_strength=(), p_day2_strength=(),
+                p_day3_strength=(), avg3_strength=(), today_str=None, p1_str=None, p2_str=None,
+                p3_str=None, avg3_str=None, rows: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Boolean row mask for normalized filters (see filter_key: `search` is
+    lower-cased, lists are tuples, strength lists lower-cased, strict labels
+    upper-cased).
+
+    With `rows`, the mask covers only those row ids (in that order).
+
+    Range bounds are written as "not below min" / "not above max" rather than
+    ">= min" so a NaN value passes, exactly as the old per-row `<`/`>` checks did.
+    """
+    def col(values: np.ndarray) -> np.ndarray:
+        return values if rows is None else values[rows]
+
+    mask = np.ones(len(columns) if rows is None else len(rows), dtype=bool)
+
+    # 1. Search (symbol or name, case-insensitive substring)
+    if search:
+        mask &= (np.char.find(col(columns.symbol_lower), search) >= 0) | (np.char.find(col(columns.name_lower), search) >= 0)
+
+    # 2. Sector
+    if sector:
+        mask &= columns.sector.mask(lambda v: v == sector, rows)
+
+    # 3-8. Ranges
+    for column, low, high in (
+        (columns.price, min_price, max_price),
+        (columns.volume, min_volume, max_volume),
+        (columns.change, min_change_pct, max_change_pct),
+        (columns.avg_3day, min_avg3, max_avg3),
+        (columns.volatility, min_volatility, max_volatility),
+        (columns.rank, None, max_rank),
+    ):
+        if low is not None:
+            mask &= ~(col(column) < low)
+        if high is not None:
+            mask &= ~(col(column) > high)
+
+    # 9. Flags
+    if constant_only:
+        mask &= col(columns.is_constant)
+    if gainers_only:
+        mask &= col(columns.is_gainer)
+    if losers_only:
+        mask &= col(columns.is_loser)
+    if high_volume_only:
+        mask &= col(columns.is_high_volume)
+
+    # 10. Indicators: exact match against any listed value
+    if macd_status:
+        mask &= columns.macd_status.mask(lambda v: v in macd_status, rows)
+    if rsi_zone:
+        mask &= columns.rsi_zone.mask(lambda v: v in rsi_zone, rows)
+
+    # 11. Strengths: case-insensitive match against any listed value ("buyers" matches "Buyers")
+    for column, wanted in (
+        (columns.current_strength, strength),
+        (columns.day1_strength, p_day1_strength),
+        (columns.day2_strength, p_day2_strength),
+        (columns.day3_strength, p_day3_strength),
+        (columns.avg_3day_strength, avg3_strength),
+    ):
+        if wanted:
+            mask &= column.mask(lambda v: v.lower() in wanted, rows)
+
+    # 12. Strict UI strength filters: single value, exact match (case-insensitive)
+    for column, target in (
+        (columns.current_strength, today_str),
+        (columns.day1_strength, p1_str),
+        (columns.day2_strength, p2_str),
+        (columns.day3_strength, p3_str),
+        (columns.avg_3day_strength, avg3_str),
+    ):
+        if target:
+            mask &= column.mask(lambda v: v.upper() == target, rows)
+
+    return mask
+
+
+# sort_by -> column; anything else sorts by rank
+SORT_COLUMNS = {
+    "rank": "rank",
+    "symbol": "symbol",
+    "price": "price",
+    "change": "change",
+    "volume": "volume",
+    "avg_3day": "avg_3day",
+    "volatility": "volatility",
+    "rsi": "rsi",
+    "strength": "buyer_strength",
+}
+
+
+def sort_indices(columns: StockColumns, indices: np.ndarray, column: str, descending: bool) -> np.ndarray:
+    """
+    `indices` reordered by a StockColumns attribute (a SORT_COLUMNS value),
+    stable in both directions like list.sort(reverse=...): ties keep their
+    input order.
+    """
+    keys = getattr(columns, column)[indices]
+    if keys.dtype.kind == "f" and np.isnan(keys).any():
+        # NaN has no consistent order; fall back to Python's sort for identical results
+        order = sorted(range(len(indices)), key=lambda i: keys[i], reverse=descending)
+        return indices[np.array(order, dtype=np.intp)]
+    if descending:
+        # Negate dense ranks: a reversed stable sort that keeps ties in input order
+        keys = -np.unique(keys, return_inverse=True)[1]
+    return indices[np.argsort(keys, kind="stable")]
+
+
+# Filter arguments a stream subscription may carry (membership only, so no sorting)
+STREAM_FILTER_PARAMS = tuple(p for p in inspect.signature(apply_filters).parameters
+                             if p not in ("stocks", "sort_by", "sort_dir"))
+
+
+def parse_filter_params(params: Mapping[str, str]) -> Dict[str, Any]:
+    """
+    Coerce query-string values to apply_filters' argument types, keeping only
+    filter arguments that are set. Raises ValueError on a malformed number.
+    """
+    signature = inspect.signature(apply_filters).parameters
+    parsed: Dict[str, Any] = {}
+    for name in STREAM_FILTER_PARAMS:
+        raw = params.get(name)
+        if raw is None or raw == "":
+            continue
+        annotation = signature[name].annotation
+        if annotation is bool:
+            if raw.lower() in ("true", "1", "yes", "on"):
+                parsed[name] = True
+        elif annotation == Optional[int]:
+            parsed[name] = int(raw)
+        elif annotation == Optional[float]:
+            parsed[name] = float(raw)
+        else:
+            parsed[name] = raw
+    return parsed
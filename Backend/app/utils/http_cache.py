@@ -0,0 +1,75 @@
+"""
+Conditional GET helpers for endpoints served from the market snapshot.
+
+A list endpoint's output is fully determined by the snapshot version and
+the query string, so the ETag is just those two hashed together. A poll
+carrying a matching If-None-Match is answered 304 before any filtering or
+serialization happens. Cache-Control lets browsers reuse a response until
+the next scheduled refresh (capped at HTTP_CACHE_MAX_AGE), after which they
+revalidate with the ETag.
+"""
+import hashlib
+from datetime import datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+from app.config import settings
+from app.utils.market_status import get_current_ist_time
+
+
+def normalized_query(request: Request) -> str:
+    """Query string with parameters sorted and empty values dropped."""
+    items = sorted((k, v) for k, v in request.query_params.multi_items() if v != "")
+    return "&".join(f"{k}={v}" for k, v in items)
+
+
+def make_etag(request: Request, version: int, variant: str = "") -> str:
+    """`variant` tells apart representations of the same query (e.g. the negotiated media type)."""
+    key = f"{request.url.path}?{normalized_query(request)}"
+    if variant:
+        key += f"#{variant}"
+    digest = hashlib.sha1(key.encode()).hexdigest()[:16]
+    return f'"{version}-{digest}"'
+
+
+def cache_control(next_refresh: Optional[datetime]) -> str:
+    max_age = settings.HTTP_CACHE_MAX_AGE
+    if next_refresh is not None:
+        until_refresh = int((next_refresh - get_current_ist_time()).total_seconds())
+        max_age = max(0, min(max_age, until_refresh))
+    return f"public, max-age={max_age}, must-revalidate"
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110): proxies may have weakened our strong tag
+    candidates = (tag.strip() for tag in header.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def cache_headers(etag: str, version: int, next_refresh: Optional[datetime]) -> dict:
+    # X-Snapshot-Version is what a client passes as ?since= to the delta feed
+    return {"ETag": etag, "Cache-Control": cache_control(next_refresh), "X-Snapshot-Version": str(version)}
+
+
+def not_modified(etag: str, version: int, next_refresh: Optional[datetime]) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag, version, next_refresh))
+
+
+def conditional_get(request: Request, response: Response, version: int,
+                    next_refresh: Optional[datetime], variant: str = "") -> Optional[Response]:
+    """
+    304 response if the client already has this version of this query;
+    otherwise None, with ETag/Cache-Control set on `response` for the
+    route's normal return value.
+    """
+    etag = make_etag(request, version, variant)
+    if etag_matches(request, etag):
+        return not_modified(etag, version, next_refresh)
+    response.headers.update(cache_headers(etag, version, next_refresh))
+    return None
@@ -1,5 +1,7 @@
-from datetime import datetime, time
+from datetime import datetime, time, timedelta
+from typing import Any, Dict, Optional, Tuple
 import pytz
+from app.config import settings
 from app.utils.trading import is_trading_day, get_last_trading_days
 
 IST = pytz.timezone('Asia/Kolkata')
@@ -70,6 +72,73 @@ def get_market_view_mode(now: datetime) -> dict:
         "dates": dates
     }
 
+def _phase_bounds(now: datetime) -> Tuple[str, datetime, datetime]:
+    """(status, phase start, phase end) for the market phase containing `now` (IST-aware)."""
+    status = get_market_view_mode(now)["status"]
+    day = now.date()
+    midnight = IST.localize(datetime.combine(day, time(0)))
+    open_at = IST.localize(datetime.combine(day, MARKET_START))
+    # get_market_view_mode treats MARKET_END itself as still OPEN
+    close_at = IST.localize(datetime.combine(day, MARKET_END)) + timedelta(seconds=1)
+    next_midnight = midnight + timedelta(days=1)
+
+    if status == "OPEN":
+        return status, open_at, close_at
+    if status == "CLOSED_PRE_MARKET":
+        return status, midnight, open_at
+    if status == "CLOSED_POST_MARKET":
+        return status, close_at, next_midnight
+    return status, midnight, next_midnight
+
+def get_next_refresh_time(now: datetime, last_refresh: Optional[datetime],
+                          rules: Optional[Dict[str, Any]] = None) -> Optional[datetime]:
+    """
+    When the next market-data refresh is due, per `rules` (phase -> rule,
+    default settings.REFRESH_PHASE_INTERVALS).
+
+    Walks forward through market phases from `now` until one wants a refresh:
+    interval phases refresh every N seconds, "once" phases refresh a single time
+    (REFRESH_SETTLE_DELAY after the phase starts), None phases are skipped.
+    Returns None if nothing is scheduled within the next two weeks.
+    """
+    if rules is None:
+        rules = settings.REFRESH_PHASE_INTERVALS
+    settle = timedelta(seconds=settings.REFRESH_SETTLE_DELAY)
+    t = now
+    for _ in range(64):  # ~2 weeks of phases, covers long holiday stretches
+        status, start, end = _phase_bounds(t)
+        rule = rules.get(status)
+
+        if rule == "once":
+            due = start + settle
+            if last_refresh is None or last_refresh < due:
+                candidate = max(t, due)
+                if candidate < end:
+                    return candidate
+        elif rule:
+            candidate = t
+            if last_refresh is not None:
+                candidate = max(t, last_refresh + timedelta(seconds=rule))
+            if candidate < end:
+                return candidate
+        t = end
+    return None
+
+def get_next_daily_time(now: datetime, last_run: Optional[datetime], at: time) -> Optional[datetime]:
+    """
+    Next `at` (IST wall clock) on a trading day that `last_run` hasn't covered.
+    A missed slot (process was down) is due immediately.
+    """
+    for offset in range(15):
+        day = now.date() + timedelta(days=offset)
+        if not is_trading_day(day):
+            continue
+        slot = IST.localize(datetime.combine(day, at))
+        if last_run is not None and last_run >= slot:
+            continue
+        return max(now, slot)
+    return None
+
 def get_market_status() -> dict:
     now = get_current_ist_time()
     view = get_market_view_mode(now)
@@ -0,0 +1,43 @@
+import os
+import sys
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+def get_peak_rss_mb() -> float:
+    """Peak resident set size since process start, in MB (0 if unknown)."""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS, kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def get_rss_mb() -> float:
+    """Current resident set size of this process in MB."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * _PAGE_SIZE / (1024 * 1024)
+    except (OSError, ValueError, IndexError):
+        # No procfs (macOS dev boxes): fall back to the lifetime peak
+        return get_peak_rss_mb()
+
+
+class RssSampler:
+    """Tracks the highest RSS seen across explicit sample() calls."""
+
+    def __init__(self):
+        self.start_mb = get_rss_mb()
+        self.peak_mb = self.start_mb
+
+    def sample(self) -> float:
+        rss = get_rss_mb()
+        if rss > self.peak_mb:
+            self.peak_mb = rss
+        return rss
@@ -0,0 +1,75 @@
+"""
+Top-K rankings precomputed per snapshot (gainers, losers, volume, ...).
+
+Every ranking is an ordered array of row ids built when the snapshot is
+published, split by sector as well, so a request for the top `limit` rows,
+overall or within one sector, is a slice instead of a sort over the whole
+list.
+
+Sorts are stable in both directions (ties keep snapshot order).
+Rows whose sort value is missing (NaN) go last, or are left out where the
+ranking is only about rows that have a value.
+"""
+from typing import Dict, List, NamedTuple, Optional
+
+import numpy as np
+
+from app.schemas import StockResponse
+from app.utils.columns import StockColumns
+
+
+class MoverKind(NamedTuple):
+    column: str                    # StockColumns attribute to rank by
+    descending: bool
+    only: Optional[str] = None     # bool StockColumns attribute restricting the rows
+    require_value: bool = False    # drop rows whose value is NaN
+
+
+MOVER_KINDS: Dict[str, MoverKind] = {
+    "gainers-3day": MoverKind("avg_3day", True),
+    "losers-3day": MoverKind("avg_3day", False),
+    "gainers": MoverKind("change", True),
+    "losers": MoverKind("change", False),
+    "volume": MoverKind("volume", True),
+    "volume-spike": MoverKind("volume_ratio", True, require_value=True),
+    "breakout": MoverKind("volume_ratio", True, only="is_breakout"),
+}
+
+
+def ranking(columns: StockColumns, kind: MoverKind) -> np.ndarray:
+    rows = np.arange(len(columns))
+    if kind.only:
+        rows = rows[getattr(columns, kind.only)]
+    values = getattr(columns, kind.column)[rows]
+    missing = np.isnan(values) if values.dtype.kind == "f" else np.zeros(len(rows), dtype=bool)
+    rows, values, rest = rows[~missing], values[~missing], rows[missing]
+    # Negated dense ranks keep a descending sort stable for ties
+    keys = -np.unique(values, return_inverse=True)[1] if kind.descending else values
+    ordered = rows[np.argsort(keys, kind="stable")]
+    return ordered if kind.require_value else np.concatenate((ordered, rest))
+
+
+class Movers:
+    def __init__(self, columns: StockColumns):
+        self.columns = columns
+        self._rankings: Dict[str, np.ndarray] = {}
+        self._by_sector: Dict[str, Dict[str, np.ndarray]] = {}
+        codes = columns.sector.codes
+        for name, kind in MOVER_KINDS.items():
+            ordered = ranking(columns, kind)
+            self._rankings[name] = ordered
+            # Group by sector with a stable sort, so each group keeps the ranking's order
+            grouped = ordered[np.argsort(codes[ordered], kind="stable")]
+            counts = np.bincount(codes[ordered], minlength=len(columns.sector.vocab))
+            parts = np.split(grouped, np.cumsum(counts)[:-1]) if len(counts) else []
+            self._by_sector[name] = dict(zip(columns.sector.vocab, parts))
+
+    def top(self, kind: str, limit: int, sector: Optional[str] = None) -> List[StockResponse]:
+        """First `limit` stocks of ranking `kind` (a MOVER_KINDS key), optionally within one sector."""
+        if sector:
+            ordered = self._by_sector[kind].get(sector)
+            if ordered is None:
+                return []
+        else:
+            ordered = self._rankings[kind]
+        return self.columns.take(ordered[:limit])
@@ -0,0 +1,52 @@
+"""
+Cursor pagination over a snapshot's ordered results (?limit=&cursor=).
+
+A page is a slice of the filtered, sorted row ids for one snapshot version.
+Snapshots are immutable and the sorts are stable, so (version, offset) fully
+identifies where the next page starts. The cursor encodes exactly that. It
+is opaque to clients and only valid while that version is current. Once a
+refresh publishes a new version, following it fails with CursorExpired (410
+at the API) rather than silently skipping or repeating rows, and the client
+starts again from the first page.
+"""
+import base64
+import binascii
+from typing import NamedTuple, Optional, Tuple
+
+
+class CursorExpired(Exception):
+    """The cursor belongs to a snapshot version that is no longer current."""
+
+
+class Page(NamedTuple):
+    start: int
+    stop: int
+    next_cursor: Optional[str]
+
+
+def encode_cursor(version: int, offset: int) -> str:
+    return base64.urlsafe_b64encode(f"{version}:{offset}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    """(version, offset) from a cursor; ValueError if it isn't one of ours."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        version, offset = (int(part) for part in raw.split(":"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise ValueError("malformed cursor")
+    if offset < 0:
+        raise ValueError("malformed cursor")
+    return version, offset
+
+
+def paginate(total: int, version: int, limit: Optional[int] = None, cursor: Optional[str] = None) -> Page:
+    """Bounds of the page of `total` rows that starts at `cursor` (or the beginning)."""
+    start = 0
+    if cursor:
+        cursor_version, start = decode_cursor(cursor)
+        if cursor_version != version:
+            raise CursorExpired(f"cursor is for version {cursor_version}, current is {version}")
+    start = min(start, total)
+    stop = total if limit is None else min(total, start + limit)
+    return Page(start, stop, encode_cursor(version, stop) if stop < total else None)
@@ -0,0 +1,130 @@
+"""
+Field projection for stock list responses (?fields= / ?exclude=).
+
+Both take comma-separated dotted paths into StockResponse, e.g.
+fields=symbol,current_price,history.avg_3day or exclude=chart_data,indicators.
+A path to a nested model keeps or drops the whole block. A path through it
+keeps or drops single fields, and the same goes for chart_data points and
+the keys of dict fields (returns.1Y). Paths are checked against the schema
+up front, so a typo fails the request with a 422 instead of quietly
+returning less.
+
+The result is turned into pydantic include/exclude trees and applied when
+the list is dumped to JSON (app/utils/response_cache.py), so fields that
+are left out are never encoded.
+"""
+from typing import Any, Dict, NamedTuple, Optional, Type, Union, get_args, get_origin
+
+from fastapi import HTTPException, Query
+from pydantic import BaseModel
+
+from app.schemas import StockResponse
+
+# Path tree: field -> True (the whole field) or a subtree of its fields
+PathTree = Dict[str, Any]
+
+
+class Projection(NamedTuple):
+    include: Optional[PathTree] = None
+    exclude: Optional[PathTree] = None
+
+    def dump_kwargs(self) -> Dict[str, Any]:
+        """include=/exclude= arguments for dumping a list of StockResponse."""
+        kwargs = {}
+        if self.include is not None:
+            kwargs["include"] = {"__all__": self.include}
+        if self.exclude is not None:
+            kwargs["exclude"] = {"__all__": self.exclude}
+        return kwargs
+
+    def keeps(self, dotted: str) -> bool:
+        """Whether the scalar field `dotted` (e.g. history.avg_3day) is part of the output."""
+        return (self.include is None or _covers(self.include, dotted)) and \
+            (self.exclude is None or not _covers(self.exclude, dotted))
+
+
+def _covers(tree: PathTree, dotted: str) -> bool:
+    node = tree
+    for part in dotted.split("."):
+        node = node.get(part)
+        if node is None:
+            return False
+        if node is True:
+            return True
+    return False
+
+
+def _nested(annotation) -> Any:
+    """What a path can continue into: a model, ("list", model), "dict", or None for a leaf."""
+    if get_origin(annotation) is Union:
+        annotation = next((a for a in get_args(annotation) if a is not type(None)), annotation)
+    origin = get_origin(annotation)
+    if origin is list:
+        inner = _nested(get_args(annotation)[0])
+        return ("list", inner) if isinstance(inner, type) else None
+    if origin is dict:
+        return "dict"
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return annotation
+    return None
+
+
+def _add_path(tree: PathTree, path: str, model: Type[BaseModel]) -> None:
+    parts = path.split(".")
+    node, current = tree, model
+    for depth, part in enumerate(parts):
+        if current == "dict":
+            nested = None  # one level of free keys, then a leaf
+        elif isinstance(current, type):
+            field = current.model_fields.get(part)
+            if field is None:
+                raise ValueError(f"unknown field {'.'.join(parts[:depth + 1])!r}")
+            nested = _nested(field.annotation)
+        else:
+            raise ValueError(f"{'.'.join(parts[:depth])!r} has no sub-fields")
+
+        last = depth == len(parts) - 1
+        if isinstance(nested, tuple):
+            # List of models: the sub-paths apply to every element
+            nested = nested[1]
+            if last or node.get(part) is True:
+                node[part] = True
+                return
+            node = node.setdefault(part, {}).setdefault("__all__", {})
+        else:
+            if last or node.get(part) is True:
+                node[part] = True
+                return
+            node = node.setdefault(part, {})
+        current = nested
+
+
+def parse_paths(spec: Optional[str], model: Type[BaseModel] = StockResponse) -> Optional[PathTree]:
+    """Comma-separated dotted paths -> path tree (None if `spec` names nothing)."""
+    paths = [p.strip() for p in (spec or "").split(",") if p.strip()]
+    if not paths:
+        return None
+    tree: PathTree = {}
+    for path in paths:
+        _add_path(tree, path, model)
+    return tree
+
+
+def parse_projection(fields: Optional[str] = None, exclude: Optional[str] = None) -> Optional[Projection]:
+    """Projection for ?fields=&exclude=, or None when both are empty. Raises ValueError on bad paths."""
+    include_tree = parse_paths(fields)
+    exclude_tree = parse_paths(exclude)
+    if include_tree is None and exclude_tree is None:
+        return None
+    return Projection(include_tree, exclude_tree)
+
+
+def projection_params(
+    fields: Optional[str] = Query(None, description="Only these fields, comma-separated dotted paths (e.g. symbol,history.avg_3day)"),
+    exclude: Optional[str] = Query(None, description="Leave out these fields, comma-separated dotted paths (e.g. chart_data,indicators)"),
+) -> Optional[Projection]:
+    """FastAPI dependency for list endpoints."""
+    try:
+        return parse_projection(fields, exclude)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=f"Invalid projection: {e}")
@@ -0,0 +1,104 @@
+"""
+LRU cache of filter results, keyed by (snapshot version, normalized filter key).
+
+The UI's filter bar sends the same few combinations over and over, in
+whatever parameter order and casing it happens to build them. filter_key()
+folds those into one hashable key; the cache stores the selected row
+indices (ordered, read-only), which is all a result is for a given
+snapshot's columns.
+
+Entries belong to one version: the first lookup at a newer version clears
+the cache, and lookups for an older version compute without storing.
+Identical lookups that arrive while one is computing (threadpool endpoints,
+stream fan-out from another thread) wait for that computation instead of
+repeating it.
+"""
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.schemas import StockResponse
+from app.utils.columns import StockColumns
+from app.utils.filters import FilterKey, filter_indices, filter_key
+
+
+class QueryCache:
+    def __init__(self, max_entries: int = settings.QUERY_CACHE_ENTRIES):
+        self.max_entries = max(1, max_entries)
+        self._lock = threading.Lock()
+        self._version: Optional[int] = None
+        self._entries: "OrderedDict[FilterKey, np.ndarray]" = OrderedDict()
+        self._inflight: Dict[Tuple[int, FilterKey], Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.shared = 0
+        self.evictions = 0
+
+    def indices(self, version: int, columns: StockColumns, key: FilterKey) -> np.ndarray:
+        with self._lock:
+            if self._version is None or version > self._version:
+                self._version = version
+                self._entries.clear()
+            if version == self._version:
+                cached = self._entries.get(key)
+                if cached is not None:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return cached
+            flight = self._inflight.get((version, key))
+            owner = flight is None
+            if owner:
+                flight = self._inflight[(version, key)] = Future()
+                self.misses += 1
+            else:
+                self.shared += 1
+        if not owner:
+            return flight.result()
+
+        try:
+            result = filter_indices(columns, key)
+            result.setflags(write=False)
+            flight.set_result(result)
+        except BaseException as e:
+            flight.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop((version, key), None)
+        with self._lock:
+            if version == self._version:
+                self._entries[key] = result
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return result
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.shared
+        return {
+            "version": self._version,
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared": self.shared,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.shared) / lookups, 3) if lookups else None,
+        }
+
+
+query_cache = QueryCache()
+
+
+def cached_indices(version: int, columns: StockColumns, **params) -> np.ndarray:
+    """Row ids apply_filters(columns, **params) would return, in order, through the query cache."""
+    return query_cache.indices(version, columns, filter_key(params))
+
+
+def cached_filters(version: int, columns: StockColumns, **params) -> List[StockResponse]:
+    """apply_filters(columns, **params) for snapshot `version`, through the query cache."""
+    return columns.take(cached_indices(version, columns, **params))
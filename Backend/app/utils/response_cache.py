@@ -0,0 +1,146 @@
+"""
+Pre-serialized response bodies per snapshot version.
+
+A list endpoint's body depends only on the snapshot version and the query,
+so the first request for a (path, query) at a version serializes it once,
+straight from the frozen models to JSON bytes with pydantic-core, together
+with its gzip (and, if the brotli package is installed, br) encodings.
+Repeat polls at that version get the stored bytes in the encoding they
+accept. Nothing is validated, encoded or compressed again, and
+GZipMiddleware passes the response through because Content-Encoding is
+already set. A ?fields=/?exclude= projection (app/utils/projection.py) is
+applied in that same dump, so fields that are left out are never encoded.
+Binary list formats (app/utils/wire_format.py) are cached the same way,
+keyed by media type as well.
+
+Entries live only as long as their version: the first lookup at a newer
+version drops them all. At most RESPONSE_CACHE_ENTRIES distinct queries are
+kept per version; further queries are served uncached.
+"""
+import gzip
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.schemas import StockResponse
+from app.utils.http_cache import normalized_query
+from app.utils.projection import Projection
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+_STOCK_LIST = TypeAdapter(Sequence[StockResponse])
+
+# Below this, compression costs more than it saves (GZipMiddleware's own threshold)
+_MIN_COMPRESS_BYTES = 1000
+
+
+def serialize_stocks(stocks: Sequence[StockResponse], projection: Optional[Projection] = None) -> bytes:
+    """JSON bytes identical to what response_model=List[StockResponse] would send, minus projected-out fields."""
+    if projection is None:
+        return _STOCK_LIST.dump_json(stocks)
+    return _STOCK_LIST.dump_json(stocks, **projection.dump_kwargs())
+
+
+@dataclass(frozen=True)
+class EncodedBody:
+    identity: bytes
+    gzip: Optional[bytes] = None
+    br: Optional[bytes] = None
+
+    @classmethod
+    def build(cls, body: bytes) -> "EncodedBody":
+        if len(body) < _MIN_COMPRESS_BYTES:
+            return cls(body)
+        return cls(
+            body,
+            gzip=gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL),
+            br=brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY) if brotli else None,
+        )
+
+    def negotiate(self, accept_encoding: str) -> Tuple[bytes, Optional[str]]:
+        """Smallest stored encoding the client accepts (q-values other than 0 are not ranked)."""
+        accepted = set()
+        for part in accept_encoding.lower().split(","):
+            coding, _, params = part.partition(";")
+            q = params.strip()
+            try:
+                refused = q.startswith("q=") and float(q[2:]) == 0
+            except ValueError:
+                refused = False
+            if not refused:
+                accepted.add(coding.strip())
+        if self.br is not None and "br" in accepted:
+            return self.br, "br"
+        if self.gzip is not None and ("gzip" in accepted or "*" in accepted):
+            return self.gzip, "gzip"
+        return self.identity, None
+
+
+class ResponseCache:
+    def __init__(self, max_entries: int = settings.RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self._version: Optional[int] = None
+        self._entries: Dict[Tuple[str, ...], EncodedBody] = {}
+        self.hits = 0
+        self.misses = 0
+        self.uncached = 0
+
+    def get_or_build(self, version: int, key: Tuple[str, ...], build: Callable[[], bytes]) -> EncodedBody:
+        if version != self._version:
+            self._version, self._entries = version, {}
+        entry = self._entries.get(key)
+        if entry is not None:
+            self.hits += 1
+            return entry
+        entry = EncodedBody.build(build())
+        if len(self._entries) < self.max_entries:
+            self._entries[key] = entry
+            self.misses += 1
+        else:
+            self.uncached += 1
+        return entry
+
+    def stats(self) -> dict:
+        return {
+            "version": self._version,
+            "entries": len(self._entries),
+            "bytes": sum(len(e.identity) + len(e.gzip or b"") + len(e.br or b"") for e in self._entries.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "uncached": self.uncached,
+            "brotli": brotli is not None,
+        }
+
+
+response_cache = ResponseCache()
+
+
+def cached_response(request: Request, response: Response, version: int, build: Callable[[], bytes],
+                    media_type: str = "application/json") -> Response:
+    """
+    Response with `build()`'s body, built and compressed once per (version,
+    path, query, media type). Headers already set on `response` (ETag,
+    Cache-Control, pagination, Vary) are carried over.
+    """
+    key = (request.url.path, normalized_query(request), media_type)
+    entry = response_cache.get_or_build(version, key, build)
+    body, encoding = entry.negotiate(request.headers.get("accept-encoding", ""))
+    headers = {k: v for k, v in response.headers.items() if k not in ("content-length", "content-type")}
+    if entry.gzip is not None:
+        headers["vary"] = ", ".join(filter(None, (headers.get("vary"), "Accept-Encoding")))
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def cached_stock_list(request: Request, response: Response, version: int,
+                      build: Callable[[], Sequence[StockResponse]],
+                      projection: Optional[Projection] = None) -> Response:
+    """Raw JSON response for `build()`'s stocks, through cached_response()."""
+    return cached_response(request, response, version, lambda: serialize_stocks(build(), projection))
@@ -0,0 +1,128 @@
+"""
+Binary, columnar encodings of the stock list for programmatic clients.
+
+/stocks/fno and /stocks/strength-analyzer choose the body format from the
+Accept header:
+
+  application/json                      default, the list of StockResponse objects
+  application/vnd.apache.arrow.stream   Arrow IPC stream, one record batch (needs pyarrow)
+  application/x-msgpack                 MessagePack map of columns (needs msgpack)
+
+The binary formats have one column per scalar StockResponse field, named by
+its dotted path (history.avg_3day, flags.is_breakout_candidate). Columns are
+sliced out of the snapshot's StockColumns.fields arrays with the request's
+row ids, so no per-row model is touched. chart_data, returns and derived are
+not included; request JSON for those. ?fields= / ?exclude= pick columns, and
+missing values are nulls. A format whose package isn't installed is never
+chosen: the client gets JSON, and the Content-Type says so.
+
+Decoding, client side:
+
+    import pyarrow as pa
+    table = pa.ipc.open_stream(body).read_all()   # table.to_pandas(), table["symbol"]
+    table.schema.metadata[b"snapshot_version"]
+
+    import msgpack
+    data = msgpack.unpackb(body)   # {"version": int, "rows": int, "columns": {name: [values]}}
+    dict(zip(data["columns"]["symbol"], data["columns"]["current_price"]))
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.columns import StockColumns
+from app.utils.projection import Projection
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:  # optional: no Arrow responses
+    pyarrow = None
+
+try:
+    import msgpack
+except ImportError:  # optional: no MessagePack responses
+    msgpack = None
+
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+MSGPACK = "application/x-msgpack"
+
+_ALIASES = {
+    ARROW: ARROW,
+    "application/vnd.apache.arrow.file": ARROW,
+    MSGPACK: MSGPACK,
+    "application/msgpack": MSGPACK,
+    "application/vnd.msgpack": MSGPACK,
+}
+
+
+def available_formats() -> List[str]:
+    return [JSON] + ([ARROW] if pyarrow else []) + ([MSGPACK] if msgpack else [])
+
+
+def negotiate_format(accept: str) -> str:
+    """Best media type in `accept` that we can produce, JSON when nothing else matches."""
+    ranked: List[Tuple[float, int, str]] = []
+    for position, part in enumerate(accept.lower().split(",")):
+        media, *params = (p.strip() for p in part.split(";"))
+        q = 1.0
+        for param in params:
+            if param.startswith("q="):
+                try:
+                    q = float(param[2:])
+                except ValueError:
+                    q = 0.0
+        if media and q > 0:
+            ranked.append((-q, position, media))
+    for _, _, media in sorted(ranked):
+        chosen = _ALIASES.get(media)
+        if chosen == ARROW and pyarrow is not None:
+            return ARROW
+        if chosen == MSGPACK and msgpack is not None:
+            return MSGPACK
+        if media in (JSON, "application/*", "*/*"):
+            return JSON
+    return JSON
+
+
+def select_columns(columns: StockColumns, indices: np.ndarray,
+                   projection: Optional[Projection] = None) -> Dict[str, np.ndarray]:
+    """The requested rows of each (projected) scalar field column."""
+    return {name: column[indices] for name, column in columns.fields.items()
+            if projection is None or projection.keeps(name)}
+
+
+def encode_arrow(selected: Dict[str, np.ndarray], version: int) -> bytes:
+    # from_pandas: NaN floats and None objects become Arrow nulls
+    arrays = [pyarrow.array(column, from_pandas=True) for column in selected.values()]
+    batch = pyarrow.RecordBatch.from_arrays(arrays, names=list(selected))
+    batch = batch.replace_schema_metadata({"snapshot_version": str(version)})
+    sink = pyarrow.BufferOutputStream()
+    with pyarrow.ipc.new_stream(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_msgpack(selected: Dict[str, np.ndarray], version: int) -> bytes:
+    encoded = {}
+    for name, column in selected.items():
+        if column.dtype.kind == "f":
+            missing = np.isnan(column)
+            if missing.any():
+                column = column.astype(object)
+                column[missing] = None
+        encoded[name] = column.tolist()
+    rows = len(next(iter(selected.values()))) if selected else 0
+    return msgpack.packb({"version": version, "rows": rows, "columns": encoded})
+
+
+def encode_stock_columns(media_type: str, columns: StockColumns, indices: np.ndarray,
+                         version: int, projection: Optional[Projection] = None) -> bytes:
+    """Body in `media_type` (ARROW or MSGPACK) for rows `indices` of a snapshot's columns."""
+    selected = select_columns(columns, indices, projection)
+    if media_type == ARROW:
+        return encode_arrow(selected, version)
+    if media_type == MSGPACK:
+        return encode_msgpack(selected, version)
+    raise ValueError(f"not a binary stock list format: {media_type}")
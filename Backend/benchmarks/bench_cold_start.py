@@ -0,0 +1,68 @@
+"""
+Cold-start load of the persisted snapshot: the legacy JSON cache
+(json.load + StockResponse(**item) per row) against the binary snapshot
+file (app/services/snapshot_file.py), plus what each costs to write.
+The binary load rebuilds rows with snapshot_file._construct; set
+USE_MODEL_CONSTRUCT=1 to measure it with pydantic's model_construct instead.
+
+Both are measured on the same synthetic universe, through real files in a
+temp directory. "publish" is the rest of a cold start (symbol index,
+columns, indexes, movers, flattened rows), the same for both paths.
+
+Usage (from Backend/):  python -m benchmarks.bench_cold_start [n_symbols] [repeats]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+
+from app.schemas import StockResponse
+from app.services.snapshot import SnapshotStore
+from app.services import snapshot_file
+from app.services.snapshot_file import read_snapshot_file, write_snapshot_file
+from tests.builders import make_universe
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    if os.getenv("USE_MODEL_CONSTRUCT"):
+        snapshot_file._construct = lambda model, values: model.model_construct(**values)
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 209
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    snapshot = SnapshotStore().publish(make_universe(n_symbols, seed=1), source="bars")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_path = os.path.join(tmp, "market_data_cache.json")
+        bin_path = os.path.join(tmp, "market_snapshot.bin")
+
+        def save_json():
+            with open(json_path, "w") as f:
+                json.dump([s.model_dump(mode="json") for s in snapshot.stocks], f)
+
+        def load_json():
+            with open(json_path) as f:
+                return [StockResponse(**item) for item in json.load(f)]
+
+        save_json_ms = timed(save_json, repeats)
+        save_bin_ms = timed(lambda: write_snapshot_file(bin_path, snapshot), repeats)
+        load_json_ms = timed(load_json, repeats)
+        load_bin_ms = timed(lambda: read_snapshot_file(bin_path), repeats)
+        publish_ms = timed(lambda: SnapshotStore().publish(read_snapshot_file(bin_path).stocks, source="disk"),
+                           repeats) - load_bin_ms
+
+        print(f"{n_symbols} stocks")
+        print(f"{'format':8s} {'file':>10s} {'save':>10s} {'load':>10s}")
+        print(f"{'json':8s} {os.path.getsize(json_path) / 1024:8.1f}KB {save_json_ms:8.2f}ms {load_json_ms:8.2f}ms")
+        print(f"{'binary':8s} {os.path.getsize(bin_path) / 1024:8.1f}KB {save_bin_ms:8.2f}ms {load_bin_ms:8.2f}ms")
+        print(f"publish (index, columns, movers, rows) after load: {publish_ms:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
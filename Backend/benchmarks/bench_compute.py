@@ -0,0 +1,86 @@
+"""
+Event-loop latency during a refresh cycle under each compute backend.
+
+A probe coroutine wakes every `tick` seconds and records how late it ran;
+that lateness is what an API request arriving mid-refresh would wait. Bars
+are synced once up front (FakeProvider, no network) and every measured cycle
+starts from empty indicator state, so each one does the full recompute.
+
+Usage (from Backend/):  python -m benchmarks.bench_compute [n_symbols] [cycles]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services import stocks
+from app.services.compute import ComputeBackend, set_compute_backend
+from app.services.history_store import HistoryStore
+from app.services.indicator_state import IndicatorStateBook
+from app.services.market_data import FakeProvider, set_provider
+from app.services.refresh_pipeline import run_pipeline
+
+TICK_S = 0.005
+
+
+async def probe(lags, stop):
+    loop = asyncio.get_running_loop()
+    while not stop.is_set():
+        expected = loop.time() + TICK_S
+        await asyncio.sleep(TICK_S)
+        lags.append(max(0.0, loop.time() - expected))
+
+
+async def measured_cycle(symbols, root):
+    stocks.indicator_states = IndicatorStateBook(f"{root}/state.json")
+    lags, stop = [], asyncio.Event()
+    probe_task = asyncio.create_task(probe(lags, stop))
+    start = time.perf_counter()
+    results, _ = await run_pipeline(
+        symbols,
+        fetch=stocks.sync_histories,
+        compute=stocks.build_stock_responses,
+        group_size=settings.FETCH_GROUP_SIZE,
+        fetch_concurrency=settings.REFRESH_FETCH_CONCURRENCY,
+        queue_size=settings.REFRESH_QUEUE_SIZE,
+        compute_batch=settings.REFRESH_COMPUTE_BATCH,
+    )
+    duration = time.perf_counter() - start
+    stop.set()
+    await probe_task
+    return len(results), duration, np.array(lags) * 1000
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    cycles = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    symbols = list(dict.fromkeys(settings.FNO_STOCKS))[:n_symbols]
+
+    with tempfile.TemporaryDirectory() as root:
+        stocks.history_store = HistoryStore(root)
+        set_provider(FakeProvider())
+        stocks.sync_histories(symbols)
+
+        for mode in ("inline", "thread", "process"):
+            backend = ComputeBackend(mode, workers=settings.COMPUTE_WORKERS,
+                                     max_tasks_per_child=settings.COMPUTE_MAX_TASKS_PER_CHILD or None)
+            set_compute_backend(backend)
+            asyncio.run(measured_cycle(symbols[:5], root))  # warm-up (process pool spawn + imports)
+            lags, durations = [], []
+            for _ in range(cycles):
+                processed, duration, cycle_lags = asyncio.run(measured_cycle(symbols, root))
+                lags.append(cycle_lags)
+                durations.append(duration)
+            lags = np.concatenate(lags)
+            print(f"{mode:8s} {processed:4d} stocks  cycle {np.mean(durations):5.2f}s  "
+                  f"loop lag p50 {np.percentile(lags, 50):6.1f} ms  p99 {np.percentile(lags, 99):6.1f} ms  "
+                  f"max {lags.max():6.1f} ms")
+            backend.shutdown()
+    set_provider(None)
+
+
+if __name__ == "__main__":
+    main()
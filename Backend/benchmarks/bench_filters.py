@@ -0,0 +1,65 @@
+"""
+apply_filters on a large synthetic universe: the old row-by-row loop (kept
+as the reference in tests/test_filters.py), a full columnar scan, and the
+index planner (the path apply_filters takes).
+
+The columnar mirror and its indexes are built once per published snapshot,
+so that time is reported separately from the per-query cost.
+
+Usage (from Backend/):  python -m benchmarks.bench_filters [n_symbols] [repeats]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.utils.columns import StockColumns
+from app.utils.filters import apply_filters, filter_indices, filter_key, filter_mask, sort_indices
+from tests.builders import make_universe
+from tests.test_filters import reference_filters
+
+QUERIES = {
+    "unfiltered, rank sort": {"sort_by": "rank"},
+    "sector + change range": {"sector": "IT", "min_change_pct": 0.0, "max_change_pct": 2.0},
+    "screener, sort by rsi": {"macd_status": "above,neutral", "rsi_zone": "oversold,neutral",
+                              "strength": "buyers", "min_volume": 50000, "sort_by": "rsi", "sort_dir": "desc"},
+    "search": {"search": "alpha"},
+    "Banking where P1=Sellers": {"sector": "Banking", "p1_str": "SELLERS"},
+    "price + volume band": {"min_price": 900, "max_price": 1000, "min_volume": 1_000_000},
+}
+
+
+def full_scan(columns, key):
+    filters = dict(key)
+    sort = filters.pop("sort", None)
+    indices = np.flatnonzero(filter_mask(columns, **filters))
+    return sort_indices(columns, indices, *sort) if sort else indices
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    universe = make_universe(n_symbols, seed=1)
+
+    start = time.perf_counter()
+    columns = StockColumns(universe)
+    print(f"{n_symbols} symbols, columns + indexes built in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"(once per version)")
+    print(f"{'query':26s} {'rows':>6s} {'row loop':>10s} {'scan':>10s} {'indexed':>10s}")
+    for label, params in QUERIES.items():
+        key = filter_key(params)
+        rows = len(apply_filters(columns, **params))
+        row_ms = timed(lambda: reference_filters(universe, **params), max(1, repeats // 10))
+        scan_ms = timed(lambda: full_scan(columns, key), repeats)
+        indexed_ms = timed(lambda: filter_indices(columns, key), repeats)
+        print(f"{label:26s} {rows:6d} {row_ms:8.3f}ms {scan_ms:8.3f}ms {indexed_ms:8.3f}ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Payload size of the /stocks/fno list with ?fields= / ?exclude= projections,
+measured on the rows in market_data_cache.json (the last saved snapshot).
+
+"table" is what the stocks table renders (StocksTable.tsx). The other rows
+drop the heavy blocks. Sizes are for the JSON body and its gzip encoding, as
+the response cache stores them. Times are the per-version cost of building
+the cache entry (dump + compress).
+
+Usage (from Backend/):  python -m benchmarks.bench_projection [cache_file] [repeats]
+"""
+import json
+import sys
+import time
+
+from app.schemas import StockResponse
+from app.services.stocks import CACHE_FILE
+from app.utils.projection import parse_projection
+from app.utils.response_cache import EncodedBody, serialize_stocks
+
+PROJECTIONS = {
+    "full row": (None, None),
+    "exclude chart/derived/fundamentals": (None, "chart_data,derived,returns,pe_ratio,industry_pe,eps,roe,roce,"
+                                                 "book_value,pb_ratio,dividend_yield,dma_50,dma_200"),
+    "exclude indicators + above": (None, "indicators,chart_data,derived,returns,pe_ratio,industry_pe,eps,roe,"
+                                         "roce,book_value,pb_ratio,dividend_yield,dma_50,dma_200"),
+    "table": ("symbol,sector,current_price,current_change,history.p_day1,history.p_day2,history.p_day3,"
+              "history.avg_3day,derived.macdLabel,derived.rsiLabel,avg_3day_strength", None),
+    "symbol,current_price,history.avg_3day": ("symbol,current_price,history.avg_3day", None),
+}
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else CACHE_FILE
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with open(path) as f:
+        universe = [StockResponse(**item) for item in json.load(f)]
+
+    full = None
+    print(f"{len(universe)} stocks from {path}")
+    print(f"{'projection':38s} {'json':>9s} {'gzip':>9s} {'vs full':>8s} {'build':>9s}")
+    for label, (fields, exclude) in PROJECTIONS.items():
+        projection = parse_projection(fields, exclude)
+        entry = EncodedBody.build(serialize_stocks(universe, projection))
+        full = full or entry
+        ms = timed(lambda: EncodedBody.build(serialize_stocks(universe, projection)), repeats)
+        gz = entry.gzip or entry.identity
+        print(f"{label:38s} {len(entry.identity) / 1024:7.1f}KB {len(gz) / 1024:7.1f}KB "
+              f"{len(entry.identity) / len(full.identity):7.0%} {ms:7.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Full refresh cycle against the offline FakeProvider: single vs batched fetch.
+
+Each provider call sleeps `latency` seconds to stand in for a Yahoo round
+trip, so the difference between modes is the number of upstream calls.
+
+Usage (from Backend/):  python -m benchmarks.bench_refresh [n_symbols] [latency_s] [group_size]
+"""
+import asyncio
+import sys
+import tempfile
+
+from app.config import settings
+from app.services import stocks
+from app.services.history_store import HistoryStore
+from app.services.market_data import FakeProvider, set_provider
+from app.services.refresh_pipeline import run_pipeline
+
+
+async def cycle(symbols, group_size):
+    return await run_pipeline(
+        symbols,
+        fetch=stocks.sync_histories,
+        compute=stocks.build_stock_responses,
+        group_size=group_size,
+        fetch_concurrency=settings.REFRESH_FETCH_CONCURRENCY,
+        queue_size=settings.REFRESH_QUEUE_SIZE,
+        compute_batch=settings.REFRESH_COMPUTE_BATCH,
+    )
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.05
+    group_size = int(sys.argv[3]) if len(sys.argv) > 3 else settings.FETCH_GROUP_SIZE
+    symbols = list(dict.fromkeys(settings.FNO_STOCKS))[:n_symbols]
+
+    for label, size in (("single", 1), (f"batched/{group_size}", group_size)):
+        with tempfile.TemporaryDirectory() as root:
+            stocks.history_store = HistoryStore(root)
+            provider = FakeProvider(latency_s=latency)
+            set_provider(provider)
+            for phase in ("cold", "warm"):
+                results, stats = asyncio.run(cycle(symbols, size))
+                print(f"{label:12s} {phase}: {stats.processed:4d} stocks  {stats.duration_s:6.2f}s  "
+                      f"calls={provider.calls:4d}  peak RSS {stats.peak_rss_mb:.0f} MB")
+                provider.calls = 0
+    set_provider(None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+Per-request serialization cost of the unfiltered /stocks/fno list.
+
+"response_model" replays what FastAPI did for every poll before the byte
+cache: validate the models against List[StockResponse], dump to JSON-able
+Python, json.dumps it, then GZipMiddleware compresses it. "first request"
+is the cost of building a cache entry once per version, and "repeat poll"
+is a cache hit (lookup plus encoding negotiation).
+
+Usage (from Backend/):  python -m benchmarks.bench_responses [repeats]
+"""
+import gzip
+import json
+import sys
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from app.config import settings
+from app.schemas import StockResponse
+from app.services import stocks
+from app.utils.response_cache import EncodedBody, ResponseCache, serialize_stocks
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    symbols = list(dict.fromkeys(settings.FNO_STOCKS))
+    # build_mock_stocks caps each call at 50
+    universe = [s for i in range(0, len(symbols), 50) for s in stocks.build_mock_stocks(symbols[i:i + 50])]
+    adapter = TypeAdapter(List[StockResponse])
+
+    def response_model():
+        content = adapter.dump_python(adapter.validate_python(universe), mode="json")
+        body = json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+        return gzip.compress(body, compresslevel=9)  # GZipMiddleware's default level
+
+    cache = ResponseCache()
+    key = ("/api/v1/stocks/fno", "")
+
+    def repeat_poll():
+        cache.get_or_build(1, key, lambda: serialize_stocks(universe)).negotiate("gzip, deflate, br")
+
+    body = serialize_stocks(universe)
+    entry = EncodedBody.build(body)
+    print(f"{len(universe)} stocks: {len(body) / 1024:.0f} KB json, {len(entry.gzip) / 1024:.0f} KB gzip"
+          + (f", {len(entry.br) / 1024:.0f} KB br" if entry.br else ""))
+    print(f"response_model  {timed(response_model, repeats):8.3f} ms/request")
+    print(f"first request   {timed(lambda: EncodedBody.build(serialize_stocks(universe)), repeats):8.3f} ms/version")
+    print(f"repeat poll     {timed(repeat_poll, repeats * 100):8.3f} ms/request")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Push-stream fan-out with thousands of idle subscribers on one event loop.
+
+Every subscriber gets a reader task draining hub.frames(), the same
+coroutine a StreamingResponse drives per connection (HTTP/socket cost is not
+included). Subscribers are spread over a few topics (all symbols, a sector
+filter, a gainers filter, small symbol lists). A share of them stall (never
+read) and must be dropped once their buffer fills, without slowing the rest.
+
+Reported: RSS per idle subscriber, time spent in the publish call
+(membership + encoding + queue puts) and time until every live reader has
+the frame.
+
+Usage (from Backend/):  python -m benchmarks.bench_stream [subscribers] [publishes] [stalled_pct]
+"""
+import asyncio
+import gc
+import sys
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.services import stocks
+from app.services.snapshot import SnapshotStore
+from app.services.stream import StreamHub
+from app.utils.memory import get_rss_mb
+
+
+def topic_for(i, symbols):
+    kind = i % 4
+    if kind == 0:
+        return None, None
+    if kind == 1:
+        return None, {"sector": "Unknown"}
+    if kind == 2:
+        return None, {"gainers_only": True}
+    start = (i * 7) % max(1, len(symbols) - 5)
+    return symbols[start:start + 5], None
+
+
+async def reader(hub, subscriber, received):
+    async for _ in hub.frames(subscriber):
+        received[0] += 1
+
+
+async def run(n_subscribers, publishes, stalled_pct):
+    symbols = list(dict.fromkeys(settings.FNO_STOCKS))
+    base = stocks.build_mock_stocks(symbols)
+    store = SnapshotStore()
+    store.publish(base, source="bars")
+    hub = StreamHub(store, buffer=settings.STREAM_CLIENT_BUFFER, max_subscribers=n_subscribers,
+                    heartbeat_s=settings.STREAM_HEARTBEAT_S)
+
+    gc.collect()
+    rss_before = get_rss_mb()
+    received = [0]
+    readers = []
+    n_stalled = n_subscribers * stalled_pct // 100
+    for i in range(n_subscribers):
+        subscriber = hub.subscribe(*topic_for(i, symbols))
+        if i >= n_stalled:
+            readers.append(asyncio.create_task(reader(hub, subscriber, received)))
+    await asyncio.sleep(0.5)  # readers drain their snapshot frame and go idle
+    gc.collect()
+    rss_idle = get_rss_mb()
+    print(f"{n_subscribers} subscribers ({n_stalled} stalled), {hub.stats()['topics']} topics, "
+          f"{len(symbols)} symbols")
+    print(f"idle RSS +{rss_idle - rss_before:.1f} MB "
+          f"({(rss_idle - rss_before) * 1024 / n_subscribers:.2f} KB per subscriber)")
+
+    rng = np.random.default_rng(7)
+    publish_ms, delivered_ms = [], []
+    for _ in range(publishes):
+        # Move a fifth of the universe, like a quotes refresh
+        moved = set(rng.choice(len(base), size=len(base) // 5, replace=False).tolist())
+        batch = [s.model_copy(update={"current_price": round(s.current_price * (1 + rng.normal(0, 0.01)), 2),
+                                      "current_change": round(float(rng.normal(0, 1.5)), 2)})
+                 if i in moved else s for i, s in enumerate(base)]
+        start = time.perf_counter()
+        store.publish(batch, source="quotes")
+        publish_ms.append((time.perf_counter() - start) * 1000)
+        # Wait until readers stop receiving (every live one had its chance to run)
+        while True:
+            seen = received[0]
+            await asyncio.sleep(0)
+            await asyncio.sleep(0)
+            if received[0] == seen:
+                break
+        delivered_ms.append((time.perf_counter() - start) * 1000)
+
+    stats = hub.stats()
+    print(f"publish call   p50 {np.percentile(publish_ms, 50):7.1f} ms  max {max(publish_ms):7.1f} ms")
+    print(f"all delivered  p50 {np.percentile(delivered_ms, 50):7.1f} ms  max {max(delivered_ms):7.1f} ms")
+    print(f"frames sent {stats['frames_sent']}, dropped slow {stats['dropped_slow']}, "
+          f"still connected {stats['subscribers']}")
+
+    for task in readers:
+        task.cancel()
+    await asyncio.gather(*readers, return_exceptions=True)
+
+
+def main():
+    n_subscribers = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    publishes = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    stalled_pct = int(sys.argv[3]) if len(sys.argv) > 3 else 5
+    asyncio.run(run(n_subscribers, publishes, stalled_pct))
+
+
+if __name__ == "__main__":
+    main()
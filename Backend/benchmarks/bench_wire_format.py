@@ -0,0 +1,69 @@
+"""
+Bytes and encode time of the stock list per wire format.
+
+JSON is the response cache's pydantic-core dump of the rows. Arrow IPC and
+MessagePack are encoded from the snapshot's columns (all scalar fields, so
+JSON also carries chart_data/derived/returns that they leave out, which is
+what "json (scalar fields)" compares against). Building StockColumns.fields
+happens once per version and is reported separately. Formats whose package
+isn't installed are skipped.
+
+Usage (from Backend/):  python -m benchmarks.bench_wire_format [n_symbols] [repeats]
+"""
+import gzip
+import sys
+import time
+
+import numpy as np
+
+from app.config import settings
+from app.utils.columns import SCALAR_FIELDS, StockColumns
+from app.utils.projection import parse_projection
+from app.utils.response_cache import serialize_stocks
+from app.utils.wire_format import ARROW, MSGPACK, available_formats, encode_stock_columns
+from tests.builders import make_universe
+
+
+def timed(fn, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    n_symbols = int(sys.argv[1]) if len(sys.argv) > 1 else len(set(settings.FNO_STOCKS))
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    universe = make_universe(n_symbols, seed=1)
+    columns = StockColumns(universe)
+    rows = np.arange(len(universe))
+
+    start = time.perf_counter()
+    columns.fields
+    print(f"{n_symbols} stocks, {len(SCALAR_FIELDS)} scalar columns built in "
+          f"{(time.perf_counter() - start) * 1000:.1f} ms (once per version)")
+
+    scalar_only = parse_projection(exclude="chart_data,derived,returns")
+    encoders = {
+        "json": lambda: serialize_stocks(columns.take(rows)),
+        "json (scalar fields)": lambda: serialize_stocks(columns.take(rows), scalar_only),
+    }
+    formats = available_formats()
+    if ARROW in formats:
+        encoders["arrow ipc"] = lambda: encode_stock_columns(ARROW, columns, rows, 1)
+    if MSGPACK in formats:
+        encoders["msgpack"] = lambda: encode_stock_columns(MSGPACK, columns, rows, 1)
+
+    print(f"{'format':22s} {'bytes':>10s} {'gzip':>10s} {'encode':>10s}")
+    for label, encode in encoders.items():
+        body = encode()
+        packed = len(gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL))
+        print(f"{label:22s} {len(body) / 1024:8.1f}KB {packed / 1024:8.1f}KB {timed(encode, repeats):8.3f}ms")
+    missing = {ARROW: "pyarrow", MSGPACK: "msgpack"}
+    skipped = [pkg for fmt, pkg in missing.items() if fmt not in formats]
+    if skipped:
+        print(f"skipped (not installed): {', '.join(skipped)}")
+
+
+if __name__ == "__main__":
+    main()
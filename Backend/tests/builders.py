@@ -0,0 +1,54 @@
+"""Builders shared by the tests and benchmarks."""
+import random
+from typing import List
+
+import numpy as np
+
+from app.schemas import StockResponse
+from app.services import stocks as stock_service
+from app.services.history_store import Bars
+
+
+def make_bars(closes, start: str = "1970-01-01", high=None, low=None, volume=1.0) -> Bars:
+    """Consecutive daily bars closing at `closes`; open (and high/low unless given) equal the close."""
+    closes = np.asarray(closes, dtype=float)
+    dates = np.datetime64(start, "D") + np.arange(len(closes))
+    return Bars(dates, closes,
+                closes if high is None else np.asarray(high, dtype=float),
+                closes if low is None else np.asarray(low, dtype=float),
+                closes, np.broadcast_to(np.asarray(volume, dtype=float), closes.shape).copy())
+
+
+SECTORS = ["Banking", "IT", "Pharma", "Auto", "Unknown"]
+LABELS = ["Buyers", "Sellers", "Balanced", "BUYERS", "neutral"]
+
+
+def make_universe(n: int, seed: int) -> List[StockResponse]:
+    rng = random.Random(seed)
+    base = [s for i in range(0, n, 50)
+            for s in stock_service.build_mock_stocks([f"S{j:04d}.NS" for j in range(i, min(n, i + 50))])]
+    out = []
+    for i, s in enumerate(base):
+        out.append(s.model_copy(update={
+            "name": rng.choice([f"Company {i}", "", "Alpha Industries"]),
+            "sector": rng.choice(SECTORS),
+            # Coarse values so sorts have plenty of ties
+            "current_price": float(rng.choice([100, 250.5, 999, 1500])),
+            "current_change": rng.choice([-2.0, -0.5, 0.0, 0.5, 2.0, float("nan")]),
+            "volume": rng.choice([1000, 50000, 2_000_000]),
+            "rank": rng.randint(1, 20),
+            "current_strength": rng.choice(LABELS),
+            "day1_strength": rng.choice(LABELS),
+            "avg_3day_strength": rng.choice(LABELS),
+            "history": s.history.model_copy(update={"avg_3day": rng.choice([-1.0, 0.0, 1.5]),
+                                                    "volatility_3_day": rng.choice([0.5, 1.0, 3.0])}),
+            "indicators": s.indicators.model_copy(update={
+                "rsi_value": rng.choice([None, 0.0, 25.0, 55.5, 80.0]),
+                "macd_status": rng.choice(["above", "below", "neutral"]),
+                "rsi_zone": rng.choice(["overbought", "oversold", "neutral"]),
+                "buyer_strength_score": rng.randint(0, 5),
+            }),
+            "flags": s.flags.model_copy(update={"is_gainer_today": rng.random() < 0.5,
+                                                "is_high_volume": rng.random() < 0.3}),
+        }))
+    return out
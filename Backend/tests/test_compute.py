@@ -0,0 +1,85 @@
+import asyncio
+import json
+
+import numpy as np
+
+from app.services import stocks
+from app.services.compute import ComputeBackend, set_compute_backend
+from app.services.indicator_state import IndicatorStateBook
+from app.utils.columns import StockColumns
+from app.utils.movers import Movers
+from tests.builders import make_bars
+
+
+def random_walk_bars(seed, n=300):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    return make_bars(closes, start="2025-01-01", high=closes * 1.01, low=closes * 0.99,
+                     volume=rng.integers(1000, 9000, n))
+
+
+def rounded(value):
+    # States restored from records re-sum their windows, so allow float noise
+    if isinstance(value, float):
+        return round(value, 6)
+    if isinstance(value, dict):
+        return {k: rounded(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [rounded(v) for v in value]
+    return value
+
+
+def run_backend(mode, batch, tmp_path, monkeypatch):
+    book = IndicatorStateBook(str(tmp_path / f"{mode}.json"))
+    monkeypatch.setattr(stocks, "indicator_states", book)
+    backend = ComputeBackend(mode, max_tasks_per_child=2)
+    previous = set_compute_backend(backend)
+    try:
+        # Second pass takes the incremental path off the states seeded by the first
+        passes = [asyncio.run(stocks.build_stock_responses(batch)) for _ in range(2)]
+    finally:
+        set_compute_backend(previous)
+        backend.shutdown()
+    stocks_out = [[s.model_dump(exclude={"last_updated"}) for s in out] for out in passes]
+    states = {s: st.to_dict() for s, st in book.states.items()}
+    # Serialized so NaNs (unfilled indicator windows) compare equal
+    return json.dumps(rounded([stocks_out, states]), sort_keys=True)
+
+
+def test_backends_agree(tmp_path, monkeypatch):
+    batch = [(f"S{i}.NS", random_walk_bars(i)) for i in range(6)]
+    inline = run_backend("inline", batch, tmp_path, monkeypatch)
+    assert [s["symbol"] for s in json.loads(inline.replace("NaN", "null"))[0][1]] == [s for s, _ in batch]
+    for mode in ("thread", "process"):
+        assert run_backend(mode, batch, tmp_path, monkeypatch) == inline
+
+
+def test_volume_spike_reaches_the_movers_on_both_paths(tmp_path, monkeypatch):
+    monkeypatch.setattr(stocks, "indicator_states", IndicatorStateBook(str(tmp_path / "states.json")))
+    closes = 100 + np.arange(120) * 0.1
+    spike = make_bars(closes, start="2025-01-01", volume=[1000] * 119 + [50000])
+    flat = make_bars(closes, start="2025-01-01", volume=1000)
+    batch = [("SPK.NS", spike), ("FLAT.NS", flat)]
+    # First pass recomputes in full and seeds the states, the second is incremental
+    for incremental in (False, True):
+        tasks = stocks.plan_stock_batch(batch)
+        assert all((values is not None) == incremental for _, _, values, _, _ in tasks)
+        results = stocks.compute_stock_batch(tasks)
+        for symbol, _, state in results:
+            if state is not None:
+                stocks.indicator_states.put(symbol, state)
+        by_symbol = {s: stock for s, stock, _ in results}
+        assert by_symbol["SPK.NS"].volume_ratio > 1.5 and by_symbol["FLAT.NS"].volume_ratio == 1.0
+        movers = Movers(StockColumns(list(by_symbol.values())))
+        assert [s.symbol for s in movers.top("volume-spike", 10)] == ["SPK.NS", "FLAT.NS"]
+
+
+def test_process_pool_recycling_needs_python_311(monkeypatch):
+    from app.services import compute
+
+    created = []
+    monkeypatch.setattr(compute, "ProcessPoolExecutor", lambda **kwargs: created.append(kwargs))
+    for version, expected in (((3, 10, 0), None), ((3, 11, 0), 50)):
+        monkeypatch.setattr(compute.sys, "version_info", version)
+        ComputeBackend("process", max_tasks_per_child=50)._get_executor()
+        assert created[-1].get("max_tasks_per_child") == expected
@@ -0,0 +1,44 @@
+import asyncio
+
+from app.services import governor as governor_module
+from app.services.governor import ConcurrencyGovernor, PipelineParams
+
+
+def make(**kwargs):
+    start = PipelineParams(fetch_concurrency=2, group_size=20, compute_batch=25)
+    return ConcurrencyGovernor(start, target_cycle_s=10, memory_ceiling_mb=400,
+                               max_fetch_concurrency=3, max_group_size=40, **kwargs)
+
+
+def test_grows_while_slow_and_shrinks_at_ceiling():
+    g = make()
+    assert g.record(start_rss_mb=100, peak_rss_mb=150, duration_s=20) == "grow"
+    assert (g.params.fetch_concurrency, g.params.group_size) == (3, 20)
+    # Fetchers maxed out: grow the groups instead
+    assert g.record(100, 150, 20) == "grow"
+    assert (g.params.fetch_concurrency, g.params.group_size) == (3, 25)
+    # Fast enough: hold
+    assert g.record(100, 150, 5) == "hold"
+    assert g.record(100, 410, 20) == "shrink"
+    assert g.current() == {"fetch_concurrency": 1, "group_size": 12, "compute_batch": 12}
+
+
+def test_no_growth_without_predicted_headroom():
+    g = make()
+    # 2 fetchers -> 3 would put the peak at 100 + 200 * 1.5 = 400 MB
+    assert g.record(start_rss_mb=100, peak_rss_mb=300, duration_s=20) == "hold"
+    assert g.params.fetch_concurrency == 2
+
+
+def test_admit_pauses_extra_fetchers_over_ceiling(monkeypatch):
+    readings = [500, 500, 500, 300]
+    monkeypatch.setattr(governor_module, "get_rss_mb", lambda: readings.pop(0) if readings else 300)
+    g = make(max_pause_s=1)
+
+    async def scenario():
+        await g.admit(0)  # first fetcher always proceeds, RSS not even read
+        await g.admit(1)
+
+    asyncio.run(scenario())
+    assert g.pauses == 1
+    assert readings == []  # waited until RSS dropped below the ceiling
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+from datetime import date
+
+from app.services.history_store import HistoryStore, frame_to_matrix, matrix_to_bars
+
+
+def make_frame(start: str, closes):
+    index = pd.date_range(start, periods=len(closes), freq="D", tz="Asia/Kolkata")
+    closes = np.asarray(closes, dtype=float)
+    return pd.DataFrame({
+        "Open": closes - 1,
+        "High": closes + 2,
+        "Low": closes - 2,
+        "Close": closes,
+        "Volume": np.arange(len(closes)) * 100,
+    }, index=index)
+
+
+def test_replace_and_read(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    assert store.read("TEST.NS") is None
+    assert store.last_date("TEST.NS") is None
+
+    store.replace("TEST.NS", frame_to_matrix(make_frame("2025-01-01", [10, 11, 12])))
+    bars = store.read("TEST.NS")
+
+    assert len(bars) == 3
+    assert isinstance(bars.close, np.memmap) or isinstance(bars.close.base, np.memmap)
+    assert list(bars.close) == [10, 11, 12]
+    assert list(bars.volume) == [0, 100, 200]
+    assert store.last_date("TEST.NS") == date(2025, 1, 3)
+    assert not store.is_full("TEST.NS")
+
+
+def test_append_replaces_overlapping_bar(tmp_path):
+    """Re-fetching from the last stored date updates the partial bar instead of duplicating it."""
+    store = HistoryStore(str(tmp_path))
+    store.replace("TEST.NS", frame_to_matrix(make_frame("2025-01-01", [10, 11, 12])), full=True)
+
+    written = store.append("TEST.NS", frame_to_matrix(make_frame("2025-01-03", [12.5, 13, 14])))
+    bars = store.read("TEST.NS")
+
+    assert written == 3
+    assert list(bars.close) == [10, 11, 12.5, 13, 14]
+    assert str(bars.dates[-1]) == "2025-01-05"
+    assert store.is_full("TEST.NS")
+
+
+def test_append_empty_is_noop(tmp_path):
+    store = HistoryStore(str(tmp_path))
+    store.replace("TEST.NS", frame_to_matrix(make_frame("2025-01-01", [10, 11])))
+    assert store.append("TEST.NS", frame_to_matrix(make_frame("2025-01-03", []))) == 0
+    assert len(store.read("TEST.NS")) == 2
+
+
+def test_index_of():
+    bars = matrix_to_bars(frame_to_matrix(make_frame("2025-01-01", [10, 11, 12])))
+    assert bars.index_of(date(2025, 1, 2)) == 1
+    assert bars.index_of(date(2025, 1, 9)) is None
+    assert len(bars.tail(2)) == 2
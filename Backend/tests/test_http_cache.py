@@ -0,0 +1,118 @@
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import stocks
+from app.services.snapshot import snapshots
+
+client = TestClient(app)
+
+
+def test_list_endpoints_answer_304_until_the_snapshot_changes():
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS"]), source="bars")
+
+    for path in ("/api/v1/stocks/fno?sector=Unknown&search=", "/api/v1/stocks/strength-analyzer",
+                 "/api/v1/stocks/gainers-3day", "/api/v1/stocks/losers-3day", "/api/v1/advanced/heatmap"):
+        first = client.get(path)
+        etag = first.headers["etag"]
+        assert first.status_code == 200 and "max-age=" in first.headers["cache-control"]
+
+        again = client.get(path, headers={"If-None-Match": etag})
+        assert again.status_code == 304 and again.content == b""
+        assert client.get(path, headers={"If-None-Match": f"W/{etag}"}).status_code == 304
+
+    # Same query in another order / with empty params shares the tag
+    a = client.get("/api/v1/stocks/fno?sector=Unknown&sort_by=rank").headers["etag"]
+    b = client.get("/api/v1/stocks/fno?sort_by=rank&search=&sector=Unknown").headers["etag"]
+    assert a == b
+
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS"]), source="quotes")
+    assert client.get("/api/v1/stocks/fno?sector=Unknown&sort_by=rank", headers={"If-None-Match": a}).status_code == 200
+
+
+def test_delta_feed_route():
+    before = snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS"]), source="bars").version
+    listed = client.get("/api/v1/stocks/fno")
+    assert int(listed.headers["x-snapshot-version"]) == before
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS"]), source="quotes")
+
+    body = client.get(f"/api/v1/stocks/fno/changes?since={before}").json()
+    assert body["removed"] == ["BBB.NS"] and "AAA.NS" in body["changed"]
+    assert client.get("/api/v1/stocks/fno/changes?since=1").json()["full_reload"] is True
+
+
+def test_list_bodies_are_serialized_once_per_version():
+    from app.utils.response_cache import response_cache
+    mock = stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS", "DDD.NS"])
+    snapshots.publish(mock, source="bars")
+    path = "/api/v1/stocks/fno?sort_by=change&sort_dir=desc"
+
+    plain = client.get(path, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers and plain.headers["etag"]
+    # Same bytes FastAPI's response_model encoding would have produced
+    expected = sorted(mock, key=lambda s: s.current_change, reverse=True)
+    assert plain.json() == [s.model_dump(mode="json") for s in expected]
+
+    hits = response_cache.hits
+    zipped = client.get(path, headers={"Accept-Encoding": "gzip"})
+    assert zipped.headers["content-encoding"] == "gzip" and zipped.json() == plain.json()
+    assert response_cache.hits == hits + 1
+
+
+def test_movers_endpoint():
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"]), source="bars")
+    body = client.get("/api/v1/stocks/movers?kind=volume&limit=2").json()
+    assert len(body) == 2 and body[0]["volume"] >= body[1]["volume"]
+    assert client.get("/api/v1/stocks/movers?kind=gainers&sector=Unknown&limit=5").status_code == 200
+    assert client.get("/api/v1/stocks/movers?kind=nope").status_code == 422
+
+
+def test_batch_endpoint():
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"]), source="bars")
+    res = client.get("/api/v1/stocks/batch?symbols=CCC.NS,ZZZ.NS,AAA.NS")
+    assert [s["symbol"] for s in res.json()] == ["CCC.NS", "AAA.NS"]
+    assert res.headers["x-missing-symbols"] == "ZZZ.NS"
+    assert client.get("/api/v1/stocks/batch?symbols=AAA.NS").headers.get("x-missing-symbols") is None
+
+
+def test_field_projection():
+    from app.utils.projection import parse_projection
+    projection = parse_projection("symbol,history.avg_3day,chart_data.close,history.p_day1", "indicators")
+    assert projection.include == {"symbol": True, "history": {"avg_3day": True, "p_day1": True},
+                                  "chart_data": {"__all__": {"close": True}}}
+    assert parse_projection("history.avg_3day,history").include == {"history": True}
+    assert parse_projection(" , ") is None
+    for bad in ("nope", "symbol.upper", "history.nope"):
+        try:
+            parse_projection(bad)
+            assert False, bad
+        except ValueError:
+            pass
+
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS"]), source="bars")
+    body = client.get("/api/v1/stocks/fno?fields=symbol,current_price,history.avg_3day").json()
+    assert [set(row) for row in body] == [{"symbol", "current_price", "history"}] * 2
+    assert set(body[0]["history"]) == {"avg_3day"}
+    trimmed = client.get("/api/v1/stocks/movers?kind=volume&exclude=chart_data,indicators,derived").json()
+    assert trimmed and not {"chart_data", "indicators", "derived"} & set(trimmed[0])
+    assert client.get("/api/v1/stocks/batch?symbols=AAA.NS&fields=bogus").status_code == 422
+
+
+def test_cursor_pagination():
+    symbols = [f"S{i:02d}.NS" for i in range(7)]
+    snapshots.publish(stocks.build_mock_stocks(symbols), source="bars")
+    everything = [s["symbol"] for s in client.get("/api/v1/stocks/fno?sort_by=change").json()]
+
+    seen, cursor = [], None
+    while True:
+        res = client.get("/api/v1/stocks/fno", params={"sort_by": "change", "limit": 3, "cursor": cursor})
+        assert res.status_code == 200 and res.headers["x-total-count"] == "7"
+        seen += [s["symbol"] for s in res.json()]
+        cursor = res.headers.get("x-next-cursor")
+        if cursor is None:
+            break
+    assert seen == everything
+
+    first = client.get("/api/v1/stocks/fno?limit=3").headers["x-next-cursor"]
+    assert client.get("/api/v1/stocks/fno?cursor=%%%").status_code == 400
+    snapshots.publish(stocks.build_mock_stocks(symbols), source="quotes")
+    assert client.get(f"/api/v1/stocks/fno?limit=3&cursor={first}").status_code == 410
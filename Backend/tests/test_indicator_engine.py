@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+
+from app.services.indicator_engine import compute_for_bars
+from app.services.indicators import calculate_macd, calculate_rsi, calculate_ema, calculate_sma
+from tests.builders import make_bars
+
+
+def reference(closes):
+    series = pd.Series(closes)
+    macd, signal, hist = calculate_macd(series)
+    return {
+        "macd": macd, "signal": signal, "hist": hist,
+        "rsi": calculate_rsi(series),
+        "ema_20": calculate_ema(series, 20), "ema_50": calculate_ema(series, 50),
+        "sma_20": calculate_sma(series, 20), "sma_50": calculate_sma(series, 50),
+    }
+
+
+def test_matches_per_symbol_pandas():
+    """Ragged histories (left-padded in the matrix) give the same numbers as the pandas helpers."""
+    rng = np.random.default_rng(42)
+    universe = {}
+    for i, n in enumerate([3, 14, 15, 40, 90, 260]):
+        universe[f"S{i}.NS"] = make_bars(100 + np.cumsum(rng.normal(size=n)))
+    gappy = 100 + np.cumsum(rng.normal(size=80))
+    gappy[30] = np.nan
+    universe["GAP.NS"] = make_bars(gappy)
+
+    engine = compute_for_bars(universe)
+
+    for symbol, bars in universe.items():
+        got = engine.for_symbol(symbol)
+        for name, expected in reference(bars.close).items():
+            actual = getattr(got, name)
+            np.testing.assert_allclose(actual, expected.to_numpy(), rtol=1e-12, atol=1e-12, err_msg=f"{symbol} {name}")
+
+
+def test_latest_values_and_extras():
+    closes = np.linspace(100, 130, 60)
+    engine = compute_for_bars({"UP.NS": make_bars(closes, high=closes + 1, low=closes - 1)})
+    latest = engine.latest()["UP.NS"]
+
+    assert latest["rsi"] == 100.0  # no losses at all
+    assert latest["macd"] > 0
+    assert latest["sma_20"] == np.mean(closes[-20:])
+    ind = engine.for_symbol("UP.NS")
+    assert ind.year_high == 131.0
+    assert ind.year_low == 99.0
+    assert engine.for_symbol("MISSING.NS") is None
@@ -0,0 +1,63 @@
+import numpy as np
+import pytest
+
+from app.services.indicator_engine import compute_for_bars
+from app.services.indicator_state import IndicatorStateBook, SymbolIndicatorState
+from tests.builders import make_bars
+
+
+def assert_same(actual, expected):
+    assert actual.keys() == expected.keys()
+    for name in expected:
+        if expected[name] is None:
+            assert actual[name] is None, name
+        else:
+            assert actual[name] == pytest.approx(expected[name], rel=1e-9, abs=1e-9), name
+
+
+@pytest.mark.parametrize("n", [5, 20, 80])
+def test_state_matches_full_recompute(n):
+    closes = 100 + np.cumsum(np.random.default_rng(n).normal(size=n + 1))
+
+    state = SymbolIndicatorState.from_closes(closes[:-1], "d")
+    assert_same(state.latest(), compute_for_bars({"X": make_bars(closes[:-1])}).latest()["X"])
+
+    # Peeking at the forming bar == recomputing with it appended, without mutating the state
+    expected = compute_for_bars({"X": make_bars(closes)}).latest()["X"]
+    assert_same(state.peek(closes[-1]), expected)
+    assert state.last_date == "d"
+
+    state.commit(closes[-1], "e")
+    assert_same(state.latest(), expected)
+    assert state.last_date == "e"
+
+
+def test_snapshot_roundtrip(tmp_path):
+    closes = 100 + np.cumsum(np.random.default_rng(1).normal(size=60))
+    book = IndicatorStateBook(str(tmp_path / "state.json"))
+    book.put("X.NS", SymbolIndicatorState.from_closes(closes, "2025-01-01"))
+    book.put("NEW.NS", SymbolIndicatorState.from_closes(closes[:3], "2025-01-01"))
+    assert book.save()
+    assert not book.save()  # nothing changed since
+
+    restored = IndicatorStateBook(book.path)
+    assert restored.load() == 2
+    for symbol in ("X.NS", "NEW.NS"):
+        assert restored.get(symbol).last_date == "2025-01-01"
+        assert_same(restored.get(symbol).peek(101.5), book.get(symbol).peek(101.5))
+
+
+def test_scheduled_save_writes_in_background(tmp_path):
+    from app.services.persistence import persistence
+
+    closes = 100 + np.cumsum(np.random.default_rng(2).normal(size=40))
+    book = IndicatorStateBook(str(tmp_path / "state.json"))
+    book.put("X.NS", SymbolIndicatorState.from_closes(closes, "2025-01-01"))
+    assert book.schedule_save()
+    assert not book.schedule_save()
+    # Later puts don't leak into the copy already handed over
+    book.put("LATE.NS", SymbolIndicatorState.from_closes(closes, "2025-01-02"))
+    assert persistence.flush(5)
+
+    restored = IndicatorStateBook(book.path)
+    assert restored.load() == 1 and restored.get("X.NS").last_date == "2025-01-01"
@@ -0,0 +1,46 @@
+from datetime import datetime, time
+
+from app.utils.market_status import IST, get_next_refresh_time, get_next_daily_time
+
+
+# Phase rules with the bars tier also refreshing while OPEN (quotes tier disabled)
+RULES = {"OPEN": 300, "CLOSED_POST_MARKET": "once", "CLOSED_PRE_MARKET": None, "CLOSED_HOLIDAY": None}
+
+
+def ist(value: str) -> datetime:
+    return IST.localize(datetime.strptime(value, "%Y-%m-%d %H:%M"))
+
+
+def test_open_market_refreshes_on_interval():
+    rules = {"OPEN": 300}
+    assert get_next_refresh_time(ist("2025-12-26 10:00"), ist("2025-12-26 09:58"), rules) == ist("2025-12-26 10:03")
+    # Interval-only rules (the quotes tier) sleep through closed phases
+    assert get_next_refresh_time(ist("2025-12-26 16:00"), ist("2025-12-26 15:30"), rules) == ist("2025-12-29 09:15")
+
+
+def test_single_refresh_after_close():
+    after_close = get_next_refresh_time(ist("2025-12-26 15:28"), ist("2025-12-26 15:27"), RULES)
+    assert after_close.strftime("%H:%M") == "15:40"
+
+    # Once the post-close refresh has run, nothing until the next session
+    assert get_next_refresh_time(ist("2025-12-26 17:00"), ist("2025-12-26 15:45"), RULES) == ist("2025-12-29 09:15")
+
+
+def test_closed_days_are_skipped():
+    # Weekend
+    assert get_next_refresh_time(ist("2025-12-27 11:00"), ist("2025-12-26 15:45"), RULES) == ist("2025-12-29 09:15")
+    # Holiday (Christmas) after the 24th's post-close refresh
+    assert get_next_refresh_time(ist("2025-12-24 18:00"), ist("2025-12-24 15:45"), RULES) == ist("2025-12-26 09:15")
+
+
+def test_pre_market_waits_for_open():
+    assert get_next_refresh_time(ist("2025-12-26 08:00"), None, RULES) == ist("2025-12-26 09:15")
+
+
+def test_nightly_slot_on_trading_days():
+    at = time(20, 0)
+    assert get_next_daily_time(ist("2025-12-26 10:00"), ist("2025-12-24 20:00"), at) == ist("2025-12-26 20:00")
+    # Friday's run done: weekend skipped
+    assert get_next_daily_time(ist("2025-12-26 21:00"), ist("2025-12-26 20:00"), at) == ist("2025-12-29 20:00")
+    # Missed slot is due right away
+    assert get_next_daily_time(ist("2025-12-26 22:00"), ist("2025-12-24 20:00"), at) == ist("2025-12-26 22:00")
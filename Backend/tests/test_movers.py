@@ -0,0 +1,36 @@
+import random
+
+from app.utils.columns import StockColumns
+from app.utils.movers import Movers
+from tests.builders import make_universe
+
+
+def test_rankings_match_a_stable_sort_overall_and_per_sector():
+    rng = random.Random(4)
+    universe = [s.model_copy(update={
+        "volume_ratio": rng.choice([None, 0.5, 1.0, 2.5]),
+        "flags": s.flags.model_copy(update={"is_breakout_candidate": rng.random() < 0.2}),
+    }) for s in make_universe(400, seed=8)]
+    movers = Movers(StockColumns(universe))
+
+    def symbols(stocks):
+        return [s.symbol for s in stocks]
+
+    avg = lambda s: s.history.avg_3day
+    assert symbols(movers.top("gainers-3day", 25)) == symbols(sorted(universe, key=avg, reverse=True)[:25])
+    assert symbols(movers.top("losers-3day", 25)) == symbols(sorted(universe, key=avg)[:25])
+    assert symbols(movers.top("volume", 10, sector="IT")) == symbols(
+        sorted((s for s in universe if s.sector == "IT"), key=lambda s: s.volume, reverse=True)[:10])
+
+    spikes = movers.top("volume-spike", 1000)
+    assert symbols(spikes) == symbols(sorted((s for s in universe if s.volume_ratio is not None),
+                                             key=lambda s: s.volume_ratio, reverse=True))
+    breakouts = movers.top("breakout", 1000, sector="Banking")
+    assert breakouts and all(s.flags.is_breakout_candidate and s.sector == "Banking" for s in breakouts)
+    # Missing ratios rank after every known one
+    seen_missing = False
+    for s in breakouts:
+        seen_missing = seen_missing or s.volume_ratio is None
+        assert not (seen_missing and s.volume_ratio is not None)
+
+    assert movers.top("gainers", 5, sector="Nope") == []
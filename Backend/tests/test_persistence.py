@@ -0,0 +1,48 @@
+import threading
+
+from app.services.persistence import BackgroundWriter
+
+
+def test_bursts_are_coalesced_into_one_write(tmp_path):
+    writer = BackgroundWriter(coalesce_s=0.2)
+    written = []
+    for version in range(5):
+        writer.schedule("snapshot", lambda v=version: written.append(v) or 100)
+    log = tmp_path / "status.txt"
+    writer.append(str(log), "a\n")
+    writer.append(str(log), "b\n")
+
+    assert writer.flush(timeout=5)
+    assert written == [4]
+    assert log.read_text() == "a\nb\n"
+    stats = writer.stats()["keys"]["snapshot"]
+    assert (stats["scheduled"], stats["writes"], stats["coalesced"], stats["total_bytes"]) == (5, 1, 4, 100)
+
+
+def test_failures_are_counted_and_close_flushes():
+    writer = BackgroundWriter(coalesce_s=30)
+    writer.schedule("bad", lambda: 1 / 0)
+    done = threading.Event()
+    writer.schedule("good", lambda: done.set() or 7)
+    # close() doesn't wait out the coalescing window
+    assert writer.close(timeout=5) and done.is_set()
+    keys = writer.stats()["keys"]
+    assert keys["bad"]["failures"] == 1 and "ZeroDivisionError" in keys["bad"]["last_error"]
+    assert keys["good"]["last_bytes"] == 7
+
+    writer.schedule("good", lambda: 3)  # usable after close
+    assert writer.flush(timeout=5) and writer.stats()["keys"]["good"]["writes"] == 2
+
+
+def test_appended_logs_rotate_past_the_size_cap(tmp_path):
+    writer = BackgroundWriter(coalesce_s=0, max_log_bytes=100)
+    log = tmp_path / "debug.log"
+    for i in range(12):
+        writer.append(str(log), f"line {i:02d} {'x' * 20}\n")
+        assert writer.flush(timeout=5)
+
+    assert log.stat().st_size <= 100
+    assert (tmp_path / "debug.log.1").stat().st_size <= 100
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["debug.log", "debug.log.1"]
+    assert log.read_text().splitlines()[-1].startswith("line 11")
+    assert writer.stats()["log_rotations"] >= 3
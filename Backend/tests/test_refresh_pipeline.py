@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+
+from app.services.refresh_pipeline import run_pipeline
+from tests.builders import make_bars
+
+
+def test_pipeline_processes_all_and_bounds_in_flight():
+    symbols = [f"S{i}.NS" for i in range(40)] + ["BAD.NS"]
+    live = {"bars": 0, "peak": 0}
+    lock = threading.Lock()
+
+    def fetch(group):
+        time.sleep(0.001)
+        out = {}
+        for symbol in group:
+            if symbol == "BAD.NS":
+                continue
+            with lock:
+                live["bars"] += 1
+                live["peak"] = max(live["peak"], live["bars"])
+            out[symbol] = make_bars(np.linspace(100, 110, 30))
+        return out
+
+    def compute(batch):
+        time.sleep(0.005)  # slower than fetch, so backpressure kicks in
+        with lock:
+            live["bars"] -= len(batch)
+        return [symbol for symbol, _ in batch]
+
+    results, stats = asyncio.run(run_pipeline(symbols, fetch, compute, group_size=2,
+                                              fetch_concurrency=3, queue_size=4, compute_batch=5))
+
+    assert sorted(results) == sorted(symbols[:-1])
+    assert stats.processed == 40
+    assert stats.failed == 1
+    assert stats.peak_rss_mb >= stats.start_rss_mb > 0
+    # queue + one batch being computed + one group held by each blocked fetcher
+    assert live["peak"] <= 4 + 5 + 3 * 2
+
+
+def test_pipeline_survives_compute_errors():
+    def compute(batch):
+        raise ValueError("boom")
+
+    results, stats = asyncio.run(run_pipeline(["A.NS", "B.NS"], lambda group: {s: make_bars(np.linspace(100, 110, 30)) for s in group}, compute))
+    assert results == []
+    assert stats.failed == 2
+
+
+def test_batched_sync_against_fake_provider(tmp_path, monkeypatch):
+    """One provider call per group on first sync, one more per group for the incremental sync."""
+    from app.services import stocks
+    from app.services.history_store import HistoryStore
+    from app.services.market_data import FakeProvider, set_provider
+
+    provider = FakeProvider(missing=["GONE.NS"])
+    set_provider(provider)
+    monkeypatch.setattr(stocks, "history_store", HistoryStore(str(tmp_path)))
+    try:
+        symbols = ["A.NS", "B.NS", "C.NS", "GONE.NS"]
+        first = stocks.sync_histories(symbols)
+        assert provider.calls == 1
+        assert first["GONE.NS"] is None
+        assert len(first["A.NS"]) > 30
+
+        second = stocks.sync_histories(symbols[:3])
+        assert provider.calls == 2
+        assert len(second["A.NS"]) == len(first["A.NS"])
+        assert second["B.NS"].close[-1] == first["B.NS"].close[-1]
+    finally:
+        set_provider(None)
@@ -0,0 +1,113 @@
+import asyncio
+import os
+
+from app.services import fundamentals, stocks
+from app.services.history_store import HistoryStore
+from app.services.market_data import FakeProvider, set_provider
+from app.services.scheduler import Job
+from app.utils.market_status import get_current_ist_time
+
+
+def test_job_skips_overlapping_runs_and_records_history():
+    gate = {"calls": 0}
+
+    async def work():
+        gate["calls"] += 1
+        await asyncio.sleep(0.01)
+        if gate["calls"] == 2:
+            raise RuntimeError("upstream down")
+
+    job = Job("test", work, schedule=lambda now, last: now, jitter_s=5)
+
+    async def scenario():
+        first = asyncio.create_task(job.run())
+        await asyncio.sleep(0)
+        assert await job.run() is False  # first run still going
+        await first
+        await job.run()
+
+    asyncio.run(scenario())
+
+    assert gate["calls"] == 2
+    assert job.skipped == 1
+    assert [r["status"] for r in job.runs] == ["ok", "error"]
+    assert job.runs[-1]["error"] == "upstream down"
+    due = job.due_at(get_current_ist_time())
+    assert 0 <= (due - job.last_run).total_seconds() <= 5 + 1
+
+
+def test_quotes_overlay_without_writing(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path))
+    monkeypatch.setattr(stocks, "history_store", store)
+    provider = FakeProvider(days_back=60)
+    set_provider(provider)
+    try:
+        stocks.sync_histories(["AAA.NS", "BBB.NS"])
+        stored = {name: os.path.getmtime(tmp_path / name) for name in os.listdir(tmp_path)}
+
+        quotes = stocks.fetch_quotes(["AAA.NS", "BBB.NS", "NEW.NS"])
+        assert quotes["NEW.NS"] is None  # left to the bars tier
+        assert len(quotes["AAA.NS"]) == len(store.read("AAA.NS"))
+        assert provider.calls == 2  # one sync + one quotes call for the whole group
+        assert {name: os.path.getmtime(tmp_path / name) for name in os.listdir(tmp_path)} == stored
+    finally:
+        set_provider(None)
+
+
+def test_fundamentals_fetched_once(tmp_path, monkeypatch):
+    cache = fundamentals.FundamentalsCache(str(tmp_path / "fundamentals.json"))
+    monkeypatch.setattr(fundamentals, "fundamentals_cache", cache)
+    provider = FakeProvider()
+    set_provider(provider)
+    try:
+        first = fundamentals.get_fundamentals("AAA.NS")
+        assert fundamentals.get_fundamentals("AAA.NS") == first
+        assert provider.calls == 1
+        assert "fiftyTwoWeekHigh" not in first  # absent upstream stays absent
+
+        fundamentals.refresh_fundamentals(["AAA.NS", "BBB.NS"])
+        reloaded = fundamentals.FundamentalsCache(cache.path)
+        assert reloaded.load() == 2
+        assert reloaded.refreshed_at is not None
+    finally:
+        set_provider(None)
+
+
+def test_fundamentals_ttl_and_stale_fallback(tmp_path, monkeypatch):
+    cache = fundamentals.FundamentalsCache(str(tmp_path / "fundamentals.json"))
+    monkeypatch.setattr(fundamentals, "fundamentals_cache", cache)
+    provider = FakeProvider()
+    set_provider(provider)
+    try:
+        first = fundamentals.get_fundamentals("AAA.NS")
+        monkeypatch.setattr(fundamentals.settings, "FUNDAMENTALS_TTL_S", 0)
+        assert fundamentals.get_fundamentals("AAA.NS") == first
+        assert provider.calls == 2  # expired: refetched
+
+        def down(symbol):
+            raise ConnectionError("upstream down")
+        monkeypatch.setattr(provider, "fetch_fundamentals", down)
+        assert fundamentals.get_fundamentals("AAA.NS") == first  # stale beats nothing
+    finally:
+        set_provider(None)
+
+
+def test_enrich_warm_symbol_makes_no_upstream_calls(tmp_path, monkeypatch):
+    store = HistoryStore(str(tmp_path / "history"))
+    monkeypatch.setattr(stocks, "history_store", store)
+    monkeypatch.setattr(stocks, "HISTORY_EXTRAS", {})
+    cache = fundamentals.FundamentalsCache(str(tmp_path / "fundamentals.json"))
+    monkeypatch.setattr(fundamentals, "fundamentals_cache", cache)
+    provider = FakeProvider(days_back=300)
+    set_provider(provider)
+    try:
+        stock = stocks.build_mock_stocks(["AAA.NS"])[0].model_copy(update={"chart_data": []})
+        cold = stocks.enrich_stock_data(stock)
+        assert cold.returns["1M"] is not None and cold.pe_ratio is not None and cold.chart_data
+        calls = provider.calls
+
+        warm = stocks.enrich_stock_data(stock)
+        assert provider.calls == calls
+        assert warm.model_dump() == cold.model_dump()
+    finally:
+        set_provider(None)
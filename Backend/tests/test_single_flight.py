@@ -0,0 +1,94 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.services import stocks
+from app.services.history_store import HistoryStore
+from app.services.market_data import FakeProvider, set_provider
+from app.services.single_flight import SingleFlight
+
+
+def test_concurrent_callers_share_one_call():
+    flights = SingleFlight()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"lastPrice": 10.0}
+
+    async def main():
+        return await asyncio.gather(*(flights.run("AAA.NS", "quote", fetch) for _ in range(50)))
+
+    results = asyncio.run(main())
+    threads = [threading.Thread(target=lambda: results.append(flights.call("BBB.NS", "quote", fetch)))
+               for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 2 and len(results) == 60
+    assert all(r == {"lastPrice": 10.0} for r in results)
+    stats = flights.stats()["kinds"]["quote"]
+    assert (stats["requests"], stats["upstream_calls"], stats["suppressed"]) == (60, 2, 58)
+    assert stats["coalescing_ratio"] == 30.0
+
+    flights.call("AAA.NS", "quote", fetch)  # nothing in flight, nothing cached: a new call
+    assert len(calls) == 3
+
+
+def test_no_data_is_negative_cached_and_errors_are_not():
+    flights = SingleFlight(negative_ttl_s=60)
+    calls = []
+
+    def missing():
+        calls.append(1)
+        return None
+
+    assert flights.call("GONE.NS", "history", missing) is None
+    assert flights.call("GONE.NS", "history", missing) is None
+    assert len(calls) == 1
+    assert flights.stats()["kinds"]["history"]["negative_hits"] == 1
+    flights.clear()
+    flights.call("GONE.NS", "history", missing)
+    assert len(calls) == 2
+
+    def down():
+        calls.append(1)
+        raise ConnectionError("upstream down")
+
+    for _ in range(2):
+        with pytest.raises(ConnectionError):
+            flights.call("AAA.NS", "history", down)
+    assert len(calls) == 4
+    assert flights.stats()["kinds"]["history"]["errors"] == 2
+
+    # Kinds whose empty answer may be a rate limit opt out of negative caching
+    flights.call("^NSEI", "quote", lambda: calls.append(1) or (None, None), empty=None)
+    flights.call("^NSEI", "quote", lambda: calls.append(1) or (None, None), empty=None)
+    assert len(calls) == 6
+    assert flights.stats()["negative_entries"] == 1  # GONE.NS history only
+
+
+def test_fetch_stock_data_coalesces_history(tmp_path, monkeypatch):
+    monkeypatch.setattr(stocks, "history_store", HistoryStore(str(tmp_path)))
+    monkeypatch.setattr(stocks, "upstream", SingleFlight())
+    monkeypatch.setattr(stocks, "fetch_fast_info", lambda symbol: {})  # no network: fall back to bars
+    provider = FakeProvider(latency_s=0.1, missing=["GONE.NS"])
+    set_provider(provider)
+    try:
+        async def main(symbol):
+            return await asyncio.gather(*(stocks.fetch_stock_data(symbol) for _ in range(20)))
+
+        fetched = asyncio.run(main("AAA.NS"))
+        assert provider.calls == 1
+        assert all(s is not None and s.symbol == "AAA.NS" for s in fetched)
+
+        assert asyncio.run(main("GONE.NS")) == [None] * 20
+        assert asyncio.run(main("GONE.NS")) == [None] * 20
+        assert provider.calls == 2
+    finally:
+        set_provider(None)
@@ -0,0 +1,94 @@
+import pytest
+from pydantic import ValidationError
+
+from app.services import fundamentals, stocks
+from app.services.fundamentals import FundamentalsCache
+from app.services.history_store import HistoryStore
+from app.services.market_data import FakeProvider, set_provider
+from app.services.snapshot import SnapshotStore
+
+
+def test_publish_swaps_versioned_snapshots():
+    store = SnapshotStore()
+    mocks = stocks.build_mock_stocks(["AAA.NS", "BBB.NS"])
+    before = store.current()
+    first = store.publish(mocks, source="bars")
+    second = store.publish(mocks[:1], source="quotes")
+
+    assert before.stocks == ()
+    assert before.version < first.version < second.version
+    assert store.current() is second
+    # Readers holding the old snapshot keep a consistent view
+    assert [s.symbol for s in first.stocks] == ["AAA.NS", "BBB.NS"]
+    assert second.get("BBB.NS") is None and first.get("BBB.NS") is mocks[1]
+
+
+def test_enrich_returns_copy(tmp_path, monkeypatch):
+    monkeypatch.setattr(stocks, "history_store", HistoryStore(str(tmp_path / "history")))
+    monkeypatch.setattr(fundamentals, "fundamentals_cache", FundamentalsCache(str(tmp_path / "f.json")))
+    set_provider(FakeProvider())
+    try:
+        stock = stocks.build_mock_stocks(["AAA.NS"])[0]
+        enriched = stocks.enrich_stock_data(stock)
+    finally:
+        set_provider(None)
+
+    assert enriched is not stock
+    assert enriched.pe_ratio is not None and enriched.returns and enriched.chart_data
+    assert stock.pe_ratio is None and stock.returns is None and stock.chart_data == []
+    with pytest.raises(ValidationError):
+        stock.rank = 99
+
+
+def test_changes_since_merges_deltas_and_signals_full_reload():
+    store = SnapshotStore(history=3)
+    aaa, bbb, ccc = stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"])
+    v1 = store.publish([aaa, bbb], source="bars").version
+    # Same content rebuilt later: only last_updated differs, so nothing changed
+    v2 = store.publish([aaa.model_copy(update={"last_updated": aaa.last_updated.replace(year=2030)}), bbb],
+                       source="quotes").version
+    assert store.changes_since(v1)["changed"] == {}
+
+    moved = aaa.model_copy(update={"current_price": aaa.current_price + 1,
+                                   "history": aaa.history.model_copy(update={"p_day1": 9.99})})
+    v3 = store.publish([moved, ccc], source="quotes").version
+
+    delta = store.changes_since(v1)
+    assert delta["version"] == v3 and not delta["full_reload"]
+    assert set(delta["changed"]) == {"AAA.NS", "CCC.NS"}
+    assert {k for k in delta["changed"]["AAA.NS"]} == {"current_price", "history.p_day1", "last_updated"}
+    assert delta["added"] == ["CCC.NS"] and delta["removed"] == ["BBB.NS"]
+    assert store.changes_since(v3)["changed"] == {}
+
+    # The ring keeps the last 3 deltas; two more publishes push out v1 -> v2
+    store.publish([moved, ccc], source="quotes")
+    assert not store.changes_since(v1)["full_reload"]
+    store.publish([moved, ccc], source="quotes")
+    assert not store.changes_since(v2)["full_reload"]
+    assert store.changes_since(v1)["full_reload"]
+    assert store.changes_since(v1 - 1000)["full_reload"]
+
+
+def test_symbol_index_lookups():
+    store = SnapshotStore()
+    snap = store.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"]), source="bars")
+    assert snap.get("BBB.NS").symbol == "BBB.NS" and snap.get("ZZZ.NS") is None
+    asked = ["CCC.NS", "ZZZ.NS", "AAA.NS", "CCC.NS"]
+    assert [s.symbol for s in snap.get_many(asked)] == ["AAA.NS", "CCC.NS"]
+    assert [s.symbol for s in snap.get_many(asked, keep_order=True)] == ["CCC.NS", "AAA.NS"]
+
+
+def test_prepared_publish_rebases_on_a_newer_version():
+    store = SnapshotStore()
+    aaa, bbb = stocks.build_mock_stocks(["AAA.NS", "BBB.NS"])
+    v1 = store.publish([aaa], source="bars").version
+    late = store.prepare([aaa, bbb], source="bars")
+    store.publish([bbb], source="quotes")
+
+    snap = store.commit(late)
+    assert snap.version == v1 + 2 and store.current() is snap
+    # Diffed against what was current at commit time (BBB only), not at prepare time
+    assert store.changes_since(v1 + 1)["added"] == ["AAA.NS"]
+    # Built once, in prepare(), and carried over by the renumbering
+    assert snap.movers is late.snapshot.movers and snap.columns is late.snapshot.columns
+    assert "fields" in snap.columns.__dict__
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas import ChartDataPoint, StockResponse
+from app.services import stocks
+from app.services.snapshot import SnapshotStore
+from app.services.snapshot_file import (SnapshotFileError, decode_snapshot, encode_snapshot, read_snapshot_file,
+                                        write_snapshot_file)
+from tests.builders import make_universe
+
+
+def _dump(rows):
+    return [s.model_dump_json() for s in rows]
+
+
+def test_round_trip_keeps_every_field():
+    universe = make_universe(120, seed=3)
+    point = ChartDataPoint(date="2025-01-02", open=1, high=2, low=0.5, close=1.5, volume=10, rsi=None)
+    universe[0] = universe[0].model_copy(update={"chart_data": [point], "returns": {"1M": 5.2},
+                                                 "derived": {"macdLabel": "Bullish", "n": 3},
+                                                 "mtf_eligibility": True, "pe_ratio": 21.5})
+    snapshot = SnapshotStore().publish(universe, source="bars")
+
+    loaded = decode_snapshot(encode_snapshot(snapshot))
+    assert (loaded.version, loaded.source, loaded.built_at) == (snapshot.version, "bars", snapshot.built_at)
+    assert _dump(loaded.stocks) == _dump(universe)
+    # Rebuilt rows work everywhere published rows do
+    SnapshotStore().publish(loaded.stocks, source="disk").movers.top("gainers", 5)
+
+
+def test_rebuilt_rows_match_the_public_api():
+    universe = make_universe(20, seed=5)
+    loaded = decode_snapshot(encode_snapshot(SnapshotStore().publish(universe, source="bars"))).stocks
+    for row, original in zip(loaded, universe):
+        # The same instance state model_construct() gives, nested models included
+        assert row == StockResponse.model_construct(**dict(row))
+        assert row.history == type(row.history).model_construct(**dict(row.history))
+        assert row.model_fields_set == set(StockResponse.model_fields)
+        # Re-validates cleanly (NaN != NaN, so compare dumps)
+        assert StockResponse.model_validate(row.model_dump()).model_dump_json() == original.model_dump_json()
+        assert row.model_copy(update={"rank": 1}).model_dump_json() == \
+            original.model_copy(update={"rank": 1}).model_dump_json()
+        with pytest.raises(ValidationError):
+            row.rank = 2  # still frozen
+
+
+def test_rejects_corrupt_files_and_writes_atomically(tmp_path):
+    snapshot = SnapshotStore().publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS"]), source="bars")
+    path = str(tmp_path / "snap.bin")
+    write_snapshot_file(path, snapshot)
+    write_snapshot_file(path, snapshot)
+    assert os.listdir(tmp_path) == ["snap.bin"]
+    assert _dump(read_snapshot_file(path).stocks) == _dump(snapshot.stocks)
+
+    data = bytearray(open(path, "rb").read())
+    for broken in (bytes(data[:-7]), bytes(data[:10]), b"NOTASNAP" + bytes(data[8:])):
+        with pytest.raises(SnapshotFileError):
+            decode_snapshot(broken)
+    data[-3] ^= 0xFF
+    with pytest.raises(SnapshotFileError):
+        decode_snapshot(bytes(data))
+
+
+def test_load_cache_prefers_snapshot_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "snap.bin")
+    monkeypatch.setattr(stocks.settings, "SNAPSHOT_FILE", path)
+    published = SnapshotStore().publish(stocks.build_mock_stocks(["AAA.NS", "CCC.NS"]), source="bars")
+    stocks.save_cache(published)
+
+    assert stocks.load_cache() is True
+    current = stocks.get_snapshot()
+    assert current.source == "disk" and _dump(current.stocks) == _dump(published.stocks)
+
+    # Versions keep increasing past the saved one, even if the store's clock-based start is lower
+    ahead = SnapshotStore()
+    ahead.publish([], source="empty", after_version=current.version + 10_000)
+    stocks.save_cache(ahead.current())
+    assert stocks.load_cache() is True
+    assert stocks.get_snapshot().version == current.version + 10_002
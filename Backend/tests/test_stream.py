@@ -0,0 +1,65 @@
+import asyncio
+import json
+
+from app.services import stocks
+from app.services.snapshot import SnapshotStore
+from app.services.stream import RESET, StreamFull, StreamHub
+
+
+def _decode(frame: bytes):
+    lines = frame.decode().strip().split("\n")
+    fields = dict(line.split(": ", 1) for line in lines)
+    return fields["event"], json.loads(fields["data"])
+
+
+def test_hub_fans_out_topic_deltas_and_drops_slow_consumers():
+    async def scenario():
+        store = SnapshotStore()
+        aaa, bbb = stocks.build_mock_stocks(["AAA.NS", "BBB.NS"])
+        store.publish([aaa, bbb], source="bars")
+        hub = StreamHub(store, buffer=2, max_subscribers=3, heartbeat_s=60)
+
+        everything = hub.subscribe()
+        only_bbb = hub.subscribe(["BBB.NS"])
+        cheap = hub.subscribe(filters={"max_price": aaa.current_price + 1})
+        assert hub.stats()["topics"] == 3
+        try:
+            hub.subscribe()
+            assert False, "expected StreamFull"
+        except StreamFull:
+            pass
+
+        event, body = _decode(everything.queue.get_nowait())
+        assert event == "snapshot" and set(body["rows"]) == {"AAA.NS", "BBB.NS"}
+        assert set(_decode(only_bbb.queue.get_nowait())[1]["rows"]) == {"BBB.NS"}
+        cheap.queue.get_nowait()
+
+        # Only AAA moves, and out of the price filter
+        moved = aaa.model_copy(update={"current_price": aaa.current_price + 100})
+        store.publish([moved, bbb], source="quotes")
+        event, body = _decode(everything.queue.get_nowait())
+        assert event == "delta" and set(body["changed"]) == {"AAA.NS"}
+        assert body["changed"]["AAA.NS"]["current_price"] == moved.current_price
+        assert only_bbb.queue.empty()
+        assert _decode(cheap.queue.get_nowait())[1]["removed"] == ["AAA.NS"]
+
+        # Back under the limit: re-enters with its full row
+        store.publish([aaa, bbb], source="quotes")
+        body = _decode(cheap.queue.get_nowait())[1]
+        assert body["added"] == ["AAA.NS"] and "history.avg_3day" in body["changed"]["AAA.NS"]
+
+        # `everything` stopped reading: a third unread frame overflows its buffer of 2
+        store.publish([moved, bbb], source="quotes")
+        assert not everything.dropped
+        store.publish([aaa, bbb], source="quotes")
+        assert everything.dropped and everything.queue.get_nowait() is RESET
+        assert hub.stats()["dropped_slow"] == 1 and hub.stats()["subscribers"] == 2
+
+        frames = hub.frames(only_bbb)
+        store.publish([aaa, bbb.model_copy(update={"volume": bbb.volume + 1})], source="quotes")
+        event, body = _decode(await frames.__anext__())
+        assert event == "delta" and list(body["changed"]) == ["BBB.NS"]
+        await frames.aclose()
+        assert only_bbb not in only_bbb.topic.subscribers
+
+    asyncio.run(scenario())
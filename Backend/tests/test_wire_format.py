@@ -0,0 +1,69 @@
+import math
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services import stocks
+from app.services.snapshot import snapshots
+from app.utils import wire_format
+from app.utils.wire_format import ARROW, JSON, MSGPACK, negotiate_format
+
+client = TestClient(app)
+
+
+def test_negotiate_format(monkeypatch):
+    monkeypatch.setattr(wire_format, "pyarrow", object())
+    monkeypatch.setattr(wire_format, "msgpack", object())
+    assert negotiate_format("") == JSON
+    assert negotiate_format("application/json, */*") == JSON
+    assert negotiate_format("application/vnd.apache.arrow.stream") == ARROW
+    assert negotiate_format("application/json;q=0.5, application/vnd.msgpack") == MSGPACK
+    assert negotiate_format("application/x-msgpack;q=0, application/json") == JSON
+
+    monkeypatch.setattr(wire_format, "pyarrow", None)
+    assert negotiate_format("application/vnd.apache.arrow.stream") == JSON
+
+
+def _json_rows(path):
+    rows = client.get(path).json()
+    return {r["symbol"]: r for r in rows}, [r["symbol"] for r in rows]
+
+
+def _same(a, b):
+    return (a is None and (b is None or (isinstance(b, float) and math.isnan(b)))) or a == b
+
+
+def test_arrow_matches_json():
+    pa = pytest.importorskip("pyarrow")
+    version = snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"]), source="bars").version
+    path = "/api/v1/stocks/fno?sort_by=change&sort_dir=desc"
+    expected, order = _json_rows(path)
+
+    res = client.get(path, headers={"Accept": ARROW})
+    assert res.headers["content-type"].startswith(ARROW) and "Accept" in res.headers["vary"]
+    assert res.headers["etag"] != client.get(path).headers["etag"]
+    table = pa.ipc.open_stream(res.content).read_all()
+    assert table.schema.metadata[b"snapshot_version"] == str(version).encode()
+    assert table["symbol"].to_pylist() == order
+    for row in table.to_pylist():
+        want = expected[row["symbol"]]
+        assert _same(row["current_price"], want["current_price"])
+        assert _same(row["history.avg_3day"], want["history"]["avg_3day"])
+        assert row["flags.is_breakout_candidate"] == want["flags"]["is_breakout_candidate"]
+        assert _same(row["pe_ratio"], want["pe_ratio"])
+
+
+def test_msgpack_projection_and_paging():
+    msgpack = pytest.importorskip("msgpack")
+    snapshots.publish(stocks.build_mock_stocks(["AAA.NS", "BBB.NS", "CCC.NS"]), source="bars")
+    expected, order = _json_rows("/api/v1/stocks/strength-analyzer?sort_by=volume")
+
+    res = client.get("/api/v1/stocks/strength-analyzer?sort_by=volume&limit=2&fields=symbol,volume,history",
+                     headers={"Accept": MSGPACK})
+    body = msgpack.unpackb(res.content)
+    assert res.headers["x-next-cursor"] and body["rows"] == 2
+    assert set(body["columns"]) == {"symbol", "volume", "history.p_day1", "history.p_day2", "history.p_day3",
+                                    "history.avg_3day", "history.volatility_3_day"}
+    assert body["columns"]["symbol"] == order[:2]
+    assert body["columns"]["volume"] == [expected[s]["volume"] for s in order[:2]]